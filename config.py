@@ -1,13 +1,23 @@
+import atexit
+import gzip
 import logging
+import multiprocessing
 import os
+import queue
+import shutil
 import sys
+import threading
 from enum import Enum, auto
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
 from logging.handlers import RotatingFileHandler
 from typing import Optional
 
 from environs import Env
 
 import constants
+from fp.metrics import LOG_QUEUE_DEPTH
+from fp.metrics import LOG_RECORDS_DROPPED
 
 env = Env()
 env.read_env(path="env", recurse=False)
@@ -20,17 +30,73 @@ class CustomFormatter(logging.Formatter):
 
 
 class CustomRotatingFileHandler(RotatingFileHandler):
-    def __init__(self, file_name, **kwargs):
+    def __init__(self, file_name, compress=False, **kwargs):
         self.base_dir = "logs"
         if not os.path.exists(self.base_dir):
             os.mkdir(self.base_dir)
 
+        # set by `init_logging` when records are written by a `LogWriter`
+        self.log_queue = None
+        self.compress = compress
         super().__init__("{}/{}".format(self.base_dir, file_name), **kwargs)
 
     def do_rollover(self, new_file_name):
+        """
+        Starts writing to `logs/<new_file_name>`
+        When logs are queued this happens on the writer thread once the records before it are written
+        """
+        if self.log_queue is not None:
+            self.log_queue.put(logging.makeLogRecord({"rollover_to": new_file_name}))
+        else:
+            self.rollover(new_file_name)
+
+    def rollover(self, new_file_name):
+        finished_file_name = self.baseFilename
         new_file_name = new_file_name.replace("/", "_")
         self.baseFilename = "{}/{}".format(self.base_dir, new_file_name)
         self.doRollover()
+        if self.compress and os.path.basename(finished_file_name) != "init.log":
+            compress_log(finished_file_name)
+
+
+def compress_log(path):
+    with open(path, "rb") as f_in, gzip.open("{}.gz".format(path), "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(path)
+
+
+class BackpressureQueueHandler(QueueHandler):
+    """
+    Puts records on a bounded queue for a `LogWriter`
+    When the queue is full DEBUG records are dropped, anything more important waits for room
+    """
+
+    def enqueue(self, record):
+        if record.levelno > logging.DEBUG:
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class LogWriter(QueueListener):
+    """
+    Writes queued records to the stdout and file handlers on a background thread
+    """
+
+    def __init__(self, log_queue, *handlers, file_handler=None):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.file_handler = file_handler
+
+    def handle(self, record):
+        rollover_to = getattr(record, "rollover_to", None)
+        if rollover_to is not None:
+            self.file_handler.rollover(rollover_to)
+        else:
+            super().handle(record)
 
 
 def init_logging(level, log_to_file):
@@ -40,21 +106,72 @@ def init_logging(level, log_to_file):
     requests_logger.setLevel(logging.INFO)
 
     # Gets the root logger to set handlers/formatters
+    # its level is the lowest level a handler wants so that `logger.isEnabledFor`
+    # is False for records nothing would write
     logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(logging.DEBUG if log_to_file else level)
     stdout_handler = logging.StreamHandler(sys.stdout)
     stdout_handler.setLevel(level)
     stdout_handler.setFormatter(CustomFormatter())
-    logger.addHandler(stdout_handler)
     FoulPlayConfig.stdout_log_handler = stdout_handler
+    handlers = [stdout_handler]
 
+    file_handler = None
     if log_to_file:
-        file_handler = CustomRotatingFileHandler("init.log")
+        file_handler = CustomRotatingFileHandler(
+            "init.log", compress=FoulPlayConfig.compress_logs
+        )
         file_handler.setLevel(logging.DEBUG)  # file logs are always debug
         file_handler.setFormatter(CustomFormatter())
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
         FoulPlayConfig.file_log_handler = file_handler
 
+    # the handlers do their console and file I/O on the writer's thread
+    # so logging never blocks the event loop or a search on I/O
+    log_queue = queue.Queue(maxsize=FoulPlayConfig.log_queue_size)
+    LOG_QUEUE_DEPTH.callback = lambda: {(): log_queue.qsize()}
+    if file_handler is not None:
+        file_handler.log_queue = log_queue
+    queue_handler = BackpressureQueueHandler(log_queue)
+    logger.addHandler(queue_handler)
+    log_writer = LogWriter(log_queue, *handlers, file_handler=file_handler)
+    log_writer.start()
+    atexit.register(log_writer.stop)
+
+    # forked processes (e.g. search workers) send their records back to this writer
+    # so they end up in the file of the battle that is being played
+    forked_queue = multiprocessing.get_context("fork").Queue(
+        maxsize=FoulPlayConfig.log_queue_size
+    )
+    threading.Thread(
+        target=relay_forked_records,
+        args=(forked_queue, queue_handler),
+        name="log-relay",
+        daemon=True,
+    ).start()
+    os.register_at_fork(
+        after_in_child=lambda: forward_to_parent(
+            queue_handler, log_writer, forked_queue
+        )
+    )
+
+
+def relay_forked_records(forked_queue, queue_handler):
+    while True:
+        queue_handler.enqueue(forked_queue.get())
+
+
+def forward_to_parent(queue_handler, log_writer, forked_queue):
+    """
+    Runs in a forked process, which gets a copy of the parent's log queue but not the thread writing it
+    Its records are sent to the parent's writer instead, which also knows about every rollover
+    """
+    queue_handler.queue = forked_queue
+    LOG_QUEUE_DEPTH.callback = lambda: {}
+    # the copied writer is the parent's, this process must not stop it when it exits
+    log_writer._thread = None
+    atexit.unregister(log_writer.stop)
+
 
 class SaveReplay(Enum):
     Always = auto()
@@ -65,40 +182,58 @@ class SaveReplay(Enum):
 class _FoulPlayConfig:
     battle_bot_module: str
     websocket_uri: str
+    login_uri: str
     username: str
     password: str
     avatar: str
     bot_mode: str
     pokemon_mode: str = ""
     smogon_stats: str = None
+    smogon_stats_mirror: str = None
     search_time_ms: int
     parallelism: int
     run_count: int
     team: str
+    team_rotation: str
     user_to_challenge: str
     save_replay: SaveReplay
     room_name: str
     damage_calc_type: str
     log_level: str
     log_to_file: bool
+    trace_file: Optional[str]
+    profile_turn: Optional[int]
+    compress_logs: bool
+    log_queue_size: int
+    metrics_port: Optional[int]
+    metrics_file: Optional[str]
+    metrics_interval_sec: int
+    opening_book_file: Optional[str] = None
+    opening_book_confidence: float = 0.8
+    opening_book_min_searches: int = 5
     stdout_log_handler: logging.StreamHandler
     file_log_handler: Optional[CustomRotatingFileHandler]
 
     def configure(self):
         self.battle_bot_module = env("BATTLE_BOT")
         self.websocket_uri = env("WEBSOCKET_URI")
+        self.login_uri = env(
+            "PS_LOGIN_URI", "https://play.pokemonshowdown.com/api/login"
+        )
         self.username = env("PS_USERNAME")
         self.password = env("PS_PASSWORD")
         self.avatar = env("PS_AVATAR", None)
         self.bot_mode = env("BOT_MODE")
         self.pokemon_mode = env("POKEMON_MODE")
         self.smogon_stats = env("SMOGON_STATS", None)
+        self.smogon_stats_mirror = env("SMOGON_STATS_MIRROR", None)
 
         self.search_time_ms = env.int("SEARCH_TIME_MS", 100)
         self.parallelism = env.int("MCTS_PARALLELISM", 1)
 
         self.run_count = env.int("RUN_COUNT", 1)
         self.team = env("TEAM_NAME", None)
+        self.team_rotation = env("TEAM_ROTATION", "random")
         self.user_to_challenge = env("USER_TO_CHALLENGE", None)
 
         self.save_replay = SaveReplay[env.str("SAVE_REPLAY", "Never")]
@@ -107,6 +242,16 @@ class _FoulPlayConfig:
 
         self.log_level = env("LOG_LEVEL", "DEBUG")
         self.log_to_file = env.bool("LOG_TO_FILE", False)
+        self.compress_logs = env.bool("COMPRESS_LOGS", False)
+        self.log_queue_size = env.int("LOG_QUEUE_SIZE", 10000)
+        self.trace_file = env("TRACE_FILE", None)
+        self.profile_turn = env.int("PROFILE_TURN", None)
+        self.metrics_port = env.int("METRICS_PORT", None)
+        self.metrics_file = env("METRICS_FILE", None)
+        self.metrics_interval_sec = env.int("METRICS_INTERVAL_SEC", 60)
+        self.opening_book_file = env("OPENING_BOOK_FILE", None)
+        self.opening_book_confidence = env.float("OPENING_BOOK_CONFIDENCE", 0.8)
+        self.opening_book_min_searches = env.int("OPENING_BOOK_MIN_SEARCHES", 5)
 
         self.validate_config()
 
@@ -2,16 +2,25 @@ import os
 import json
 import logging
 
+from data.generation_data import GenerationDataView
+from data.read_only import freeze
+
 logger = logging.getLogger(__name__)
 
 PWD = os.path.dirname(os.path.abspath(__file__))
 
+# The latest generation's data, without any mods applied
+# Most code should use `all_move_json` and `pokedex` instead,
+# which resolve to the generation being played
 move_json_location = os.path.join(PWD, "moves.json")
 with open(move_json_location) as f:
-    all_move_json = json.load(f)
+    base_all_move_json = freeze(json.load(f))
 
 pkmn_json_location = os.path.join(PWD, "pokedex.json")
 with open(pkmn_json_location, "r") as f:
-    pokedex = json.loads(f.read())
+    base_pokedex = freeze(json.loads(f.read()))
+
+all_move_json = GenerationDataView("all_move_json")
+pokedex = GenerationDataView("pokedex")
 
 effectiveness = {}
@@ -0,0 +1,111 @@
+import contextlib
+import contextvars
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Optional
+
+import constants
+
+
+@dataclass(frozen=True)
+class GenerationData:
+    """
+    The read-only data for one generation: the base data with that generation's mods applied
+
+    Built once per generation by `data.mods.apply_mods.get_generation_data`
+    """
+
+    generation: str
+    pokedex: Mapping
+    all_move_json: Mapping
+    type_chart: tuple
+    hidden_power_active_move_base_damage_string: str = (
+        constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING
+    )
+    request_dict_ability: str = constants.REQUEST_DICT_ABILITY
+
+
+_default_generation_data: Optional[GenerationData] = None
+_generation_data = contextvars.ContextVar("generation_data", default=None)
+
+
+def current_generation_data() -> GenerationData:
+    """
+    The GenerationData for the current context (e.g. the battle being processed)
+    Falls back to the process-wide default set by `apply_mods`, which is the latest generation
+    """
+    generation_data = _generation_data.get()
+    if generation_data is not None:
+        return generation_data
+
+    if _default_generation_data is None:
+        # imported here because building the data requires the base data in `data`
+        from data.mods.apply_mods import get_generation_data
+
+        set_default_generation_data(get_generation_data(""))
+
+    return _default_generation_data
+
+
+def set_default_generation_data(generation_data: GenerationData):
+    global _default_generation_data
+    _default_generation_data = generation_data
+
+
+@contextlib.contextmanager
+def use_generation_data(generation_data: GenerationData):
+    """
+    Use `generation_data` for everything run in the current context
+    asyncio tasks and `contextvars.copy_context().run` each get their own context
+    """
+    token = _generation_data.set(generation_data)
+    try:
+        yield generation_data
+    finally:
+        _generation_data.reset(token)
+
+
+class GenerationDataView(Mapping):
+    """
+    A read-only mapping that forwards to one attribute of `current_generation_data()`
+    `data.pokedex` and `data.all_move_json` are instances of this
+
+    Each lookup resolves the current generation again, which is several times slower than
+    a dict lookup. Code that runs often gets `current_generation_data()` once and uses its
+    mappings directly, the views are for code where that doesn't matter
+    """
+
+    __slots__ = ("_attribute",)
+
+    def __init__(self, attribute: str):
+        self._attribute = attribute
+
+    def _current(self) -> Mapping:
+        return getattr(current_generation_data(), self._attribute)
+
+    def __getitem__(self, key):
+        return getattr(current_generation_data(), self._attribute)[key]
+
+    def __contains__(self, key):
+        return key in getattr(current_generation_data(), self._attribute)
+
+    def __iter__(self):
+        return iter(self._current())
+
+    def __len__(self):
+        return len(self._current())
+
+    def get(self, key, default=None):
+        return self._current().get(key, default)
+
+    def keys(self):
+        return self._current().keys()
+
+    def items(self):
+        return self._current().items()
+
+    def values(self):
+        return self._current().values()
+
+    def __repr__(self):
+        return "GenerationDataView({})".format(self._attribute)
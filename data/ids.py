@@ -0,0 +1,36 @@
+import sys
+from typing import Optional
+
+from data import base_all_move_json
+
+
+class InternTable:
+    """
+    Gives every name in one namespace (e.g. moves) a dense integer id, in the order the names are given
+
+    The table is fixed once it is built so a name has the same id in every process,
+    ids can be pickled to forked workers. The names are `sys.intern`ed
+    """
+
+    def __init__(self, names):
+        self._names = tuple(sys.intern(name) for name in names)
+        self._ids = {name: i for i, name in enumerate(self._names)}
+
+    def id(self, name: str) -> int:
+        return self._ids[name]
+
+    def get(self, name: str, default=None) -> Optional[int]:
+        return self._ids.get(name, default)
+
+    def name(self, name_id: int) -> str:
+        return self._names[name_id]
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __len__(self):
+        return len(self._names)
+
+
+# the generation mods only change existing moves, so every generation's moves are in here
+MOVE_IDS = InternTable(base_all_move_json)
@@ -2,8 +2,13 @@ import os
 import json
 import logging
 import constants
-from data import all_move_json
-from data import pokedex
+from data import base_all_move_json
+from data import base_pokedex
+from data.generation_data import GenerationData
+from data.generation_data import set_default_generation_data
+from data.generation_data import use_generation_data
+from data.read_only import ReadOnlyDict
+from data.read_only import freeze
 from fp.helpers import (
     DAMAGE_MULTIPICATION_ARRAY,
     POKEMON_TYPE_INDICES,
@@ -35,130 +40,183 @@ PRE_PHYSICAL_SPECIAL_SPLIT_CATEGORY_LOOKUP = {
     "dark": constants.SPECIAL,
 }
 
+_generation_data_cache = {}
 
-def _steel_resists_dark_and_ghost():
-    DAMAGE_MULTIPICATION_ARRAY[POKEMON_TYPE_INDICES["ghost"]][
-        POKEMON_TYPE_INDICES["steel"]
-    ] = 0.5
-    DAMAGE_MULTIPICATION_ARRAY[POKEMON_TYPE_INDICES["dark"]][
-        POKEMON_TYPE_INDICES["steel"]
-    ] = 0.5
 
+class _GenerationDataBuilder:
+    """
+    Mutable working copy of the base data that a generation's mods are applied to
+    Only entries that a mod touches are copied; everything else is shared with the base data
+    """
 
-def apply_move_mods(gen_number):
+    def __init__(self, generation):
+        self.generation = generation
+        self.all_move_json = dict(base_all_move_json)
+        self.pokedex = dict(base_pokedex)
+        self.type_chart = [list(row) for row in DAMAGE_MULTIPICATION_ARRAY]
+        self.hidden_power_active_move_base_damage_string = (
+            constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING
+        )
+        self.request_dict_ability = constants.REQUEST_DICT_ABILITY
+
+    def build(self) -> GenerationData:
+        return GenerationData(
+            generation=self.generation,
+            pokedex=ReadOnlyDict(self.pokedex),
+            all_move_json=ReadOnlyDict(self.all_move_json),
+            type_chart=tuple(tuple(row) for row in self.type_chart),
+            hidden_power_active_move_base_damage_string=self.hidden_power_active_move_base_damage_string,
+            request_dict_ability=self.request_dict_ability,
+        )
+
+
+def _update_entry(d, key, modifications):
+    d[key] = freeze({**d[key], **modifications})
+
+
+def _steel_resists_dark_and_ghost(data):
+    data.type_chart[POKEMON_TYPE_INDICES["ghost"]][POKEMON_TYPE_INDICES["steel"]] = 0.5
+    data.type_chart[POKEMON_TYPE_INDICES["dark"]][POKEMON_TYPE_INDICES["steel"]] = 0.5
+
+
+def apply_move_mods(data, gen_number):
     logger.debug("Applying move mod for gen {}".format(gen_number))
     for gen_number in reversed(range(gen_number, CURRENT_GEN)):
         with open("{}/gen{}_move_mods.json".format(PWD, gen_number), "r") as f:
             move_mods = json.load(f)
         for move, modifications in move_mods.items():
-            all_move_json[move].update(modifications)
+            _update_entry(data.all_move_json, move, modifications)
 
 
-def apply_pokedex_mods(gen_number):
+def apply_pokedex_mods(data, gen_number):
     logger.debug("Applying dex mod for gen {}".format(gen_number))
     for gen_number in reversed(range(gen_number, CURRENT_GEN)):
         with open("{}/gen{}_pokedex_mods.json".format(PWD, gen_number), "r") as f:
             pokedex_mods = json.load(f)
         for pokemon, modifications in pokedex_mods.items():
-            pokedex[pokemon].update(modifications)
+            _update_entry(data.pokedex, pokemon, modifications)
 
 
-def apply_gen_3_mods():
-    constants.HIDDEN_POWER_TYPE_STRING_INDEX = -2
-    constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING = "70"
-    constants.REQUEST_DICT_ABILITY = "baseAbility"
-    apply_move_mods(3)
-    apply_pokedex_mods(4)  # no pokedex mods in gen3 so use gen4
-    undo_physical_special_split()
-    _steel_resists_dark_and_ghost()
+def apply_gen_3_mods(data):
+    data.hidden_power_active_move_base_damage_string = "70"
+    data.request_dict_ability = "baseAbility"
+    apply_move_mods(data, 3)
+    apply_pokedex_mods(data, 4)  # no pokedex mods in gen3 so use gen4
+    undo_physical_special_split(data)
+    _steel_resists_dark_and_ghost(data)
 
 
 # these are the same as gen3
 apply_gen_2_mods = apply_gen_3_mods
 
 
-def apply_gen_1_mods():
-    apply_gen_2_mods()
-    logger.info("Applying dex mod for gen 1")
+def apply_gen_1_mods(data):
+    apply_gen_2_mods(data)
+    logger.debug("Applying dex mod for gen 1")
     with open("{}/gen1_pokedex_mods.json".format(PWD), "r") as f:
         pokedex_mods = json.load(f)
     for pokemon, modifications in pokedex_mods.items():
-        pokedex[pokemon].update(modifications)
-    DAMAGE_MULTIPICATION_ARRAY[POKEMON_TYPE_INDICES["ice"]][
-        POKEMON_TYPE_INDICES["fire"]
-    ] = 1
-    DAMAGE_MULTIPICATION_ARRAY[POKEMON_TYPE_INDICES["ghost"]][
-        POKEMON_TYPE_INDICES["psychic"]
-    ] = 0
-    DAMAGE_MULTIPICATION_ARRAY[POKEMON_TYPE_INDICES["poison"]][
-        POKEMON_TYPE_INDICES["bug"]
-    ] = 2
-    DAMAGE_MULTIPICATION_ARRAY[POKEMON_TYPE_INDICES["bug"]][
-        POKEMON_TYPE_INDICES["poison"]
-    ] = 2
-
-
-def apply_gen_4_mods():
-    constants.HIDDEN_POWER_TYPE_STRING_INDEX = -2
-    constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING = "70"
-    constants.REQUEST_DICT_ABILITY = "baseAbility"
-    apply_move_mods(4)
-    apply_pokedex_mods(4)
-    _steel_resists_dark_and_ghost()
-
-
-def apply_gen_5_mods():
-    constants.HIDDEN_POWER_TYPE_STRING_INDEX = -2
-    constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING = "70"
-    constants.REQUEST_DICT_ABILITY = "baseAbility"
-    apply_move_mods(5)
-    apply_pokedex_mods(5)
-    _steel_resists_dark_and_ghost()
-
-
-def apply_gen_6_mods():
-    constants.REQUEST_DICT_ABILITY = "baseAbility"
-    apply_move_mods(6)
-    apply_pokedex_mods(6)
-
-
-def apply_gen_7_mods():
-    apply_move_mods(7)
-    apply_pokedex_mods(7)
-
-
-def apply_gen_8_mods():
-    apply_move_mods(8)
-    apply_pokedex_mods(8)
-
-
-def undo_physical_special_split():
-    for move_name, move_data in all_move_json.items():
-        if move_data[constants.CATEGORY] in constants.DAMAGING_CATEGORIES:
-            try:
-                move_data[constants.CATEGORY] = (
-                    PRE_PHYSICAL_SPECIAL_SPLIT_CATEGORY_LOOKUP[
+        _update_entry(data.pokedex, pokemon, modifications)
+    data.type_chart[POKEMON_TYPE_INDICES["ice"]][POKEMON_TYPE_INDICES["fire"]] = 1
+    data.type_chart[POKEMON_TYPE_INDICES["ghost"]][POKEMON_TYPE_INDICES["psychic"]] = 0
+    data.type_chart[POKEMON_TYPE_INDICES["poison"]][POKEMON_TYPE_INDICES["bug"]] = 2
+    data.type_chart[POKEMON_TYPE_INDICES["bug"]][POKEMON_TYPE_INDICES["poison"]] = 2
+
+
+def apply_gen_4_mods(data):
+    data.hidden_power_active_move_base_damage_string = "70"
+    data.request_dict_ability = "baseAbility"
+    apply_move_mods(data, 4)
+    apply_pokedex_mods(data, 4)
+    _steel_resists_dark_and_ghost(data)
+
+
+def apply_gen_5_mods(data):
+    data.hidden_power_active_move_base_damage_string = "70"
+    data.request_dict_ability = "baseAbility"
+    apply_move_mods(data, 5)
+    apply_pokedex_mods(data, 5)
+    _steel_resists_dark_and_ghost(data)
+
+
+def apply_gen_6_mods(data):
+    data.request_dict_ability = "baseAbility"
+    apply_move_mods(data, 6)
+    apply_pokedex_mods(data, 6)
+
+
+def apply_gen_7_mods(data):
+    apply_move_mods(data, 7)
+    apply_pokedex_mods(data, 7)
+
+
+def apply_gen_8_mods(data):
+    apply_move_mods(data, 8)
+    apply_pokedex_mods(data, 8)
+
+
+def undo_physical_special_split(data):
+    for move_name, move_data in data.all_move_json.items():
+        if (
+            move_data[constants.CATEGORY] in constants.DAMAGING_CATEGORIES
+            and move_data[constants.TYPE] in PRE_PHYSICAL_SPECIAL_SPLIT_CATEGORY_LOOKUP
+        ):
+            _update_entry(
+                data.all_move_json,
+                move_name,
+                {
+                    constants.CATEGORY: PRE_PHYSICAL_SPECIAL_SPLIT_CATEGORY_LOOKUP[
                         move_data[constants.TYPE]
                     ]
-                )
-            except KeyError:
-                pass
+                },
+            )
+
+
+GENERATION_MODS = {
+    "gen1": apply_gen_1_mods,
+    "gen2": apply_gen_2_mods,
+    "gen3": apply_gen_3_mods,
+    "gen4": apply_gen_4_mods,
+    "gen5": apply_gen_5_mods,
+    "gen6": apply_gen_6_mods,
+    "gen7": apply_gen_7_mods,
+    "gen8": apply_gen_8_mods,
+}
+
+
+def get_generation(game_mode):
+    for generation in GENERATION_MODS:
+        if generation in game_mode:
+            return generation
+    return "gen{}".format(CURRENT_GEN)
+
+
+def get_generation_data(game_mode) -> GenerationData:
+    """
+    Returns the read-only data for the generation of `game_mode` (e.g. `gen4ou`)
+    The data for each generation is only built once and is shared by every caller
+    """
+    generation = get_generation(game_mode)
+    if generation not in _generation_data_cache:
+        data = _GenerationDataBuilder(generation)
+        if generation in GENERATION_MODS:
+            logger.info("Building data for {}".format(generation))
+            GENERATION_MODS[generation](data)
+        _generation_data_cache[generation] = data.build()
+
+    return _generation_data_cache[generation]
+
+
+def use_mods(game_mode):
+    """
+    Context manager that uses the data for `game_mode`'s generation in the current context
+    Used to run battles of different generations in the same process
+    """
+    return use_generation_data(get_generation_data(game_mode))
 
 
 def apply_mods(game_mode):
-    if "gen1" in game_mode:
-        apply_gen_1_mods()
-    if "gen2" in game_mode:
-        apply_gen_2_mods()
-    if "gen3" in game_mode:
-        apply_gen_3_mods()
-    if "gen4" in game_mode:
-        apply_gen_4_mods()
-    elif "gen5" in game_mode:
-        apply_gen_5_mods()
-    elif "gen6" in game_mode:
-        apply_gen_6_mods()
-    elif "gen7" in game_mode:
-        apply_gen_7_mods()
-    elif "gen8" in game_mode:
-        apply_gen_8_mods()
+    """
+    Sets the data for `game_mode`'s generation as the process-wide default
+    """
+    set_default_generation_data(get_generation_data(game_mode))
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import ntpath
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+from dataclasses import field
 
 import requests
 from dateutil import relativedelta
@@ -16,13 +18,20 @@ from typing import Optional
 
 
 import constants
-from data import all_move_json, pokedex
+from config import FoulPlayConfig
+from data.generation_data import current_generation_data
+from data.ids import MOVE_IDS
+from data.mods.apply_mods import use_mods
+from data.read_only import freeze
 from fp.helpers import calculate_stats
+from fp.metrics import SMOGON_STATS_CACHE
 from fp.helpers import normalize_name
 
 PWD = os.path.dirname(os.path.abspath(__file__))
 SMOGON_CACHE_DIR = os.path.join(PWD, "smogon_stats_cache")
 os.makedirs(SMOGON_CACHE_DIR, exist_ok=True)
+SMOGON_STATS_BASE_URL = "https://www.smogon.com/stats/"
+SMOGON_STATS_TIMEOUT_SEC = 30
 
 OTHER_STRING = "other"
 MOVES_STRING = "moves"
@@ -41,6 +50,65 @@ logger = logging.getLogger(__name__)
 PWD = os.path.dirname(os.path.abspath(__file__))
 
 
+_pkmn_name_aliases = {}
+
+
+def pkmn_name_aliases() -> dict[str, tuple[str, ...]]:
+    """
+    The other names a dataset may list a pokemon under, in the order they should be tried:
+    its base species and then its non-cosmetic forme
+
+    Built once per generation so lookups don't normalize pokedex names every time
+    """
+    generation_data = current_generation_data()
+    generation = generation_data.generation
+    if generation not in _pkmn_name_aliases:
+        aliases = {}
+        for pkmn_name, pkmn_data in generation_data.pokedex.items():
+            pkmn_aliases = []
+            for attribute in ("baseSpecies", "name"):
+                if attribute not in pkmn_data:
+                    continue
+                alias = normalize_name(pkmn_data[attribute])
+                if alias != pkmn_name and alias not in pkmn_aliases:
+                    pkmn_aliases.append(alias)
+            if pkmn_aliases:
+                aliases[pkmn_name] = tuple(pkmn_aliases)
+        _pkmn_name_aliases[generation] = aliases
+
+    return _pkmn_name_aliases[generation]
+
+
+_sets_files = {}
+
+
+def read_sets_file(file_name):
+    """
+    The read-only contents of `pkmn_sets/<file_name>`
+    Each file is only parsed once per process instead of once per battle
+    """
+    if file_name not in _sets_files:
+        with open(os.path.join(PWD, "pkmn_sets", file_name), "r") as f:
+            _sets_files[file_name] = freeze(json.load(f))
+    return _sets_files[file_name]
+
+
+def preload(pkmn_mode: str):
+    """
+    Loads the set file and lookups a battle in `pkmn_mode` uses
+    e.g. before forking bots so that they share them instead of each loading their own
+    """
+    if "random" in pkmn_mode:
+        file_name = "{}randombattle.json".format(pkmn_mode[:4])
+    else:
+        file_name = "{}.json".format(pkmn_mode)
+    if os.path.exists(os.path.join(PWD, "pkmn_sets", file_name)):
+        read_sets_file(file_name)
+
+    with use_mods(pkmn_mode):
+        pkmn_name_aliases()
+
+
 def spreads_are_alike(s1, s2):
     if s1[0] != s2[0]:
         return False
@@ -148,10 +216,22 @@ class PokemonSet:
         return ability_check and item_check and speed_check and tera_check
 
 
+def _move_ids(moves) -> frozenset[int]:
+    # names that aren't moves (e.g. a typo in a set file) can't match a pokemon's moves
+    return frozenset(
+        move_id for move_id in map(MOVE_IDS.get, moves) if move_id is not None
+    )
+
+
 @dataclass
 class PokemonMoveset:
     moves: Tuple[str, ...] | list[str]
     count: int = 1
+    # `MOVE_IDS` of `moves`, kept up to date by `add_move` and `remove_move`
+    move_ids: frozenset[int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.move_ids = _move_ids(self.moves)
 
     def full_set_pkmn_can_have_moves(self, pkmn: Pokemon) -> bool:
         for mv in pkmn.moves:
@@ -169,15 +249,17 @@ class PokemonMoveset:
                     pass
                 else:
                     return False
-            elif mv.name not in self.moves:
+            elif mv.id not in self.move_ids:
                 return False
         return True
 
     def add_move(self, mv: str):
         self.moves += (mv,)
+        self.move_ids = _move_ids(self.moves)
 
     def remove_move(self, mv: str):
         self.moves = tuple(m for m in self.moves if m != mv)
+        self.move_ids = _move_ids(self.moves)
 
     def __iter__(self):
         yield from self.moves
@@ -190,6 +272,7 @@ class PokemonSets(ABC):
     raw_pkmn_sets: dict[str, list]
     pkmn_sets: dict[str, list]
     pkmn_mode: str
+    unknown_pkmn_names: set[str]
 
     @abstractmethod
     def initialize(self, pkmn_mode: str, pkmn_names: set[str]): ...
@@ -197,23 +280,32 @@ class PokemonSets(ABC):
     @abstractmethod
     def predict_set(self, pkmn: Pokemon) -> Optional[PredictedPokemonSet]: ...
 
-    @staticmethod
-    def get_key_in_dict_from_pkmn_name(pkmn_name: str, pkmn_base_name: str, d: dict):
+    def _find_key_for_pkmn_name(
+        self, pkmn_name: str, pkmn_base_name: str, d: dict
+    ) -> Optional[str]:
         if pkmn_name in d:
-            return d[pkmn_name]
+            return pkmn_name
         elif pkmn_base_name in d:
-            return d[pkmn_base_name]
+            return pkmn_base_name
 
-        if pkmn_name in pokedex and "baseSpecies" in pokedex[pkmn_name]:
-            pkmn_base_species = normalize_name(pokedex[pkmn_name]["baseSpecies"])
-            if pkmn_base_species in d:
-                return d[pkmn_base_species]
+        for alias in pkmn_name_aliases().get(pkmn_name, ()):
+            if alias in d:
+                return alias
+
+        return None
+
+    def get_key_in_dict_from_pkmn_name(
+        self, pkmn_name: str, pkmn_base_name: str, d: dict
+    ):
+        # misses are remembered until a pokemon is added, this is called for every sampled battle
+        if pkmn_name in self.unknown_pkmn_names:
+            return []
 
-        if pkmn_name in pokedex and "name" in pokedex[pkmn_name]:
-            pkmn_non_cosmetic_name = normalize_name(pokedex[pkmn_name]["name"])
-            if pkmn_non_cosmetic_name in d:
-                return d[pkmn_non_cosmetic_name]
+        key = self._find_key_for_pkmn_name(pkmn_name, pkmn_base_name, d)
+        if key is not None:
+            return d[key]
 
+        self.unknown_pkmn_names.add(pkmn_name)
         logger.warning("Could not find key in dict for {}".format(pkmn_name))
         return []
 
@@ -223,20 +315,11 @@ class PokemonSets(ABC):
         )
 
     def get_raw_pkmn_sets_from_pkmn_name(self, pkmn_name: str, pkmn_base_name: str):
-        if pkmn_name in self.raw_pkmn_sets:
-            return self.raw_pkmn_sets[pkmn_name]
-        elif pkmn_base_name in self.raw_pkmn_sets:
-            return self.raw_pkmn_sets[pkmn_base_name]
-
-        if pkmn_name in pokedex and "baseSpecies" in pokedex[pkmn_name]:
-            pkmn_base_species = normalize_name(pokedex[pkmn_name]["baseSpecies"])
-            if pkmn_base_species in self.raw_pkmn_sets:
-                return self.raw_pkmn_sets[pkmn_base_species]
-
-        if pkmn_name in pokedex and "name" in pokedex[pkmn_name]:
-            pkmn_non_cosmetic_name = normalize_name(pokedex[pkmn_name]["name"])
-            if pkmn_non_cosmetic_name in self.raw_pkmn_sets:
-                return self.raw_pkmn_sets[pkmn_non_cosmetic_name]
+        key = self._find_key_for_pkmn_name(
+            pkmn_name, pkmn_base_name, self.raw_pkmn_sets
+        )
+        if key is not None:
+            return self.raw_pkmn_sets[key]
 
         return {}
 
@@ -246,16 +329,12 @@ class _RandomBattleSets(PokemonSets):
         self.raw_pkmn_sets = {}
         self.pkmn_sets = {}
         self.pkmn_mode = "uninitialized"
+        self.unknown_pkmn_names = set()
 
     def _load_raw_sets(self, generation):
         if generation.endswith("blitz"):
             generation = generation[:-5]
-        randombattle_sets_path = os.path.join(
-            PWD, f"pkmn_sets/{generation}randombattle.json"
-        )
-        with open(randombattle_sets_path, "r") as f:
-            sets = json.load(f)
-        self.raw_pkmn_sets = sets
+        self.raw_pkmn_sets = read_sets_file(f"{generation}randombattle.json")
 
     def _initialize_pkmn_sets(self):
         for pkmn, sets in self.raw_pkmn_sets.items():
@@ -288,9 +367,15 @@ class _RandomBattleSets(PokemonSets):
     def initialize(self, pkmn_mode: str, _pkmn_names=None):
         # pkmn_names unused here since randombattles don't have team preview
         # always load entire JSON into memory
+        # the sets are only read during a battle so they are kept for the next battle
+        if pkmn_mode == self.pkmn_mode and self.pkmn_sets:
+            self.unknown_pkmn_names = set()
+            return
+
         self.raw_pkmn_sets = {}
         self.pkmn_sets = {}
         self.pkmn_mode = pkmn_mode
+        self.unknown_pkmn_names = set()
         self._load_raw_sets(pkmn_mode)
         self._initialize_pkmn_sets()
 
@@ -362,28 +447,22 @@ class _TeamDatasets(PokemonSets):
         self.raw_pkmn_moves = {}
         self.pkmn_sets = {}
         self.pkmn_mode = "uninitialized"
+        self.unknown_pkmn_names = set()
+        # pkmn_mode -> a _TeamDatasets with every pokemon in that dataset, see `prewarm`
+        self.prewarmed = {}
 
     def _get_sets_dict(self):
         if not os.path.exists(os.path.join(PWD, f"pkmn_sets/{self.pkmn_mode}.json")):
             return {}
-        sets = os.path.join(PWD, f"pkmn_sets/{self.pkmn_mode}.json")
-        with open(sets, "r") as f:
-            sets_dict = json.load(f)["pokemon"]
-        return sets_dict
+        return read_sets_file(f"{self.pkmn_mode}.json")["pokemon"]
 
     def _get_moves_dict(self):
         if not os.path.exists(os.path.join(PWD, f"pkmn_sets/{self.pkmn_mode}.json")):
             return {}
-        sets = os.path.join(PWD, f"pkmn_sets/{self.pkmn_mode}.json")
-        with open(sets, "r") as f:
-            sets_dict = json.load(f)["moves"]
-        return sets_dict
+        return read_sets_file(f"{self.pkmn_mode}.json")["moves"]
 
     def _get_battle_factory_sets_dict(self, tier_name):
-        sets = os.path.join(PWD, f"pkmn_sets/{self.pkmn_mode}.json")
-        with open(sets, "r") as f:
-            sets_dict = json.load(f)[tier_name]
-        return sets_dict
+        return read_sets_file(f"{self.pkmn_mode}.json")[tier_name]
 
     def _load_battle_factory_team_datasets(self, pkmn_names: set[str], tier_name: str):
         sets_dict = self._get_battle_factory_sets_dict(tier_name)
@@ -436,12 +515,39 @@ class _TeamDatasets(PokemonSets):
                 )
             self.pkmn_sets[pkmn].sort(key=lambda x: x.pkmn_set.count, reverse=True)
 
+    def prewarm(self, pkmn_mode: str):
+        """
+        Builds the sets of every pokemon in `pkmn_mode`'s dataset
+        so that `initialize` only has to pick out the pokemon in a battle
+        """
+        if pkmn_mode in self.prewarmed:
+            return
+
+        prewarmed = _TeamDatasets()
+        prewarmed.pkmn_mode = pkmn_mode
+        prewarmed._load_team_datasets(set(prewarmed._get_sets_dict()), False)
+        prewarmed._add_to_pkmn_sets(prewarmed.raw_pkmn_sets)
+        self.prewarmed[pkmn_mode] = prewarmed
+
+    def _use_prewarmed_datasets(self, pkmn_names: set[str], get_all_pkmn: bool):
+        prewarmed = self.prewarmed[self.pkmn_mode]
+        iter_list = self._get_moves_dict().keys() if get_all_pkmn else pkmn_names
+        for pkmn in iter_list:
+            if pkmn not in prewarmed.pkmn_sets:
+                logger.warning("No pokemon sets for {}".format(pkmn))
+                continue
+            # copies of the lists so a battle changing them does not change the prewarmed ones
+            self.raw_pkmn_sets[pkmn] = prewarmed.raw_pkmn_sets[pkmn]
+            self.raw_pkmn_moves[pkmn] = list(prewarmed.raw_pkmn_moves[pkmn])
+            self.pkmn_sets[pkmn] = list(prewarmed.pkmn_sets[pkmn])
+
     def initialize(
         self, pkmn_mode: str, pkmn_names: set[str], battle_factory_tier_name=None
     ):
         self.raw_pkmn_sets = {}
         self.pkmn_sets = {}
         self.pkmn_mode = pkmn_mode
+        self.unknown_pkmn_names = set()
         get_all_pkmn = any(
             g in pkmn_mode
             for g in [
@@ -451,6 +557,10 @@ class _TeamDatasets(PokemonSets):
                 "gen4",
             ]
         )
+        if pkmn_mode in self.prewarmed and not battle_factory_tier_name:
+            self._use_prewarmed_datasets(pkmn_names, get_all_pkmn)
+            return
+
         if battle_factory_tier_name:
             self._load_battle_factory_team_datasets(
                 pkmn_names, battle_factory_tier_name
@@ -460,6 +570,7 @@ class _TeamDatasets(PokemonSets):
         self._add_to_pkmn_sets(self.raw_pkmn_sets)
 
     def add_new_pokemon(self, pkmn_name: str):
+        self.unknown_pkmn_names.clear()
         sets_dict = self._get_sets_dict()
         all_pkmn_moves = self._get_moves_dict()
         if pkmn_name not in sets_dict:
@@ -505,9 +616,12 @@ class _TeamDatasets(PokemonSets):
 
     def get_all_possible_move_combinations(self, pkmn: Pokemon, pkmn_set: PokemonSet):
         valid_movesets = []
-        for pkmn_moveset in self.get_key_in_dict_from_pkmn_name(
+        # not `get_key_in_dict_from_pkmn_name`, a pokemon with sets may have no movesets
+        # (e.g. battle factory) and must not be remembered as unknown
+        key = self._find_key_for_pkmn_name(
             pkmn.name, pkmn.base_name, self.raw_pkmn_moves
-        ):
+        )
+        for pkmn_moveset in self.raw_pkmn_moves[key] if key is not None else []:
             if PredictedPokemonSet(
                 pkmn_set=pkmn_set, pkmn_moveset=pkmn_moveset
             ).full_set_pkmn_can_have_set(pkmn):
@@ -550,10 +664,15 @@ class _SmogonSets(PokemonSets):
         self.all_pkmn_counts = {}
         self.pkmn_sets = {}
         self.pkmn_mode = "uninitialized"
+        self.unknown_pkmn_names = set()
+        self.prefetch_tasks = {}
+        # smogon stats url -> every pokemon's information, see `prewarm`
+        self.all_pokemon_information = {}
 
     def _smogon_predicted_move_set_makes_sense(
         self, predicted_set: PredictedPokemonSet
     ):
+        generation_data = current_generation_data()
         has_hiddenpower = False
         for mv in predicted_set.pkmn_moveset.moves:
             # only 1 hiddenpower in a moveset
@@ -564,7 +683,7 @@ class _SmogonSets(PokemonSets):
 
             # dont pick certain moves with choice items
             if predicted_set.pkmn_set.item in constants.CHOICE_ITEMS:
-                if all_move_json[mv][
+                if generation_data.all_move_json[mv][
                     constants.CATEGORY
                 ] not in constants.DAMAGING_CATEGORIES and mv not in [
                     "trick",
@@ -578,56 +697,122 @@ class _SmogonSets(PokemonSets):
             n.startswith(normalized_name) for n in list_of_pkmn_names
         )
 
+    def _download_smogon_stats_json(self, smogon_stats_url) -> Optional[dict]:
+        """
+        Fetches the "data" section of a smogon stats file, returning None if it does not exist
+
+        If SMOGON_STATS_MIRROR is set the file is read from that directory (or HTTP server)
+        instead of smogon.com. The mirror uses the same `<year>-<month>/chaos/<format>-0.json`
+        layout as smogon.com
+        """
+        mirror = FoulPlayConfig.smogon_stats_mirror
+        relative_path = smogon_stats_url.removeprefix(SMOGON_STATS_BASE_URL)
+        if mirror is None:
+            url = smogon_stats_url
+        elif mirror.startswith(("http://", "https://")):
+            url = "{}/{}".format(mirror.rstrip("/"), relative_path)
+        else:
+            mirror_file = os.path.join(mirror, *relative_path.split("/"))
+            if not os.path.exists(mirror_file):
+                return None
+            with open(mirror_file, "r") as f:
+                return json.load(f)["data"]
+
+        logger.info("Downloading smogon stats from {}".format(url))
+        r = requests.get(url, timeout=SMOGON_STATS_TIMEOUT_SEC)
+        if r.status_code == 404:
+            return None
+        return r.json()["data"]
+
     def _get_smogon_stats_json(self, smogon_stats_url):
         cache_file_name = ntpath.basename(smogon_stats_url)
         cache_file = os.path.join(SMOGON_CACHE_DIR, cache_file_name)
         if os.path.exists(cache_file):
+            SMOGON_STATS_CACHE.inc(result="hit")
             with open(cache_file, "r") as f:
                 infos = json.load(f)
         else:
-            r = requests.get(smogon_stats_url)
-            if r.status_code == 404:
-                r = requests.get(
+            SMOGON_STATS_CACHE.inc(result="miss")
+            infos = self._download_smogon_stats_json(smogon_stats_url)
+            if infos is None:
+                infos = self._download_smogon_stats_json(
                     self._get_smogon_stats_file_name(
                         ntpath.basename(smogon_stats_url.replace("-0.json", "")),
                         month_delta=2,
                     )
                 )
-            infos = r.json()["data"]
-            with open(cache_file, "w") as f:
+            if infos is None:
+                raise ValueError(
+                    "No smogon stats found for {}".format(smogon_stats_url)
+                )
+
+            # write-then-rename so a concurrent reader never sees a partial file
+            tmp_cache_file = "{}.{}.tmp".format(cache_file, os.getpid())
+            with open(tmp_cache_file, "w") as f:
                 json.dump(infos, f)
+            os.replace(tmp_cache_file, cache_file)
 
         return infos
 
-    def _get_pokemon_information(self, smogon_stats_url, pkmn_names) -> dict:
-        infos = self._get_smogon_stats_json(smogon_stats_url)
-        self.all_pkmn_counts.clear()
+    def _prefetch_smogon_stats_json(self, smogon_stats_url) -> bool:
+        try:
+            self._get_smogon_stats_json(smogon_stats_url)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning(
+                "Could not prefetch smogon stats {}: {}".format(smogon_stats_url, e)
+            )
+            return False
+        return True
 
-        final_infos = {}
+    def start_prefetch(self, pkmn_mode: str) -> asyncio.Future:
+        """
+        Starts warming the smogon stats cache for `pkmn_mode` in a background thread
+        Must be called from a running event loop. Calls for the same file share one download,
+        a download that failed is tried again by the next call
+        """
+        smogon_stats_url = self._get_smogon_stats_file_name(pkmn_mode)
+        if smogon_stats_url not in self.prefetch_tasks:
+            task = asyncio.ensure_future(
+                asyncio.to_thread(self._prefetch_smogon_stats_json, smogon_stats_url)
+            )
+            task.add_done_callback(
+                lambda t: self._forget_failed_prefetch(smogon_stats_url, t)
+            )
+            self.prefetch_tasks[smogon_stats_url] = task
+        return self.prefetch_tasks[smogon_stats_url]
+
+    def _forget_failed_prefetch(self, smogon_stats_url, task: asyncio.Future):
+        if task.cancelled() or task.exception() is not None or not task.result():
+            if self.prefetch_tasks.get(smogon_stats_url) is task:
+                del self.prefetch_tasks[smogon_stats_url]
+
+    def warm_cache(self, pkmn_mode: str):
+        """
+        Downloads the smogon stats for `pkmn_mode` to the cache if they are not there already
+        """
+        self._prefetch_smogon_stats_json(self._get_smogon_stats_file_name(pkmn_mode))
+
+    async def prefetch(self, pkmn_mode: str):
+        """
+        Waits for the smogon stats cache for `pkmn_mode` to be warm
+        so that `initialize` does not download anything on the event loop
+        """
+        await self.start_prefetch(pkmn_mode)
+
+    def _build_pokemon_information(self, smogon_stats_url) -> tuple[dict, dict]:
+        infos = self._get_smogon_stats_json(smogon_stats_url)
+        all_pkmn_counts = {}
+        all_infos = {}
         for pkmn_name, pkmn_information in infos.items():
             normalized_name = normalize_name(pkmn_name)
-            self.all_pkmn_counts[normalized_name] = {}
-            self.all_pkmn_counts[normalized_name][RAW_COUNT] = pkmn_information[
-                "Raw count"
-            ]
-            self.all_pkmn_counts[normalized_name][TEAMMATES] = {}
+            all_pkmn_counts[normalized_name] = {}
+            all_pkmn_counts[normalized_name][RAW_COUNT] = pkmn_information["Raw count"]
+            all_pkmn_counts[normalized_name][TEAMMATES] = {}
             for teammate_name, teammate_count in pkmn_information["Teammates"].items():
-                self.all_pkmn_counts[normalized_name][TEAMMATES][
+                all_pkmn_counts[normalized_name][TEAMMATES][
                     normalize_name(teammate_name)
                 ] = teammate_count
 
-            # if `pkmn_names` is provided, only find data on pkmn in that list
-            if (
-                pkmn_names
-                and normalized_name not in pkmn_names
-                and not self._pokemon_is_similar(normalized_name, pkmn_names)
-            ):
-                continue
-            else:
-                logger.debug(
-                    "Adding {} to sets lookup for this battle".format(normalized_name)
-                )
-
             spreads = []
             items = []
             moves = []
@@ -635,16 +820,15 @@ class _SmogonSets(PokemonSets):
             tera_types = []
             matchup_effectiveness = {}
             total_count = pkmn_information["Raw count"]
-            final_infos[normalized_name] = {}
+            all_infos[normalized_name] = {}
 
+            # narrowed to the pokemon in a battle by `_get_pokemon_information`
             for counter_name, counter_information in pkmn_information[
                 "Checks and Counters"
             ].items():
-                counter_name = normalize_name(counter_name)
-                if counter_name in pkmn_names:
-                    matchup_effectiveness[counter_name] = round(
-                        1 - counter_information[1], 2
-                    )
+                matchup_effectiveness[normalize_name(counter_name)] = round(
+                    1 - counter_information[1], 2
+                )
 
             for spread, count in sorted(
                 pkmn_information["Spreads"].items(), key=lambda x: x[1], reverse=True
@@ -667,7 +851,7 @@ class _SmogonSets(PokemonSets):
             for move, count in pkmn_information["Moves"].items():
                 if count > 0 and move and move.lower() != "nothing":
                     if move.startswith(constants.HIDDEN_POWER):
-                        move = f"{move}{constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING}"
+                        move = f"{move}{current_generation_data().hidden_power_active_move_base_damage_string}"
                     moves.append((move, count / total_count))
 
             for ability, count in pkmn_information["Abilities"].items():
@@ -680,22 +864,72 @@ class _SmogonSets(PokemonSets):
                 if count > 0:
                     tera_types.append((tera_type, count / total_count))
 
-            final_infos[normalized_name][SPREADS_STRING] = sorted(
+            all_infos[normalized_name][SPREADS_STRING] = sorted(
                 spreads, key=lambda x: x[2], reverse=True
             )[:20]
-            final_infos[normalized_name][ITEM_STRING] = sorted(
+            all_infos[normalized_name][ITEM_STRING] = sorted(
                 items, key=lambda x: x[1], reverse=True
             )[:10]
-            final_infos[normalized_name][MOVES_STRING] = sorted(
+            all_infos[normalized_name][MOVES_STRING] = sorted(
                 moves, key=lambda x: x[1], reverse=True
             )[:100]
-            final_infos[normalized_name][ABILITY_STRING] = sorted(
+            all_infos[normalized_name][ABILITY_STRING] = sorted(
                 abilities, key=lambda x: x[1], reverse=True
             )
-            final_infos[normalized_name][TERA_TYPE_STRING] = sorted(
+            all_infos[normalized_name][TERA_TYPE_STRING] = sorted(
                 tera_types, key=lambda x: x[1], reverse=True
             )[:6]
-            final_infos[normalized_name][EFFECTIVENESS] = matchup_effectiveness
+            all_infos[normalized_name][EFFECTIVENESS] = matchup_effectiveness
+
+        return all_infos, all_pkmn_counts
+
+    def _all_pokemon_information(self, smogon_stats_url) -> tuple[dict, dict]:
+        """
+        The information of every pokemon in the smogon stats file and their teammate counts
+        Only the last file used is kept
+        """
+        if smogon_stats_url not in self.all_pokemon_information:
+            self.all_pokemon_information = {
+                smogon_stats_url: self._build_pokemon_information(smogon_stats_url)
+            }
+        return self.all_pokemon_information[smogon_stats_url]
+
+    def prewarm(self, pkmn_mode: str):
+        """
+        Reads the smogon stats for `pkmn_mode` so that `initialize` only has to pick out the pokemon in a battle
+        """
+        try:
+            self._all_pokemon_information(self._get_smogon_stats_file_name(pkmn_mode))
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning("Could not prewarm smogon stats {}: {}".format(pkmn_mode, e))
+
+    def _get_pokemon_information(self, smogon_stats_url, pkmn_names) -> dict:
+        all_infos, all_pkmn_counts = self._all_pokemon_information(smogon_stats_url)
+        self.all_pkmn_counts.clear()
+        self.all_pkmn_counts.update(all_pkmn_counts)
+
+        final_infos = {}
+        for normalized_name, pkmn_information in all_infos.items():
+            # if `pkmn_names` is provided, only find data on pkmn in that list
+            if (
+                pkmn_names
+                and normalized_name not in pkmn_names
+                and not self._pokemon_is_similar(normalized_name, pkmn_names)
+            ):
+                continue
+            else:
+                logger.debug(
+                    "Adding {} to sets lookup for this battle".format(normalized_name)
+                )
+
+            final_infos[normalized_name] = dict(pkmn_information)
+            final_infos[normalized_name][EFFECTIVENESS] = {
+                counter_name: effectiveness
+                for counter_name, effectiveness in pkmn_information[
+                    EFFECTIVENESS
+                ].items()
+                if counter_name in pkmn_names
+            }
 
         return final_infos
 
@@ -757,6 +991,7 @@ class _SmogonSets(PokemonSets):
 
     def initialize(self, pkmn_mode: str, pkmn_names: set[str]):
         self.pkmn_mode = pkmn_mode
+        self.unknown_pkmn_names = set()
         smogon_stats_url = self._get_smogon_stats_file_name(pkmn_mode)
         if self.current_pkmn_sets_url != smogon_stats_url:
             self.raw_pkmn_sets = self._get_pokemon_information(
@@ -773,6 +1008,7 @@ class _SmogonSets(PokemonSets):
         self._initialize(self.raw_pkmn_sets)
 
     def add_new_pokemon(self, pkmn_name: str):
+        self.unknown_pkmn_names.clear()
         pkmn_information = self._get_pokemon_information(
             self.current_pkmn_sets_url, {pkmn_name}
         )
@@ -828,7 +1064,7 @@ class _SmogonSets(PokemonSets):
 
         if pkmn.get_move(constants.HIDDEN_POWER) is not None:
             hidden_power_possibilities = [
-                f"{constants.HIDDEN_POWER}{p}{constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING}"
+                f"{constants.HIDDEN_POWER}{p}{current_generation_data().hidden_power_active_move_base_damage_string}"
                 for p in pkmn.hidden_power_possibilities
             ]
             for mv, _count in self.get_raw_pkmn_sets_from_pkmn_name(
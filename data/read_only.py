@@ -0,0 +1,73 @@
+from copy import deepcopy
+
+
+def _read_only(self, *_args, **_kwargs):
+    raise TypeError("{} is read-only".format(type(self).__name__))
+
+
+class ReadOnlyDict(dict):
+    """
+    A dict that raises TypeError when it is mutated
+
+    Copies (`copy`/`deepcopy`) are regular, mutable dicts
+    so code that copies data before changing it keeps working
+    """
+
+    __setitem__ = _read_only
+    __delitem__ = _read_only
+    __ior__ = _read_only
+    clear = _read_only
+    pop = _read_only
+    popitem = _read_only
+    setdefault = _read_only
+    update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return {k: deepcopy(v, memo) for k, v in self.items()}
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+class ReadOnlyList(list):
+    """
+    A list that raises TypeError when it is mutated
+
+    Copies (`copy`/`deepcopy`) are regular, mutable lists
+    """
+
+    __setitem__ = _read_only
+    __delitem__ = _read_only
+    __iadd__ = _read_only
+    __imul__ = _read_only
+    append = _read_only
+    extend = _read_only
+    insert = _read_only
+    pop = _read_only
+    remove = _read_only
+    clear = _read_only
+    sort = _read_only
+    reverse = _read_only
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return [deepcopy(v, memo) for v in self]
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+
+def freeze(obj):
+    """
+    Recursively converts the dicts and lists in a JSON-like object into read-only versions
+    """
+    if isinstance(obj, dict):
+        return ReadOnlyDict((k, freeze(v)) for k, v in obj.items())
+    elif isinstance(obj, list):
+        return ReadOnlyList(freeze(v) for v in obj)
+    return obj
@@ -0,0 +1,288 @@
+"""
+Runs many bots, each with its own account and format, from one supervisor process
+
+The supervisor loads the data the bots use (pokedex, moves, set datasets, smogon stats)
+once and then forks one process per bot, so the bots share that memory instead of each loading
+their own copy. Searches share a budget of cores, crashed bots are restarted,
+and the wins, losses and decision latency of every bot are collected in one report
+
+`fleet.json` is a list with the environment variables of each bot,
+anything they have in common can be set in the environment or the `env` file:
+
+    [
+        {"PS_USERNAME": "bot1", "PS_PASSWORD": "...", "POKEMON_MODE": "gen9randombattle"},
+        {"PS_USERNAME": "bot2", "PS_PASSWORD": "...", "POKEMON_MODE": "gen9ou", "TEAM_NAME": "gen9/ou"}
+    ]
+
+    python fleet.py fleet.json --cpus 8
+"""
+
+import argparse
+import asyncio
+import gc
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+
+from config import FoulPlayConfig
+from data.mods.apply_mods import get_generation_data
+from data.pkmn_sets import SmogonSets
+from data.pkmn_sets import preload
+from fp.cpu_budget import CpuBudget
+from fp.cpu_budget import set_cpu_budget
+from fp.metrics import EVENT_LISTENERS
+from local_server import latency_summary
+from run import run_foul_play
+
+logger = logging.getLogger(__name__)
+
+
+def bot_config(bot_env) -> dict:
+    # the bot's own variables take precedence over the supervisor's environment
+    return {**os.environ, **bot_env}
+
+
+def prewarm(bot_envs):
+    """
+    Loads everything the bots share before they are forked
+    """
+    for bot_env in bot_envs:
+        config = bot_config(bot_env)
+        pokemon_mode = config["POKEMON_MODE"]
+        importlib.import_module("fp.battle_bots.{}.main".format(config["BATTLE_BOT"]))
+        get_generation_data(pokemon_mode)
+        preload(pokemon_mode)
+        if "random" not in pokemon_mode and "battlefactory" not in pokemon_mode:
+            FoulPlayConfig.smogon_stats_mirror = config.get("SMOGON_STATS_MIRROR")
+            SmogonSets.warm_cache(config.get("SMOGON_STATS") or pokemon_mode)
+
+    # objects the collector tracks are written to when it runs,
+    # which would copy the shared pages into every bot
+    gc.collect()
+    gc.freeze()
+
+
+def run_bot(bot_env, slot, events, cpu_budget):
+    """
+    The entry point of a forked bot process
+    """
+    os.environ.update(bot_env)
+    logging.getLogger().handlers.clear()
+    set_cpu_budget(cpu_budget, slot)
+    name = bot_env["PS_USERNAME"]
+    EVENT_LISTENERS.append(lambda event: events.put({"bot": name, **event}))
+    asyncio.run(run_foul_play())
+
+
+class Bot:
+    def __init__(self, slot, env):
+        self.slot = slot
+        self.env = env
+        self.name = env["PS_USERNAME"]
+        config = bot_config(env)
+        self.pokemon_mode = config["POKEMON_MODE"]
+        self.run_count = int(config.get("RUN_COUNT", 1))
+        self.process = None
+        self.restarts = 0
+        self.restart_at = None
+        self.done = False
+        self.wins = 0
+        self.losses = 0
+        self.latencies_ms = []
+
+    def battles_left(self):
+        return self.run_count - self.wins - self.losses
+
+
+class Fleet:
+    def __init__(
+        self, bot_envs, cpus, max_restarts=5, first_backoff_seconds=1, target=run_bot
+    ):
+        self.context = multiprocessing.get_context("fork")
+        self.bots = [Bot(slot, env) for slot, env in enumerate(bot_envs)]
+        self.cpu_budget = CpuBudget(cpus, len(self.bots), self.context)
+        self.events = self.context.Queue()
+        self.max_restarts = max_restarts
+        self.first_backoff_seconds = first_backoff_seconds
+        self.target = target
+
+    def start(self, bot: Bot):
+        # a restarted bot only plays the battles it has left
+        env = dict(bot.env, RUN_COUNT=str(bot.battles_left()))
+        bot.process = self.context.Process(
+            target=self.target,
+            args=(env, bot.slot, self.events, self.cpu_budget),
+            name=bot.name,
+        )
+        bot.process.start()
+        bot.restart_at = None
+
+    def record(self, event):
+        bot = next(b for b in self.bots if b.name == event["bot"])
+        if "decision_ms" in event:
+            bot.latencies_ms.append(event["decision_ms"])
+            return
+
+        if event["won"]:
+            bot.wins += 1
+        else:
+            bot.losses += 1
+        logger.info("{}: W: {}\tL: {}".format(bot.name, bot.wins, bot.losses))
+
+    def check(self):
+        """
+        Restarts bots that crashed, once they have waited out their backoff
+        """
+        for bot in self.bots:
+            if bot.done:
+                continue
+
+            if bot.restart_at is not None:
+                if time.monotonic() >= bot.restart_at:
+                    self.start(bot)
+                continue
+
+            if bot.process.exitcode is None:
+                continue
+
+            self.cpu_budget.reclaim(bot.slot)
+            if bot.process.exitcode == 0 or bot.battles_left() <= 0:
+                bot.done = True
+            elif bot.restarts >= self.max_restarts:
+                logger.error(
+                    "{} exited with {} and was restarted {} times, giving up".format(
+                        bot.name, bot.process.exitcode, bot.restarts
+                    )
+                )
+                bot.done = True
+            else:
+                backoff = min(self.first_backoff_seconds * 2**bot.restarts, 60)
+                logger.warning(
+                    "{} exited with {}, restarting in {}s".format(
+                        bot.name, bot.process.exitcode, backoff
+                    )
+                )
+                bot.restarts += 1
+                bot.restart_at = time.monotonic() + backoff
+
+    def drain(self, timeout):
+        try:
+            self.record(self.events.get(timeout=timeout))
+            while True:
+                self.record(self.events.get_nowait())
+        except queue.Empty:
+            pass
+
+    def run(self):
+        for bot in self.bots:
+            self.start(bot)
+        try:
+            while not all(bot.done for bot in self.bots):
+                self.drain(timeout=1)
+                self.check()
+        finally:
+            self.stop()
+        # events sent just before a bot exited
+        self.drain(timeout=0.1)
+
+    def stop(self):
+        for bot in self.bots:
+            if bot.process is not None and bot.process.is_alive():
+                bot.process.terminate()
+        for bot in self.bots:
+            if bot.process is not None:
+                bot.process.join()
+
+    def report(self, seconds) -> dict:
+        bots = {}
+        formats = {}
+        latencies = []
+        for bot in self.bots:
+            bots[bot.name] = {
+                "format": bot.pokemon_mode,
+                "wins": bot.wins,
+                "losses": bot.losses,
+                "restarts": bot.restarts,
+                "decisions": len(bot.latencies_ms),
+                "latency_ms": latency_summary(bot.latencies_ms)
+                if bot.latencies_ms
+                else None,
+            }
+            results = formats.setdefault(bot.pokemon_mode, {"wins": 0, "losses": 0})
+            results["wins"] += bot.wins
+            results["losses"] += bot.losses
+            latencies.extend(bot.latencies_ms)
+
+        for results in formats.values():
+            battles = results["wins"] + results["losses"]
+            results["win_rate"] = (
+                round(results["wins"] / battles, 4) if battles else None
+            )
+
+        wins = sum(b.wins for b in self.bots)
+        battles = wins + sum(b.losses for b in self.bots)
+        return {
+            "seconds": round(seconds, 3),
+            "cpus": self.cpu_budget.cores,
+            "battles": battles,
+            "win_rate": round(wins / battles, 4) if battles else None,
+            "decisions": len(latencies),
+            "latency_ms": latency_summary(latencies) if latencies else None,
+            "formats": formats,
+            "bots": bots,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("bots", help="JSON file with the environment of each bot")
+    parser.add_argument(
+        "--cpus",
+        type=int,
+        default=os.cpu_count(),
+        help="cores the searches of all bots may use at once",
+    )
+    parser.add_argument(
+        "--max-restarts",
+        type=int,
+        default=5,
+        help="times a bot is restarted after crashing before it is given up on",
+    )
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-8s %(message)s")
+    with open(args.bots) as f:
+        bot_envs = [
+            {key: str(value) for key, value in bot_env.items()}
+            for bot_env in json.load(f)
+        ]
+
+    start = time.perf_counter()
+    prewarm(bot_envs)
+    logger.info(
+        "Loaded data in {}s, starting {} bots".format(
+            round(time.perf_counter() - start, 3), len(bot_envs)
+        )
+    )
+
+    fleet = Fleet(bot_envs, args.cpus, args.max_restarts)
+    try:
+        fleet.run()
+    except KeyboardInterrupt:
+        pass
+
+    result = json.dumps(fleet.report(time.perf_counter() - start), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result)
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 from collections import defaultdict
 from collections import namedtuple
+from contextlib import contextmanager
 from abc import ABC
 from abc import abstractmethod
 
 import constants
 import logging
+import pickle
 from config import FoulPlayConfig
 
-from data import all_move_json
-from data import pokedex
+from data.generation_data import current_generation_data
+from data.ids import MOVE_IDS
 
 from fp.helpers import get_pokemon_info_from_condition
 from fp.helpers import normalize_name
@@ -24,7 +26,7 @@ LastUsedMove = namedtuple("LastUsedMove", ["pokemon_name", "move", "turn"])
 DamageDealt = namedtuple(
     "DamageDealt", ["attacker", "defender", "move", "percent_damage", "crit"]
 )
-StatRange = namedtuple("Range", ["min", "max"])
+StatRange = namedtuple("StatRange", ["min", "max"])
 
 
 # Based on the format, this dict controls which pokemon will be replaced during team preview
@@ -39,6 +41,28 @@ smart_team_preview = {
 }
 
 
+@contextmanager
+def trial_mutations(*objects):
+    """
+    Restores the attributes of `objects` when the context exits so they can be
+    changed in place for a trial (e.g. `set_spread` or a different item) instead of deepcopied
+
+    Only attribute assignments are undone: a list or dict that is changed
+    in place (e.g. `pkmn.moves.append(...)`) stays changed
+    """
+    snapshots = [(obj, dict(vars(obj))) for obj in objects if obj is not None]
+    try:
+        yield
+    finally:
+        for obj, attributes in snapshots:
+            current = vars(obj)
+            for name in [n for n in current if n not in attributes]:
+                del current[name]
+            for name, value in attributes.items():
+                if name not in current or current[name] is not value:
+                    current[name] = value
+
+
 boost_multiplier_lookup = {
     -6: 2 / 8,
     -5: 2 / 7,
@@ -86,6 +110,22 @@ class Battle(ABC):
         self.request_json = None
         self.msg_list = []
 
+        # see `fp.battle_history.BattleHistory`
+        self.history = None
+
+    def __getstate__(self):
+        # the history holds snapshots of this battle, copies of the battle don't need it
+        state = self.__dict__.copy()
+        state["history"] = None
+        return state
+
+    def snapshot(self):
+        """
+        A copy of the battle for a bot to search from, the bot can change it freely
+        Round-tripping through pickle is several times faster than `deepcopy` for a battle
+        """
+        return pickle.loads(pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL))
+
     def initialize_team_preview(self, opponent_pokemon, battle_type):
         self.user.reserve.insert(0, self.user.active)
         self.user.active = None
@@ -175,15 +215,29 @@ class Battle(ABC):
 
         return int(boosted_speed)
 
+    def trial_mutations(self):
+        """
+        `trial_mutations` for the battle, both sides and all of their pokemon
+        """
+        return trial_mutations(
+            self, *self.user.trial_objects(), *self.opponent.trial_objects()
+        )
+
     @abstractmethod
     def find_best_move(self): ...
 
+    @classmethod
+    def prewarm(cls):
+        """
+        Called while waiting for a battle to start anything `find_best_move` uses (e.g. worker processes)
+        """
+
 
 class Battler:
     def __init__(self):
         self.active = None
         self.reserve = []
-        self.side_conditions = defaultdict(lambda: 0)
+        self.side_conditions = defaultdict(int)
 
         self.name = None
         self.trapped = False
@@ -201,6 +255,9 @@ class Battler:
         self.last_selected_move = LastUsedMove("", "", 0)
         self.last_used_move = LastUsedMove("", "", 0)
 
+    def trial_objects(self):
+        return [self, self.active, *self.reserve]
+
     def num_fainted_pkmn(self):
         num_fainted = 0
         for pkmn in self.reserve + [self.active]:
@@ -219,8 +276,11 @@ class Battler:
         return None
 
     def find_reserve_pkmn_by_unknown_forme(self, pkmn_name):
+        generation_data = current_generation_data()
         for reserve_pkmn in filter(lambda x: x.unknown_forme, self.reserve):
-            pkmn_base_forme = normalize_name(pokedex[pkmn_name].get("changesFrom", ""))
+            pkmn_base_forme = normalize_name(
+                generation_data.pokedex[pkmn_name].get("changesFrom", "")
+            )
             if pkmn_base_forme == reserve_pkmn.base_name:
                 return reserve_pkmn
         return None
@@ -239,9 +299,13 @@ class Battler:
                     m.disabled = True
 
     def lock_active_pkmn_status_moves_if_active_has_assaultvest(self):
+        generation_data = current_generation_data()
         if self.active.item == "assaultvest":
             for m in self.active.moves:
-                if all_move_json[m.name][constants.CATEGORY] == constants.STATUS:
+                if (
+                    generation_data.all_move_json[m.name][constants.CATEGORY]
+                    == constants.STATUS
+                ):
                     m.disabled = True
 
     def choice_lock_moves(self):
@@ -264,9 +328,13 @@ class Battler:
                     m.disabled = True
 
     def taunt_lock_moves(self):
+        generation_data = current_generation_data()
         if constants.TAUNT in self.active.volatile_statuses:
             for m in self.active.moves:
-                if all_move_json[m.name][constants.CATEGORY] == constants.STATUS:
+                if (
+                    generation_data.all_move_json[m.name][constants.CATEGORY]
+                    == constants.STATUS
+                ):
                     m.disabled = True
 
     def locked_move_lock(self):
@@ -377,7 +445,7 @@ class Battler:
             pkmn.hp, pkmn.max_hp, pkmn.status = get_pokemon_info_from_condition(
                 pkmn_dict[constants.CONDITION]
             )
-            pkmn.ability = pkmn_dict[constants.REQUEST_DICT_ABILITY]
+            pkmn.ability = pkmn_dict[current_generation_data().request_dict_ability]
             pkmn.item = pkmn_dict[constants.ITEM] if pkmn_dict[constants.ITEM] else None
             for stat, number in pkmn_dict[constants.STATS].items():
                 pkmn.stats[constants.STAT_ABBREVIATION_LOOKUPS[stat]] = number
@@ -387,7 +455,10 @@ class Battler:
         Re-initializes the active pokemon based on the last request JSON that was received
         This is useful when the bot's active pkmn has mega-evolved. We need to get the new stats/hp
         """
-        pokedex_name = normalize_name(pokedex[self.active.name][constants.NAME])
+        generation_data = current_generation_data()
+        pokedex_name = normalize_name(
+            generation_data.pokedex[self.active.name][constants.NAME]
+        )
         request_json_active_pkmn = [
             p
             for p in request_json["side"]["pokemon"]
@@ -444,7 +515,7 @@ class Battler:
                 pkmn = Pokemon("zaciancrowned", pkmn.level)
                 pkmn.nickname = nickname
 
-            pkmn.ability = pkmn_dict[constants.REQUEST_DICT_ABILITY]
+            pkmn.ability = pkmn_dict[current_generation_data().request_dict_ability]
             pkmn.index = index + 1
             pkmn.reviving = pkmn_dict.get(constants.REVIVING, False)
             pkmn.hp, pkmn.max_hp, pkmn.status = get_pokemon_info_from_condition(
@@ -492,6 +563,7 @@ class Battler:
 
 class Pokemon:
     def __init__(self, name: str, level: int, nature="serious", evs=(85,) * 6):
+        generation_data = current_generation_data()
         self.name = normalize_name(name)
         self.nickname = None
         self.base_name = self.name
@@ -502,12 +574,14 @@ class Pokemon:
         self.hidden_power_possibilities = set(POKEMON_TYPE_INDICES.keys())
 
         try:
-            self.base_stats = pokedex[self.name][constants.BASESTATS]
+            self.base_stats = generation_data.pokedex[self.name][constants.BASESTATS]
         except KeyError:
             logger.info("Could not pokedex entry for {}".format(self.name))
-            self.name = [k for k in pokedex if self.name.startswith(k)][0]
+            self.name = next(
+                k for k in generation_data.pokedex if self.name.startswith(k)
+            )
             logger.info("Using {} instead".format(self.name))
-            self.base_stats = pokedex[self.name][constants.BASESTATS]
+            self.base_stats = generation_data.pokedex[self.name][constants.BASESTATS]
 
         self.stats = calculate_stats(
             self.base_stats, self.level, nature=nature, evs=evs
@@ -521,7 +595,7 @@ class Pokemon:
             self.hp = 1
 
         self.ability = None
-        self.types = pokedex[self.name][constants.TYPES]
+        self.types = generation_data.pokedex[self.name][constants.TYPES]
         self.item = constants.UNKNOWN_ITEM
         self.removed_item = None
         self.unknown_forme = False
@@ -538,8 +612,8 @@ class Pokemon:
         self.moves = []
         self.status = None
         self.volatile_statuses = []
-        self.volatile_status_durations = defaultdict(lambda: 0)
-        self.boosts = defaultdict(lambda: 0)
+        self.volatile_status_durations = defaultdict(int)
+        self.boosts = defaultdict(int)
         self.rest_turns = 0
         self.sleep_turns = 0
         self.knocked_off = False
@@ -633,17 +707,22 @@ class Pokemon:
             return None
 
     def remove_move(self, move_name: str):
+        move_id = MOVE_IDS.get(move_name)
         for mv in self.moves:
-            if mv.name == move_name:
+            if mv.id == move_id:
                 self.moves.remove(mv)
                 return True
         return False
 
     def get_move(self, move_name: str):
+        move_id = MOVE_IDS.get(normalize_name(move_name))
         for m in self.moves:
-            if m.name == normalize_name(move_name):
+            if m.id == move_id:
                 return m
-            elif m.name.startswith(constants.HIDDEN_POWER) and move_name.startswith(
+
+        # any hidden power or return is the one the pokemon has, e.g. `hiddenpower` for `hiddenpowerfire60`
+        for m in self.moves:
+            if m.name.startswith(constants.HIDDEN_POWER) and move_name.startswith(
                 constants.HIDDEN_POWER
             ):
                 return m
@@ -669,17 +748,20 @@ class Pokemon:
 
 class Move:
     def __init__(self, name):
+        generation_data = current_generation_data()
         name = normalize_name(name)
+        hidden_power_base_damage = (
+            generation_data.hidden_power_active_move_base_damage_string
+        )
         if (
             constants.HIDDEN_POWER != name
             and constants.HIDDEN_POWER in name
-            and not name.endswith(constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING)
+            and not name.endswith(hidden_power_base_damage)
         ):
-            name = "{}{}".format(
-                name, constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING
-            )
-        move_json = all_move_json[name]
-        self.name = name
+            name = "{}{}".format(name, hidden_power_base_damage)
+        move_json = generation_data.all_move_json[name]
+        self.id = MOVE_IDS.id(name)
+        self.name = MOVE_IDS.name(self.id)
         self.max_pp = int(move_json.get(constants.PP) * 1.6)
 
         self.disabled = False
@@ -687,7 +769,7 @@ class Move:
         self.current_pp = self.max_pp
 
     def __eq__(self, other):
-        return self.name == other.name
+        return self.id == other.id
 
     def __repr__(self):
         return "{}".format(self.name)
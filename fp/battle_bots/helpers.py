@@ -9,6 +9,9 @@ logger = logging.getLogger(__name__)
 
 
 def log_predicted_set(pkmn, source=None):
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     s = "Predicted set: {} {} {} {} {} {}".format(
         pkmn.name.rjust(15),
         pkmn.nature.ljust(7),
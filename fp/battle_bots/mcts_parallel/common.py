@@ -8,6 +8,9 @@ logger = logging.getLogger(__name__)
 
 
 def log_pkmn_set(pkmn: Pokemon, source=None):
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     nature_evs = f"{pkmn.nature},{','.join(str(x) for x in pkmn.evs)}"
     if nature_evs in ["serious,85,85,85,85,85,85", "serious,252,252,252,252,252,252"]:
         s = "\t{} {} {} {}".format(
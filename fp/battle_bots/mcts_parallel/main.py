@@ -1,5 +1,7 @@
 import logging
+import threading
 from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from poke_engine import MctsResult
 
@@ -14,12 +16,23 @@ from poke_engine import (
     monte_carlo_tree_search,
 )
 
-from ..poke_engine_helpers import battle_to_poke_engine_state
+from fp.metrics import WORKER_POOL_STARTS
+from fp.tracing import Lazy
+from fp.tracing import debug
+from fp.tracing import decision_timings
+from ..poke_engine_helpers import battles_to_poke_engine_states
 
 logger = logging.getLogger(__name__)
 
 
 def select_move_from_mcts_results(mcts_results: list[(MctsResult, float, int)]) -> str:
+    return mcts_policy(mcts_results)[0][0]
+
+
+def mcts_policy(mcts_results: list[(MctsResult, float, int)]) -> list[(str, float)]:
+    """
+    The visits of each move across every sampled battle, weighted by how likely that battle is
+    """
     final_policy = {}
     for mcts_result, sample_chance, index in mcts_results:
         this_policy = max(mcts_result.side_one, key=lambda x: x.visits)
@@ -39,20 +52,52 @@ def select_move_from_mcts_results(mcts_results: list[(MctsResult, float, int)])
 
     final_policy = sorted(final_policy.items(), key=lambda x: x[1], reverse=True)
     logger.info("Final policy: {}".format(final_policy))
-    return final_policy[0][0]
+    return final_policy
 
 
 def get_result_from_mcts(
     poke_engine_state: PokeEngineState, search_time_ms: int, index: int
 ) -> MctsResult:
-    state_string = poke_engine_state.to_string()
-    logger.debug("Calling with {} state: {}".format(index, state_string))
+    debug(logger, "Calling with {} state: {}", index, Lazy(poke_engine_state.to_string))
 
     res = monte_carlo_tree_search(poke_engine_state, search_time_ms)
     logger.info("Iterations {}: {}".format(index, res.total_visits))
     return res
 
 
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def worker_pool() -> ProcessPoolExecutor:
+    """
+    The processes searches run in, started once and kept for every decision
+    """
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            WORKER_POOL_STARTS.inc()
+            _worker_pool = ProcessPoolExecutor(max_workers=FoulPlayConfig.parallelism)
+        return _worker_pool
+
+
+def restart_worker_pool():
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is not None:
+            _worker_pool.shutdown(wait=False, cancel_futures=True)
+        _worker_pool = None
+
+
+def search_states(states, chances, search_time_ms) -> list[(MctsResult, float, int)]:
+    futures = []
+    for index, (state, chance) in enumerate(zip(states, chances)):
+        fut = worker_pool().submit(get_result_from_mcts, state, search_time_ms, index)
+        futures.append((fut, chance, index))
+
+    return [(fut.result(), chance, index) for (fut, chance, index) in futures]
+
+
 class BattleBot(Battle):
     def __init__(self, *args, **kwargs):
         super(BattleBot, self).__init__(*args, **kwargs)
@@ -99,7 +144,13 @@ class BattleBot(Battle):
         else:
             return FoulPlayConfig.parallelism, FoulPlayConfig.search_time_ms
 
+    @classmethod
+    def prewarm(cls):
+        # the workers are started by the first task
+        worker_pool().submit(int).result()
+
     def find_best_move(self):
+        timings = decision_timings()
         if self.team_preview:
             self.user.active = self.user.reserve.pop(0)
             self.opponent.active = self.opponent.reserve.pop(0)
@@ -108,17 +159,20 @@ class BattleBot(Battle):
             num_battles, search_time_per_battle = (
                 self._search_time_num_battles_randombattles()
             )
-            battles = prepare_random_battles(self, num_battles)
+            with timings.phase("sample", num_battles=num_battles):
+                battles = prepare_random_battles(self, num_battles)
         elif self.battle_type == constants.BATTLE_FACTORY:
             num_battles, search_time_per_battle = (
                 self._search_time_num_battles_standard_battle()
             )
-            battles = prepare_random_battles(self, num_battles)
+            with timings.phase("sample", num_battles=num_battles):
+                battles = prepare_random_battles(self, num_battles)
         elif self.battle_type == constants.STANDARD_BATTLE:
             num_battles, search_time_per_battle = (
                 self._search_time_num_battles_standard_battle()
             )
-            battles = prepare_battles(self, num_battles)
+            with timings.phase("sample", num_battles=num_battles):
+                battles = prepare_battles(self, num_battles)
         else:
             raise ValueError("Unsupported battle type: {}".format(self.battle_type))
 
@@ -128,21 +182,33 @@ class BattleBot(Battle):
                 num_battles, search_time_per_battle
             )
         )
-        with ProcessPoolExecutor(max_workers=FoulPlayConfig.parallelism) as executor:
-            futures = []
-            for index, (b, chance) in enumerate(battles):
-                fut = executor.submit(
-                    get_result_from_mcts,
-                    battle_to_poke_engine_state(b),
-                    search_time_per_battle,
-                    index,
-                )
-                futures.append((fut, chance, index))
-
-        mcts_results = [
-            (fut.result(), chance, index) for (fut, chance, index) in futures
+        with timings.phase("convert", num_battles=num_battles):
+            states = battles_to_poke_engine_states([b for b, _ in battles])
+        # includes pickling the states to the worker processes
+        with timings.phase(
+            "search", num_battles=num_battles, search_time_ms=search_time_per_battle
+        ):
+            chances = [chance for _, chance in battles]
+            try:
+                mcts_results = search_states(states, chances, search_time_per_battle)
+            except BrokenProcessPool:
+                logger.warning("A search worker died, restarting the workers")
+                restart_worker_pool()
+                mcts_results = search_states(states, chances, search_time_per_battle)
+        with timings.phase("aggregate", num_battles=num_battles):
+            policy = mcts_policy(mcts_results)
+        choice = policy[0][0]
+
+        timings.fields["policy"] = {move: round(weight, 4) for move, weight in policy}
+        timings.fields["num_battles"] = num_battles
+        timings.fields["search_time_ms"] = search_time_per_battle
+        timings.fields["iterations"] = sum(
+            result.total_visits for result, _, _ in mcts_results
+        )
+        timings.fields["iterations_per_second"] = [
+            round(result.total_visits * 1000 / search_time_per_battle)
+            for result, _, _ in mcts_results
         ]
-        choice = select_move_from_mcts_results(mcts_results)
         logger.info("Choice: {}".format(choice))
 
         if self.team_preview:
@@ -3,7 +3,7 @@ import random
 from copy import deepcopy
 
 import constants
-from data import all_move_json
+from data.generation_data import current_generation_data
 from fp.battle_bots.mcts_parallel.random_battles import (
     populate_pkmn_from_set,
 )
@@ -36,13 +36,16 @@ TRICKABLE_ITEMS = {
 
 
 def physical_boosting_move(mv: str, predicted_pkmn_set: PredictedPokemonSet) -> bool:
+    generation_data = current_generation_data()
     if predicted_pkmn_set.pkmn_set.item in constants.CHOICE_ITEMS:
         return False
 
     # do not allow more than 1 non-physical move, excluding the boosting move
     if (
         sum(
-            m != mv and all_move_json[m][constants.CATEGORY] != constants.PHYSICAL
+            m != mv
+            and generation_data.all_move_json[m][constants.CATEGORY]
+            != constants.PHYSICAL
             for m in predicted_pkmn_set.pkmn_moveset.moves
         )
         > 1
@@ -53,13 +56,16 @@ def physical_boosting_move(mv: str, predicted_pkmn_set: PredictedPokemonSet) ->
 
 
 def special_boosting_move(mv: str, predicted_pkmn_set: PredictedPokemonSet) -> bool:
+    generation_data = current_generation_data()
     if predicted_pkmn_set.pkmn_set.item in constants.CHOICE_ITEMS:
         return False
 
     # do not allow more than 1 non-special move, excluding the boosting move
     if (
         sum(
-            m != mv and all_move_json[m][constants.CATEGORY] != constants.SPECIAL
+            m != mv
+            and generation_data.all_move_json[m][constants.CATEGORY]
+            != constants.SPECIAL
             for m in predicted_pkmn_set.pkmn_moveset.moves
         )
         > 1
@@ -70,6 +76,7 @@ def special_boosting_move(mv: str, predicted_pkmn_set: PredictedPokemonSet) -> b
 
 
 def choice_item(predicted_pkmn_set: PredictedPokemonSet):
+    generation_data = current_generation_data()
     item = predicted_pkmn_set.pkmn_set.item
     match item:
         case "choiceband":
@@ -83,7 +90,9 @@ def choice_item(predicted_pkmn_set: PredictedPokemonSet):
 
     num_illogical_moves = 0
     for mv in predicted_pkmn_set.pkmn_moveset.moves:
-        if all_move_json[mv][constants.CATEGORY] not in logical_moves and mv not in [
+        if generation_data.all_move_json[mv][
+            constants.CATEGORY
+        ] not in logical_moves and mv not in [
             "trick",
             "switcheroo",
             "flipturn",
@@ -96,6 +105,7 @@ def choice_item(predicted_pkmn_set: PredictedPokemonSet):
 
 
 def smogon_set_makes_sense(predicted_pkmn_set: PredictedPokemonSet):
+    generation_data = current_generation_data()
     match predicted_pkmn_set.pkmn_set.item:
         case "toxicorb":
             if predicted_pkmn_set.pkmn_set.ability not in [
@@ -123,7 +133,8 @@ def smogon_set_makes_sense(predicted_pkmn_set: PredictedPokemonSet):
 
         case "assaultvest":
             if predicted_pkmn_set.pkmn_set.ability != "klutz" and any(
-                all_move_json[mv][constants.CATEGORY] == constants.STATUS
+                generation_data.all_move_json[mv][constants.CATEGORY]
+                == constants.STATUS
                 for mv in predicted_pkmn_set.pkmn_moveset.moves
             ):
                 return False
@@ -291,7 +302,7 @@ def set_most_likely_hidden_power(pkmn: Pokemon):
     # be replaced by the most likely hiddenpower that is still possible
     if pkmn.get_move(constants.HIDDEN_POWER) is not None:
         hidden_power_possibilities = [
-            f"{constants.HIDDEN_POWER}{p}{constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING}"
+            f"{constants.HIDDEN_POWER}{p}{current_generation_data().hidden_power_active_move_base_damage_string}"
             for p in pkmn.hidden_power_possibilities
         ]
         for mv, _count in SmogonSets.get_raw_pkmn_sets_from_pkmn_name(
@@ -3,6 +3,7 @@ import logging
 import constants
 from fp.battle import Battle
 from config import FoulPlayConfig
+from fp.tracing import decision_timings
 
 from ..helpers import (
     fill_in_standardbattle_unknowns,
@@ -22,6 +23,7 @@ class BattleBot(Battle):
         super(BattleBot, self).__init__(*args, **kwargs)
 
     def find_best_move(self):
+        timings = decision_timings()
         if self.team_preview:
             self.user.active = self.user.reserve.pop(0)
             self.opponent.active = self.opponent.reserve.pop(0)
@@ -33,13 +35,19 @@ class BattleBot(Battle):
         else:
             fn = fill_in_standardbattle_unknowns
 
-        battle = prepare_battle(self, fn)
+        with timings.phase("sample"):
+            battle = prepare_battle(self, fn)
 
         logger.info("Searching for a move using Expectiminimax...")
-        choice = get_payoff_matrix_with_minimax(
-            battle_to_poke_engine_state(battle),
-            search_time_ms=FoulPlayConfig.search_time_ms,
-        )
+        with timings.phase("convert"):
+            state = battle_to_poke_engine_state(battle)
+        with timings.phase("search", search_time_ms=FoulPlayConfig.search_time_ms):
+            choice = get_payoff_matrix_with_minimax(
+                state,
+                search_time_ms=FoulPlayConfig.search_time_ms,
+            )
+        timings.fields["num_battles"] = 1
+        timings.fields["search_time_ms"] = FoulPlayConfig.search_time_ms
         logger.info("Choice: {}".format(choice))
 
         if self.team_preview:
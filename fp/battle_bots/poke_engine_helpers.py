@@ -1,8 +1,13 @@
 import logging
+from functools import lru_cache
 
 import constants
-from data import pokedex
+from data.generation_data import current_generation_data
 from fp.battle import Battle, Pokemon, Battler, LastUsedMove
+from fp.metrics import DAMAGE_ROLLS_CACHE
+from fp.metrics import register_lru_cache
+from fp.tracing import Lazy
+from fp.tracing import debug
 
 from poke_engine import (
     State as PokeEngineState,
@@ -48,9 +53,7 @@ def pokemon_to_poke_engine_pkmn(pkmn: Pokemon):
     if pkmn.knocked_off or pkmn.item == "" or pkmn.item is None:
         pkmn.item = "None"
 
-    base_types = pokedex[str(pkmn.name)][constants.TYPES]
-    num_moves = len(pkmn.moves)
-    if num_moves > 4:
+    if len(pkmn.moves) > 4:
         logger.warning(
             "More than 4 moves on pokemon: {} moves: {}".format(
                 pkmn.name, [m.name for m in pkmn.moves]
@@ -58,35 +61,94 @@ def pokemon_to_poke_engine_pkmn(pkmn: Pokemon):
         )
         logger.warning("Truncating moves to first 4")
         pkmn.moves = pkmn.moves[:4]
+
+    return _poke_engine_pkmn(
+        current_generation_data().generation,
+        str(pkmn.name),
+        pkmn.level,
+        tuple(pkmn.types),
+        int(pkmn.hp),
+        int(pkmn.max_hp),
+        str(pkmn.ability),
+        pkmn.original_ability,
+        str(pkmn.item),
+        pkmn.nature,
+        tuple(pkmn.evs),
+        tuple(
+            pkmn.stats[stat]
+            for stat in [
+                constants.ATTACK,
+                constants.DEFENSE,
+                constants.SPECIAL_ATTACK,
+                constants.SPECIAL_DEFENSE,
+                constants.SPEED,
+            ]
+        ),
+        status_to_string(pkmn.status),
+        pkmn.rest_turns,
+        pkmn.sleep_turns,
+        tuple((str(m.name), m.disabled, m.current_pp) for m in pkmn.moves),
+        pkmn.tera_type or "typeless",
+        pkmn.terastallized,
+    )
+
+
+@lru_cache(maxsize=4096)
+def _poke_engine_pkmn(
+    generation,
+    name,
+    level,
+    types,
+    hp,
+    max_hp,
+    ability,
+    original_ability,
+    item,
+    nature,
+    evs,
+    stats,
+    status,
+    rest_turns,
+    sleep_turns,
+    moves,
+    tera_type,
+    terastallized,
+):
+    # the engine's pokemon is only rebuilt when one of the values it is built from changes,
+    # otherwise the same object is shared by every state (e.g. the bot's side in each sampled battle)
+    # `generation` is part of the cache key because the pokedex is different for each generation
+    generation_data = current_generation_data()
+    attack, defense, special_attack, special_defense, speed = stats
     p = PokeEnginePokemon(
-        id=str(pkmn.name),
-        level=pkmn.level,
-        types=pkmn.types,
-        base_types=base_types,
-        hp=int(pkmn.hp),
-        maxhp=int(pkmn.max_hp),
-        ability=str(pkmn.ability),
-        base_ability=pkmn.original_ability,
-        item=str(pkmn.item),
-        nature=pkmn.nature,
-        evs=tuple(pkmn.evs),
-        attack=pkmn.stats[constants.ATTACK],
-        defense=pkmn.stats[constants.DEFENSE],
-        special_attack=pkmn.stats[constants.SPECIAL_ATTACK],
-        special_defense=pkmn.stats[constants.SPECIAL_DEFENSE],
-        speed=pkmn.stats[constants.SPEED],
-        status=status_to_string(pkmn.status),
-        rest_turns=pkmn.rest_turns,
-        sleep_turns=pkmn.sleep_turns,
-        weight_kg=float(pokedex[pkmn.name][constants.WEIGHT]),
+        id=name,
+        level=level,
+        types=list(types),
+        base_types=generation_data.pokedex[name][constants.TYPES],
+        hp=hp,
+        maxhp=max_hp,
+        ability=ability,
+        base_ability=original_ability,
+        item=item,
+        nature=nature,
+        evs=evs,
+        attack=attack,
+        defense=defense,
+        special_attack=special_attack,
+        special_defense=special_defense,
+        speed=speed,
+        status=status,
+        rest_turns=rest_turns,
+        sleep_turns=sleep_turns,
+        weight_kg=float(generation_data.pokedex[name][constants.WEIGHT]),
         moves=[
-            PokeEngineMove(id=str(m.name), disabled=m.disabled, pp=m.current_pp)
-            for m in pkmn.moves
+            PokeEngineMove(id=move_name, disabled=disabled, pp=pp)
+            for move_name, disabled, pp in moves
         ],
-        tera_type=pkmn.tera_type or "typeless",
-        terastallized=pkmn.terastallized,
+        tera_type=tera_type,
+        terastallized=terastallized,
     )
 
+    num_moves = len(moves)
     while num_moves < 4:
         p.moves.append(PokeEngineMove(id="none", disabled=True, pp=0))
         num_moves += 1
@@ -94,10 +156,23 @@ def pokemon_to_poke_engine_pkmn(pkmn: Pokemon):
     return p
 
 
+register_lru_cache("poke_engine_pokemon", _poke_engine_pkmn)
+
+
 def get_dummy_poke_engine_pkmn():
     return PokeEnginePokemon(id="pikachu", level=1, hp=0)
 
 
+def get_substitute_health(pkmn: Pokemon):
+    # substitute health can't be known with certainty but the client can keep track of if the substitute was hit
+    # to approximate: the substitute health is 1/10 of the pokemon's max_hp if it was hit, 1/4 if it wasn't
+    if constants.SUBSTITUTE not in pkmn.volatile_statuses:
+        return 0
+    if pkmn.substitute_hit:
+        return int(pkmn.max_hp / 10)
+    return int(pkmn.max_hp / 4)
+
+
 def battler_to_poke_engine_side(
     battler: Battler, force_switch=False, stayed_in_on_switchout_move=False
 ):
@@ -114,15 +189,6 @@ def battler_to_poke_engine_side(
         else:
             last_used_move = "move:0"
 
-    # substitute health can't be known with certainty but the client can keep track of if the substitute was hit
-    # to approximate: the substitute health is 1/10 of the pokemon's max_hp if it was hit, 1/4 if it wasn't
-    substitute_health = 0
-    if constants.SUBSTITUTE in battler.active.volatile_statuses:
-        if battler.active.substitute_hit:
-            substitute_health = int(battler.active.max_hp / 10)
-        else:
-            substitute_health = int(battler.active.max_hp / 4)
-
     future_sight_index = 0
     if battler.future_sight[0] > 0:
         if battler.active.name == battler.future_sight[1]:
@@ -184,7 +250,7 @@ def battler_to_poke_engine_side(
             taunt=battler.active.volatile_status_durations[constants.TAUNT],
             yawn=battler.active.volatile_status_durations[constants.YAWN],
         ),
-        substitute_health=substitute_health,
+        substitute_health=get_substitute_health(battler.active),
         attack_boost=battler.active.boosts[constants.ATTACK],
         defense_boost=battler.active.boosts[constants.DEFENSE],
         special_attack_boost=battler.active.boosts[constants.SPECIAL_ATTACK],
@@ -279,7 +345,7 @@ def replace_return_last_used_move(battler: Battler):
         )
 
 
-def battle_to_poke_engine_state(battle: Battle, swap=False):
+def battle_to_poke_engine_state(battle: Battle, swap=False, user_side=None):
     # Boolean that represents if we have used a switch-out move first (i.e. fast uturn)
     # this is toggled to True if we did, and signifies to the engine that the opponent has
     # selected a move and that should be accounted for in the search
@@ -299,9 +365,11 @@ def battle_to_poke_engine_state(battle: Battle, swap=False):
     if battle.user.last_used_move.move == "return":
         replace_return_last_used_move(battle.user)
 
-    side_one = battler_to_poke_engine_side(
-        battle.user, force_switch=battle.force_switch
-    )
+    if user_side is None:
+        user_side = battler_to_poke_engine_side(
+            battle.user, force_switch=battle.force_switch
+        )
+    side_one = user_side
     side_two = battler_to_poke_engine_side(
         battle.opponent, stayed_in_on_switchout_move=opponent_switchout_move_stayed_in
     )
@@ -324,6 +392,21 @@ def battle_to_poke_engine_state(battle: Battle, swap=False):
     return state
 
 
+def battles_to_poke_engine_states(battles: list[Battle]):
+    """
+    Converts battles that only differ in the opponent's side, e.g. battles sampled from the same battle
+    The bot's side is converted once and shared by every state
+    """
+    states = []
+    user_side = None
+    for battle in battles:
+        state = battle_to_poke_engine_state(battle, user_side=user_side)
+        user_side = state.side_one
+        states.append(state)
+
+    return states
+
+
 def poke_engine_get_damage_rolls(
     battle: Battle, side_one_move, side_two_move, side_one_went_first
 ):
@@ -334,13 +417,13 @@ def poke_engine_get_damage_rolls(
 
     state = battle_to_poke_engine_state(battle)
 
-    logger.debug(
-        "Calling calculate damage with state: {}, m1: {}, m2: {}, s1_went_first: {}".format(
-            state.to_string(),
-            side_one_move,
-            side_two_move,
-            side_one_went_first,
-        )
+    debug(
+        logger,
+        "Calling calculate damage with state: {}, m1: {}, m2: {}, s1_went_first: {}",
+        Lazy(state.to_string),
+        side_one_move,
+        side_two_move,
+        side_one_went_first,
     )
 
     s1_rolls, s2_rolls = calculate_damage(
@@ -350,21 +433,92 @@ def poke_engine_get_damage_rolls(
         side_one_went_first,
     )
 
-    logger.debug(
-        "Got Rolls s1_rolls: {}, s2_rolls: {}".format(
-            s1_rolls,
-            s2_rolls,
-        )
-    )
+    debug(logger, "Got Rolls s1_rolls: {}, s2_rolls: {}", s1_rolls, s2_rolls)
 
     return s1_rolls, s2_rolls
 
 
+class OpponentSetDamageRolls:
+    """
+    Damage rolls for many possible sets of the opponent's active pokemon in the same battle
+
+    The state is built once and only the opponent's active pokemon is replaced for each set,
+    rolls are remembered for every set that has already been seen with the same moves
+    Meant to live for a single damage check: the rest of `battle` must not change in between
+    """
+
+    def __init__(self, battle: Battle):
+        self.battle = battle
+        self.state = None
+        self.rolls = {}
+
+    def _set_key(self, pkmn: Pokemon):
+        return (
+            pkmn.ability,
+            pkmn.item,
+            pkmn.hp,
+            pkmn.max_hp,
+            pkmn.nature,
+            tuple(pkmn.evs),
+            tuple(pkmn.stats.items()),
+        )
+
+    def _get_state(self):
+        opponent_active = self.battle.opponent.active
+        if self.state is None:
+            self.state = battle_to_poke_engine_state(self.battle)
+            debug(
+                logger,
+                "Calculating damage rolls with state: {}",
+                Lazy(self.state.to_string),
+            )
+        else:
+            self.state.side_two.pokemon[0] = pokemon_to_poke_engine_pkmn(
+                opponent_active
+            )
+            self.state.side_two.substitute_health = get_substitute_health(
+                opponent_active
+            )
+        return self.state
+
+    def get(self, side_one_move, side_two_move, side_one_went_first):
+        if side_one_move.startswith("switch"):
+            side_one_move = "switch"
+        if side_two_move.startswith("switch"):
+            side_two_move = "switch"
+
+        key = (
+            side_one_move,
+            side_two_move,
+            side_one_went_first,
+            self._set_key(self.battle.opponent.active),
+        )
+        if key in self.rolls:
+            DAMAGE_ROLLS_CACHE.inc(result="hit")
+        else:
+            DAMAGE_ROLLS_CACHE.inc(result="miss")
+            self.rolls[key] = calculate_damage(
+                self._get_state(),
+                side_one_move,
+                side_two_move,
+                side_one_went_first,
+            )
+            debug(
+                logger,
+                "Got Rolls for m1: {}, m2: {}, s1_went_first: {}, s1_rolls: {}, s2_rolls: {}",
+                side_one_move,
+                side_two_move,
+                side_one_went_first,
+                *self.rolls[key],
+            )
+
+        return self.rolls[key]
+
+
 def get_payoff_matrix_from_mcts(
     poke_engine_state: PokeEngineState, search_time_ms: int
 ):
-    state_string = poke_engine_state.to_string()
-    logger.debug("Calling with state: {}".format(state_string))
+    debug(logger, "Calling with state: {}", Lazy(poke_engine_state.to_string))
 
     mcts_result = monte_carlo_tree_search(poke_engine_state, search_time_ms)
 
@@ -393,8 +547,7 @@ def get_payoff_matrix_from_mcts(
 def get_payoff_matrix_with_minimax(
     poke_engine_state: PokeEngineState, search_time_ms: int
 ):
-    state_string = poke_engine_state.to_string()
-    logger.debug("Calling with state: {}".format(state_string))
+    debug(logger, "Calling with state: {}", Lazy(poke_engine_state.to_string))
 
     id_result = iterative_deepening_expectiminimax(poke_engine_state, search_time_ms)
 
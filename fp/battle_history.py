@@ -0,0 +1,98 @@
+import bisect
+import logging
+import pickle
+import zlib
+from typing import NamedTuple
+
+from fp.battle import Battle
+from fp.battle import LastUsedMove
+from fp.battle_modifier import update_battle
+from fp.battle_modifier import without_dataset_updates
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL = 5
+
+
+class HistoryEntry(NamedTuple):
+    msg: str
+    last_selected_move: LastUsedMove
+    turn: int
+
+
+class Snapshot(NamedTuple):
+    num_entries: int
+    turn: int
+    data: bytes
+
+
+def _dump_battle(battle: Battle) -> bytes:
+    return zlib.compress(pickle.dumps(battle, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _load_battle(data: bytes) -> Battle:
+    return pickle.loads(zlib.decompress(data))
+
+
+class BattleHistory:
+    """
+    Append-only log of every message given to `update_battle` for one battle,
+    with a compressed snapshot of the battle every `snapshot_interval` turns
+
+    `state_at(turn)` rebuilds the battle as it was right after the update that started `turn`
+    by replaying the messages after the nearest snapshot. The bot's selected move is
+    recorded with each message because it is set outside of the battle modifiers
+
+    The set datasets (e.g. `TeamDatasets`) are not part of the history and are shared by
+    every battle, so replaying leaves them as they are
+    """
+
+    def __init__(self, battle: Battle, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.snapshot_interval = snapshot_interval
+        self.entries = []
+        self.snapshots = []
+        self.turn_starts = {battle.turn: 0}
+        self.take_snapshot(battle)
+
+    def take_snapshot(self, battle: Battle):
+        self.snapshots.append(
+            Snapshot(len(self.entries), battle.turn, _dump_battle(battle))
+        )
+
+    def record(self, battle: Battle, msg: str):
+        self.entries.append(
+            HistoryEntry(msg, battle.user.last_selected_move, battle.turn)
+        )
+        if battle.turn not in self.turn_starts:
+            self.turn_starts[battle.turn] = len(self.entries)
+            if battle.turn - self.snapshots[-1].turn >= self.snapshot_interval:
+                self.take_snapshot(battle)
+
+    def turns(self):
+        return sorted(self.turn_starts)
+
+    def state_at(self, turn) -> Battle:
+        try:
+            num_entries = self.turn_starts[turn]
+        except KeyError:
+            raise ValueError(
+                "No state for turn {}, known turns: {}".format(turn, self.turns())
+            )
+
+        snapshot_index = (
+            bisect.bisect_right([s.num_entries for s in self.snapshots], num_entries)
+            - 1
+        )
+        snapshot = self.snapshots[snapshot_index]
+        battle = _load_battle(snapshot.data)
+        logger.debug(
+            "Rebuilding turn {} from the snapshot of turn {} and {} messages".format(
+                turn, snapshot.turn, num_entries - snapshot.num_entries
+            )
+        )
+        with without_dataset_updates():
+            for entry in self.entries[snapshot.num_entries : num_entries]:
+                battle.user.last_selected_move = entry.last_selected_move
+                update_battle(battle, entry.msg)
+
+        return battle
@@ -0,0 +1,291 @@
+import gzip
+import json
+import logging
+import re
+from typing import Iterator
+from typing import NamedTuple
+
+import constants
+from data.pkmn_sets import RandomBattleTeamDatasets
+from data.pkmn_sets import SmogonSets
+from data.pkmn_sets import TeamDatasets
+from fp.battle import Battle
+from fp.battle import LastUsedMove
+from fp.battle_history import BattleHistory
+from fp.battle_modifier import process_battle_updates
+from fp.battle_modifier import update_battle
+from fp.helpers import normalize_name
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE_SUFFIXES = (".log", ".log.gz")
+
+RECEIVED = "received"
+SENT = "sent"
+
+# these are logged by PSWebsocketClient
+RECEIVED_PREFIX = "Received message from websocket: "
+SENT_PREFIX = "Sending message to websocket: "
+
+# every record in a log file starts with its level, see config.CustomFormatter
+LOG_RECORD_START = re.compile(r"^(DEBUG|INFO|WARNING|ERROR|CRITICAL) +")
+
+# these are logged by the battle bots for every search they run
+SEARCH_STATE = re.compile(r"^Calling with (?:\d+ )?state: (.+)$")
+SEARCH_CHOICE = re.compile(r"^Choice: (.+?)(?:, -?[\d.]+)?$")
+TURN_LINE = re.compile(r"^\|turn\|(\d+)")
+
+CHOICE_FLAGS = {
+    constants.MEGA,
+    constants.ULTRA_BURST,
+    constants.DYNAMAX,
+    constants.TERASTALLIZE,
+    constants.ZMOVE,
+}
+
+
+def open_log(path):
+    # finished battle logs are gzipped when COMPRESS_LOGS=True
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+
+class LogRecord(NamedTuple):
+    direction: str
+    message: str
+
+
+class LoggedSearch(NamedTuple):
+    turn: int
+    states: list[str]
+    choice: str
+
+
+def read_battle_log(path) -> list[LogRecord]:
+    """
+    Reads the websocket messages out of a battle's log file (written with LOG_TO_FILE=True)
+    Messages span multiple lines so every line up to the next log record belongs to the message
+    """
+    records = []
+    direction = None
+    message_lines = []
+
+    def finish_record():
+        if direction is not None:
+            records.append(LogRecord(direction, "\n".join(message_lines)))
+
+    with open_log(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            match = LOG_RECORD_START.match(line)
+            if match is None:
+                if direction is not None:
+                    message_lines.append(line)
+                continue
+
+            finish_record()
+            text = line[match.end() :]
+            if text.startswith(RECEIVED_PREFIX):
+                direction = RECEIVED
+                message_lines = [text[len(RECEIVED_PREFIX) :]]
+            elif text.startswith(SENT_PREFIX):
+                direction = SENT
+                message_lines = [text[len(SENT_PREFIX) :]]
+            else:
+                direction = None
+
+    finish_record()
+    return records
+
+
+def read_logged_searches(path) -> list[LoggedSearch]:
+    """
+    Reads the engine states each decision searched, and the move the bot chose,
+    out of a battle's log file (written with LOG_TO_FILE=True)
+    """
+    searches = []
+    turn = 0
+    states = []
+    with open_log(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            match = LOG_RECORD_START.match(line)
+            if match is None:
+                turn_match = TURN_LINE.match(line)
+                if turn_match is not None:
+                    turn = int(turn_match.group(1))
+                continue
+
+            text = line[match.end() :]
+            state_match = SEARCH_STATE.match(text)
+            if state_match is not None:
+                states.append(state_match.group(1))
+                continue
+
+            choice_match = SEARCH_CHOICE.match(text)
+            if choice_match is not None and states:
+                searches.append(LoggedSearch(turn, states, choice_match.group(1)))
+                states = []
+
+    return searches
+
+
+def get_battle_tag(records: list[LogRecord]):
+    for record in records:
+        if record.direction == RECEIVED and record.message.startswith(">battle-"):
+            return record.message.split("\n")[0][1:].strip()
+    return None
+
+
+def get_pokemon_battle_type(battle_tag: str):
+    # battle-gen9randombattle-12345
+    return battle_tag.split("-")[1]
+
+
+def _last_selected_move(battle: Battle, choice: str):
+    # the inverse of `fp.battle_bots.helpers.format_decision`
+    split_choice = choice.split()
+    if split_choice[0] == "/switch":
+        for pkmn in battle.user.reserve:
+            if pkmn.index == int(split_choice[1]):
+                return LastUsedMove(
+                    battle.user.active.name,
+                    "{} {}".format(constants.SWITCH_STRING, pkmn.name),
+                    battle.turn,
+                )
+        return battle.user.last_selected_move
+
+    move_name = normalize_name(
+        " ".join(w for w in split_choice[2:] if w not in CHOICE_FLAGS)
+    )
+    return LastUsedMove(battle.user.active.name, move_name, battle.turn)
+
+
+def _initialize_datasets(battle, pokemon_battle_type, battle_factory_tier, smogon):
+    if battle.battle_type == constants.RANDOM_BATTLE:
+        RandomBattleTeamDatasets.initialize(battle.generation)
+        return
+
+    pkmn_names = set(
+        p.name
+        for p in battle.opponent.reserve + battle.user.reserve + [battle.user.active]
+        if p is not None
+    )
+    if battle.battle_type == constants.BATTLE_FACTORY:
+        TeamDatasets.initialize(
+            pokemon_battle_type,
+            pkmn_names,
+            battle_factory_tier_name=battle_factory_tier,
+        )
+    else:
+        if smogon:
+            SmogonSets.initialize(pokemon_battle_type, pkmn_names)
+        TeamDatasets.initialize(pokemon_battle_type, pkmn_names)
+
+
+def replay_battle(
+    battle: Battle, records: list[LogRecord], smogon=False
+) -> Iterator[str]:
+    """
+    Replays the messages in `records` into `battle` the same way `fp.run_battle` applies them
+
+    Yields each choice the bot sent (e.g. `/choose move tackle`) with `battle` in the state
+    it was in when the choice was made, and then applies that choice as the last selected move
+
+    Smogon sets are only loaded when `smogon` is True since they may need to be downloaded
+    """
+    pokemon_battle_type = get_pokemon_battle_type(battle.battle_tag)
+    battle.generation = pokemon_battle_type[:4]
+    if "random" in pokemon_battle_type:
+        battle.battle_type = constants.RANDOM_BATTLE
+    elif "battlefactory" in pokemon_battle_type:
+        battle.battle_type = constants.BATTLE_FACTORY
+    else:
+        battle.battle_type = constants.STANDARD_BATTLE
+
+    first_request = None
+    start_lines = None
+    team_preview_lines = None
+    battle_factory_tier = None
+    room_prefix = ">{}".format(battle.battle_tag)
+
+    for record in records:
+        if record.direction == SENT:
+            room, _, choice = record.message.partition("|")
+            choice = choice.split("|")[0]
+            if room != battle.battle_tag or not battle.started:
+                continue
+            if choice.startswith("/choose") or choice.startswith("/switch"):
+                yield choice
+                battle.user.last_selected_move = _last_selected_move(battle, choice)
+            elif choice.startswith("/team"):
+                yield choice
+                lead_index = int(choice.split()[1][0])
+                lead = [p for p in battle.user.reserve if p.index == lead_index]
+                if lead:
+                    battle.user.last_selected_move = LastUsedMove(
+                        "teampreview",
+                        "{} {}".format(constants.SWITCH_STRING, lead[0].name),
+                        battle.turn,
+                    )
+            continue
+
+        msg = record.message
+        if not msg.startswith(room_prefix):
+            continue
+
+        if battle.started:
+            if battle.history is None:
+                battle.history = BattleHistory(battle)
+            update_battle(battle, msg)
+            continue
+
+        # everything before the first request is handled like `fp.run_battle.start_battle`
+        for line in msg.split("\n"):
+            split_line = line.split("|")
+            if len(split_line) > 2 and split_line[1] == "request" and split_line[2]:
+                first_request = json.loads(split_line[2].strip("'"))
+        if "Battle Factory Tier: " in msg:
+            start = msg.find("Battle Factory Tier: ") + len("Battle Factory Tier: ")
+            battle_factory_tier = normalize_name(msg[start : msg.find("</b>", start)])
+        if constants.START_TEAM_PREVIEW in msg:
+            team_preview_lines = msg.split(constants.START_TEAM_PREVIEW)[-1].split("\n")
+        elif constants.START_STRING in msg:
+            start_lines = msg.split(constants.START_STRING)[1].strip().split("\n")
+
+        if first_request is None or (
+            start_lines is None and team_preview_lines is None
+        ):
+            continue
+
+        battle.user.name = first_request[constants.SIDE][constants.ID]
+        battle.opponent.name = constants.ID_LOOKUP[battle.user.name]
+        battle.request_json = first_request
+        battle.rqid = first_request[constants.RQID]
+        battle.user.initialize_first_turn_user_from_json(first_request)
+
+        if team_preview_lines is not None:
+            opponent_pokemon = [
+                line.split("|")[3]
+                for line in team_preview_lines
+                if line.startswith(
+                    "|{}|{}|".format(constants.TEAM_PREVIEW_POKE, battle.opponent.name)
+                )
+            ]
+            battle.initialize_team_preview(opponent_pokemon, pokemon_battle_type)
+            battle.during_team_preview()
+            _initialize_datasets(
+                battle, pokemon_battle_type, battle_factory_tier, smogon
+            )
+        else:
+            battle.started = True
+            battle.msg_list = [
+                m
+                for m in start_lines
+                if not m.startswith("|switch|{}".format(battle.user.name))
+            ]
+            _initialize_datasets(
+                battle, pokemon_battle_type, battle_factory_tier, smogon
+            )
+            process_battle_updates(battle)
@@ -1,11 +1,12 @@
 import re
 import json
+from contextlib import contextmanager
+from contextvars import ContextVar
 from copy import deepcopy, copy
 import logging
 
 import constants
-from data import all_move_json
-from data import pokedex
+from data.generation_data import current_generation_data
 from data.pkmn_sets import (
     SmogonSets,
     RandomBattleTeamDatasets,
@@ -16,6 +17,8 @@ from fp.battle import Pokemon, Battler, Battle
 from fp.battle import LastUsedMove
 from fp.battle import DamageDealt
 from fp.battle import StatRange
+from fp.battle import trial_mutations
+from fp.battle_bots.poke_engine_helpers import OpponentSetDamageRolls
 from fp.battle_bots.poke_engine_helpers import poke_engine_get_damage_rolls
 from fp.helpers import normalize_name, type_effectiveness_modifier
 from fp.helpers import get_pokemon_info_from_condition
@@ -26,10 +29,29 @@ from fp.helpers import (
     is_neutral_effectiveness,
 )
 from fp.battle import boost_multiplier_lookup
+from fp.protocol import parse_line
+from fp.protocol import parse_lines
 
 
 logger = logging.getLogger(__name__)
 
+# whether updates may change the shared set datasets, see `without_dataset_updates`
+_dataset_updates = ContextVar("dataset_updates", default=True)
+
+
+@contextmanager
+def without_dataset_updates():
+    """
+    Battles updated in this context leave `SmogonSets`, `TeamDatasets` and
+    `RandomBattleTeamDatasets` as they are, e.g. when a battle's history is replayed
+    """
+    token = _dataset_updates.set(False)
+    try:
+        yield
+    finally:
+        _dataset_updates.reset(token)
+
+
 MOVE_END_STRINGS = {"move", "switch", "upkeep", "-miss", ""}
 ITEMS_REVEALED_ON_SWITCH_IN = [
     # boosterenergy technically only revealed if pkmn has quarkdrive/protosynthesis
@@ -72,33 +94,40 @@ def crit_rate_for_generation(generation):
 
 
 def can_have_priority_modified(battle, pokemon, move_name):
+    generation_data = current_generation_data()
     return (
         "prankster"
         in [
             normalize_name(a)
-            for a in pokedex[pokemon.name][constants.ABILITIES].values()
+            for a in generation_data.pokedex[pokemon.name][constants.ABILITIES].values()
         ]
         or (move_name == "grassyglide" and battle.field == constants.GRASSY_TERRAIN)
         or (
-            move_name in all_move_json
-            and all_move_json[move_name][constants.CATEGORY] == constants.STATUS
+            move_name in generation_data.all_move_json
+            and generation_data.all_move_json[move_name][constants.CATEGORY]
+            == constants.STATUS
             and "myceliummight"
             in [
                 normalize_name(a)
-                for a in pokedex[pokemon.name][constants.ABILITIES].values()
+                for a in generation_data.pokedex[pokemon.name][
+                    constants.ABILITIES
+                ].values()
             ]
         )
     )
 
 
 def can_have_speed_modified(battle, pokemon):
+    generation_data = current_generation_data()
     return (
         (
             pokemon.item is None
             and "unburden"
             in [
                 normalize_name(a)
-                for a in pokedex[pokemon.name][constants.ABILITIES].values()
+                for a in generation_data.pokedex[pokemon.name][
+                    constants.ABILITIES
+                ].values()
             ]
         )
         or (
@@ -107,7 +136,9 @@ def can_have_speed_modified(battle, pokemon):
             and "swiftswim"
             in [
                 normalize_name(a)
-                for a in pokedex[pokemon.name][constants.ABILITIES].values()
+                for a in generation_data.pokedex[pokemon.name][
+                    constants.ABILITIES
+                ].values()
             ]
         )
         or (
@@ -116,7 +147,9 @@ def can_have_speed_modified(battle, pokemon):
             and "chlorophyll"
             in [
                 normalize_name(a)
-                for a in pokedex[pokemon.name][constants.ABILITIES].values()
+                for a in generation_data.pokedex[pokemon.name][
+                    constants.ABILITIES
+                ].values()
             ]
         )
         or (
@@ -125,7 +158,9 @@ def can_have_speed_modified(battle, pokemon):
             and "sandrush"
             in [
                 normalize_name(a)
-                for a in pokedex[pokemon.name][constants.ABILITIES].values()
+                for a in generation_data.pokedex[pokemon.name][
+                    constants.ABILITIES
+                ].values()
             ]
         )
         or (
@@ -134,7 +169,9 @@ def can_have_speed_modified(battle, pokemon):
             and "slushrush"
             in [
                 normalize_name(a)
-                for a in pokedex[pokemon.name][constants.ABILITIES].values()
+                for a in generation_data.pokedex[pokemon.name][
+                    constants.ABILITIES
+                ].values()
             ]
         )
         or (
@@ -143,7 +180,9 @@ def can_have_speed_modified(battle, pokemon):
             and "surgesurfer"
             in [
                 normalize_name(a)
-                for a in pokedex[pokemon.name][constants.ABILITIES].values()
+                for a in generation_data.pokedex[pokemon.name][
+                    constants.ABILITIES
+                ].values()
             ]
         )
         or (
@@ -152,7 +191,9 @@ def can_have_speed_modified(battle, pokemon):
             and "quickfeet"
             in [
                 normalize_name(a)
-                for a in pokedex[pokemon.name][constants.ABILITIES].values()
+                for a in generation_data.pokedex[pokemon.name][
+                    constants.ABILITIES
+                ].values()
             ]
         )
     )
@@ -163,8 +204,9 @@ def remove_volatile(pkmn, volatile):
 
 
 def unlikely_to_have_choice_item(move_name):
+    generation_data = current_generation_data()
     try:
-        move_dict = all_move_json[move_name]
+        move_dict = generation_data.all_move_json[move_name]
     except KeyError:
         return False
 
@@ -185,16 +227,19 @@ def is_opponent(battle, split_msg):
 
 def get_move_information(m):
     # Given a |move| line from the PS protocol, extract the user of the move and the move object
+    generation_data = current_generation_data()
+    split_move_line = parse_line(m).split_msg
     try:
-        split_move_line = m.split("|")
-        return split_move_line[2], all_move_json[normalize_name(split_move_line[3])]
+        return split_move_line[2], generation_data.all_move_json[
+            normalize_name(split_move_line[3])
+        ]
     except KeyError:
         logger.warning(
             "Unknown move {} - using standard 0 priority move".format(
-                normalize_name(m.split("|")[3])
+                normalize_name(split_move_line[3])
             )
         )
-        return m.split("|")[2], {constants.ID: "unknown", constants.PRIORITY: 0}
+        return split_move_line[2], {constants.ID: "unknown", constants.PRIORITY: 0}
 
 
 def request(battle, split_msg):
@@ -281,6 +326,7 @@ def drag(battle, split_msg):
 
 
 def switch_or_drag(battle, split_msg, switch_or_drag="switch"):
+    generation_data = current_generation_data()
     if is_opponent(battle, split_msg):
         side_name = "opponent"
         side = battle.opponent
@@ -298,7 +344,7 @@ def switch_or_drag(battle, split_msg, switch_or_drag="switch"):
         # set the pkmn's types back to their original value if the types were changed
         # if the pkmn is terastallized, this does not happen
         if constants.TYPECHANGE in side.active.volatile_statuses:
-            original_types = pokedex[side.active.name][constants.TYPES]
+            original_types = generation_data.pokedex[side.active.name][constants.TYPES]
             logger.info(
                 "{} had it's type changed - changing its types back to {}".format(
                     side.active.name, original_types
@@ -318,7 +364,9 @@ def switch_or_drag(battle, split_msg, switch_or_drag="switch"):
             )
             side.active.ability = side.active.original_ability
             side.active.moves = []
-            side.active.types = pokedex[side.active.name][constants.TYPES]
+            side.active.types = generation_data.pokedex[side.active.name][
+                constants.TYPES
+            ]
 
         if (
             side.active.original_ability is not None
@@ -436,6 +484,8 @@ def switch_or_drag(battle, split_msg, switch_or_drag="switch"):
         ]
         assert len(request_json_zoroark) == 1
         request_json_zoroark = request_json_zoroark[0]
+        # the list belongs to the parsed ProtocolEvent, which other checks read as it was sent
+        split_msg = split_msg.copy()
         split_msg[2] = f"{request_json_zoroark[constants.IDENT]}"
         split_msg[3] = f"{request_json_zoroark[constants.DETAILS]}"
         logger.info("New split_msg: {}".format(split_msg))
@@ -455,6 +505,7 @@ def switch_or_drag(battle, split_msg, switch_or_drag="switch"):
         if (
             battle.battle_type == constants.STANDARD_BATTLE
             and battle.generation in constants.NO_TEAM_PREVIEW_GENS
+            and _dataset_updates.get()
         ):
             SmogonSets.add_new_pokemon(pkmn.name)
             TeamDatasets.add_new_pokemon(pkmn.name)
@@ -485,7 +536,9 @@ def switch_or_drag(battle, split_msg, switch_or_drag="switch"):
             and "regenerator"
             in [
                 normalize_name(a)
-                for a in pokedex[pkmn.name][constants.ABILITIES].values()
+                for a in generation_data.pokedex[pkmn.name][
+                    constants.ABILITIES
+                ].values()
             ]
             and pkmn.ability is None
         ):
@@ -723,6 +776,7 @@ def fail(battle, split_msg):
 
 
 def move(battle, split_msg):
+    generation_data = current_generation_data()
     if is_opponent(battle, split_msg):
         side = battle.opponent
         pkmn = battle.opponent.active
@@ -957,7 +1011,7 @@ def move(battle, split_msg):
         pkmn.can_have_choice_item = False
 
     try:
-        mv = all_move_json[move_name]
+        mv = generation_data.all_move_json[move_name]
         move_type = mv[constants.TYPE]
         if mv[constants.CATEGORY] != constants.STATUS:
             logger.info(
@@ -971,7 +1025,9 @@ def move(battle, split_msg):
 
     try:
         if (
-            all_move_json[move_name][constants.SELF][constants.VOLATILE_STATUS]
+            generation_data.all_move_json[move_name][constants.SELF][
+                constants.VOLATILE_STATUS
+            ]
             == constants.LOCKED_MOVE
         ):
             logger.info("Adding lockedmove to {}".format(pkmn.name))
@@ -980,7 +1036,10 @@ def move(battle, split_msg):
         pass
 
     try:
-        if all_move_json[move_name][constants.CATEGORY] == constants.STATUS:
+        if (
+            generation_data.all_move_json[move_name][constants.CATEGORY]
+            == constants.STATUS
+        ):
             logger.info(
                 "{} used a status-move. Adding `assaultvest` to impossible items".format(
                     pkmn.name
@@ -991,7 +1050,7 @@ def move(battle, split_msg):
         pass
 
     try:
-        category = all_move_json[move_name][constants.CATEGORY]
+        category = generation_data.all_move_json[move_name][constants.CATEGORY]
         logger.info("Setting {}'s last used move: {}".format(pkmn.name, move_name))
         if not any(
             "[from]move: Sleep Talk" in msg or "[from]Sleep Talk" in msg
@@ -1015,7 +1074,7 @@ def move(battle, split_msg):
     if category in constants.DAMAGING_CATEGORIES and not any(
         [
             normalize_name(a) in ["sheerforce", "magicguard"]
-            for a in pokedex[pkmn.name][constants.ABILITIES].values()
+            for a in generation_data.pokedex[pkmn.name][constants.ABILITIES].values()
         ]
     ):
         logger.info(
@@ -1132,6 +1191,7 @@ def status(battle, split_msg):
 
 
 def activate(battle, split_msg):
+    generation_data = current_generation_data()
     if is_opponent(battle, split_msg):
         pkmn = battle.opponent.active
         other_pkmn = battle.user.active
@@ -1180,8 +1240,9 @@ def activate(battle, split_msg):
     if split_msg[3].lower().startswith("move: "):
         move_name = normalize_name(split_msg[3].split(":")[-1].strip())
         if (
-            move_name in all_move_json
-            and all_move_json[move_name].get("volatileStatus") == "partiallytrapped"
+            move_name in generation_data.all_move_json
+            and generation_data.all_move_json[move_name].get("volatileStatus")
+            == "partiallytrapped"
         ):
             logger.info("{} was partially trapped by {}".format(pkmn.name, move_name))
             pkmn.volatile_statuses.append("partiallytrapped")
@@ -1237,6 +1298,7 @@ def terastallize(battle, split_msg):
 
 
 def start_volatile_status(battle, split_msg):
+    generation_data = current_generation_data()
     if is_opponent(battle, split_msg):
         pkmn = battle.opponent.active
         side = battle.opponent
@@ -1321,7 +1383,7 @@ def start_volatile_status(battle, split_msg):
     if volatile_status == constants.TYPECHANGE:
         if split_msg[4] == "[from] move: Reflect Type":
             pkmn_name = normalize_name(split_msg[5].split(":")[-1])
-            new_types = deepcopy(pokedex[pkmn_name][constants.TYPES])
+            new_types = deepcopy(generation_data.pokedex[pkmn_name][constants.TYPES])
         else:
             new_types = [normalize_name(t) for t in split_msg[4].split("/")]
 
@@ -1693,6 +1755,7 @@ def set_item(battle, split_msg):
 
 def remove_item(battle, split_msg):
     """Remove the opponent's item"""
+    generation_data = current_generation_data()
     if is_opponent(battle, split_msg):
         side = battle.opponent
     else:
@@ -1709,7 +1772,7 @@ def remove_item(battle, split_msg):
 
     if "unburden" not in side.active.volatile_statuses and "unburden" in [
         normalize_name(a)
-        for a in pokedex[side.active.name][constants.ABILITIES].values()
+        for a in generation_data.pokedex[side.active.name][constants.ABILITIES].values()
     ]:
         logger.info("Adding unburden volatile to {}".format(side.active.name))
         side.active.volatile_statuses.append("unburden")
@@ -1720,6 +1783,7 @@ def remove_item(battle, split_msg):
 
 
 def immune(battle, split_msg):
+    generation_data = current_generation_data()
     if is_opponent(battle, split_msg):
         side = battle.opponent
         pkmn = side.active
@@ -1737,19 +1801,25 @@ def immune(battle, split_msg):
         "zoroark"
     ) or side.find_pokemon_in_reserves("zoroarkhisui")
 
-    expected_damage_rolls, _ = poke_engine_get_damage_rolls(
-        deepcopy(battle), battle.user.last_used_move.move, "none", True
-    )
+    # building the engine's state changes the battle (e.g. unknown items become "None")
+    with battle.trial_mutations():
+        expected_damage_rolls, _ = poke_engine_get_damage_rolls(
+            battle, battle.user.last_used_move.move, "none", True
+        )
 
     # Zoroark checks
     if (
         is_opponent(battle, split_msg)
         and not side.active.name.startswith("zoroark")
-        and battle.user.last_used_move.move in all_move_json
-        and all_move_json[battle.user.last_used_move.move][constants.CATEGORY]
+        and battle.user.last_used_move.move in generation_data.all_move_json
+        and generation_data.all_move_json[battle.user.last_used_move.move][
+            constants.CATEGORY
+        ]
         != constants.STATUS
         and type_effectiveness_modifier(
-            all_move_json[battle.user.last_used_move.move][constants.TYPE],
+            generation_data.all_move_json[battle.user.last_used_move.move][
+                constants.TYPE
+            ],
             side.active.types,
         )
         != 0
@@ -1759,7 +1829,9 @@ def immune(battle, split_msg):
         and not (
             side.active.terastallized
             and type_effectiveness_modifier(
-                all_move_json[battle.user.last_used_move.move][constants.TYPE],
+                generation_data.all_move_json[battle.user.last_used_move.move][
+                    constants.TYPE
+                ],
                 [side.active.tera_type],
             )
             == 0
@@ -1771,7 +1843,9 @@ def immune(battle, split_msg):
             battle.battle_type == constants.BATTLE_FACTORY
             and zoroark_from_reserves is not None
             and type_effectiveness_modifier(
-                all_move_json[battle.user.last_used_move.move][constants.TYPE],
+                generation_data.all_move_json[battle.user.last_used_move.move][
+                    constants.TYPE
+                ],
                 zoroark_from_reserves.types,
             )
             == 0
@@ -1796,7 +1870,9 @@ def immune(battle, split_msg):
             if (
                 zoroark_from_reserves is not None
                 and type_effectiveness_modifier(
-                    all_move_json[battle.user.last_used_move.move][constants.TYPE],
+                    generation_data.all_move_json[battle.user.last_used_move.move][
+                        constants.TYPE
+                    ],
                     zoroark_from_reserves.types,
                 )
                 == 0
@@ -1807,7 +1883,9 @@ def immune(battle, split_msg):
             elif (
                 zoroark_from_reserves is None
                 and type_effectiveness_modifier(
-                    all_move_json[battle.user.last_used_move.move][constants.TYPE],
+                    generation_data.all_move_json[battle.user.last_used_move.move][
+                        constants.TYPE
+                    ],
                     zoroark_hisui.types,
                 )
                 == 0
@@ -1823,7 +1901,9 @@ def immune(battle, split_msg):
             elif (
                 zoroark_from_reserves is None
                 and type_effectiveness_modifier(
-                    all_move_json[battle.user.last_used_move.move][constants.TYPE],
+                    generation_data.all_move_json[battle.user.last_used_move.move][
+                        constants.TYPE
+                    ],
                     zoroark_regular.types,
                 )
                 == 0
@@ -2521,20 +2601,24 @@ def check_speed_ranges(battle, msg_lines):
             - the opponent COULD have prankster and it used a status move
             - Grassy Glide is used when Grassy Terrain is up
     """
-    for ln in msg_lines:
+    generation_data = current_generation_data()
+    msg_lines = parse_lines(msg_lines)
+    for event in msg_lines:
+        ln = event.line
+
         # If either side switched this turn - don't do this check
-        if ln.startswith("|switch|"):
+        if event.action == "switch":
             return
 
         # if anyone got `cant` or hit themselves in confusion
         # skip this check as we don't know if they used a priority move
-        if ln.startswith("|cant|") or (
-            ln.startswith("|-activate|") and ln.endswith("confusion")
+        if event.action == "cant" or (
+            event.action == "-activate" and ln.endswith("confusion")
         ):
             return
 
         # If anyone used a custapberry, skip this check
-        if ln.startswith("|-enditem|") and (
+        if event.action == "-enditem" and (
             "custapberry" in normalize_name(ln) or "Custap Berry" in ln
         ):
             return
@@ -2547,7 +2631,7 @@ def check_speed_ranges(battle, msg_lines):
         if "quickdraw" in normalize_name(ln) or "Quick Draw" in ln:
             return
 
-    moves = [get_move_information(m) for m in msg_lines if m.startswith("|move|")]
+    moves = [get_move_information(m) for m in msg_lines if m.action == "move"]
     number_of_moves = len(moves)
     if number_of_moves not in [1, 2]:
         return
@@ -2560,7 +2644,9 @@ def check_speed_ranges(battle, msg_lines):
         moves.append(
             (
                 "{}a: {}".format(battle.opponent.name, battle.user.active.name),
-                all_move_json[normalize_name(battle.user.last_selected_move.move)],
+                generation_data.all_move_json[
+                    normalize_name(battle.user.last_selected_move.move)
+                ],
             )
         )
 
@@ -2595,14 +2681,10 @@ def check_speed_ranges(battle, msg_lines):
     ):
         return
 
-    battle_copy = deepcopy(battle)
-    battle_copy_for_stats = deepcopy(battle_copy)
-    battle_copy.user.active.status = battle_copy_for_stats.user.active.stats
-
     speed_threshold = int(
-        boost_multiplier_lookup[battle_copy.user.active.boosts[constants.SPEED]]
-        * battle_copy.user.active.stats[constants.SPEED]
-        / boost_multiplier_lookup[battle_copy.opponent.active.boosts[constants.SPEED]]
+        boost_multiplier_lookup[battle.user.active.boosts[constants.SPEED]]
+        * battle.user.active.stats[constants.SPEED]
+        / boost_multiplier_lookup[battle.opponent.active.boosts[constants.SPEED]]
     )
 
     if "protosynthesisspe" in battle.opponent.active.volatile_statuses:
@@ -2682,7 +2764,7 @@ def check_opponent_hiddenpower(battle, msg_line):
         )
     )
 
-    next_line_split_msg = msg_line.split("|")
+    next_line_split_msg = parse_line(msg_line).split_msg
     if next_line_split_msg[1] == "-resisted":
         logger.info("{} resisted hiddenpower".format(defender_types))
         for t in list(attacker.hidden_power_possibilities):
@@ -2717,17 +2799,20 @@ def check_opponent_hiddenpower(battle, msg_line):
 
 
 def check_choicescarf(battle, msg_lines):
+    generation_data = current_generation_data()
+    msg_lines = parse_lines(msg_lines)
+
     # If either side switched this turn - don't do this check
     if any(
         battle.generation in ["gen1", "gen2", "gen3"]
-        or ln.startswith("|switch|")
-        or ln.startswith("|cant|")
-        or (ln.startswith("|-activate|") and ln.endswith("confusion"))
-        for ln in msg_lines
+        or event.action == "switch"
+        or event.action == "cant"
+        or (event.action == "-activate" and event.line.endswith("confusion"))
+        for event in msg_lines
     ) or battle.user.last_selected_move.move.startswith("switch "):
         return
 
-    moves = [get_move_information(m) for m in msg_lines if m.startswith("|move|")]
+    moves = [get_move_information(m) for m in msg_lines if m.action == "move"]
     number_of_moves = len(moves)
 
     # if the bot went first we cannot ever infer a choicescarf
@@ -2738,14 +2823,15 @@ def check_choicescarf(battle, msg_lines):
         moves.append(
             (
                 "{}a: {}".format(battle.opponent.name, battle.user.active.name),
-                all_move_json[normalize_name(battle.user.last_selected_move.move)],
+                generation_data.all_move_json[
+                    normalize_name(battle.user.last_selected_move.move)
+                ],
             )
         )
 
     if moves[0][1][constants.PRIORITY] != moves[1][1][constants.PRIORITY]:
         return
 
-    battle_copy = deepcopy(battle)
     if (
         battle.opponent.active is None
         or battle.opponent.active.item != constants.UNKNOWN_ITEM
@@ -2758,27 +2844,27 @@ def check_choicescarf(battle, msg_lines):
             battle, battle.user.active, moves[1][1][constants.ID]
         )
         or (
-            battle_copy.user.active.ability == "unburden"
-            and battle_copy.user.active.item is None
+            battle.user.active.ability == "unburden" and battle.user.active.item is None
         )
     ):
         return
 
-    if battle.battle_type == constants.RANDOM_BATTLE:
-        battle_copy.opponent.active.set_spread(
-            "serious", "85,85,85,85,85,85"
-        )  # random battles have known spreads
-    else:
-        if battle.trick_room:
-            battle_copy.opponent.active.set_spread(
-                "quiet", "0,0,0,0,0,0"
-            )  # assume as slow as possible in trickroom
+    with trial_mutations(battle.opponent.active):
+        if battle.battle_type == constants.RANDOM_BATTLE:
+            battle.opponent.active.set_spread(
+                "serious", "85,85,85,85,85,85"
+            )  # random battles have known spreads
         else:
-            battle_copy.opponent.active.set_spread(
-                "jolly", "0,0,0,0,0,252"
-            )  # assume as fast as possible
-    opponent_effective_speed = battle_copy.get_effective_speed(battle_copy.opponent)
-    bot_effective_speed = battle_copy.get_effective_speed(battle_copy.user)
+            if battle.trick_room:
+                battle.opponent.active.set_spread(
+                    "quiet", "0,0,0,0,0,0"
+                )  # assume as slow as possible in trickroom
+            else:
+                battle.opponent.active.set_spread(
+                    "jolly", "0,0,0,0,0,252"
+                )  # assume as fast as possible
+        opponent_effective_speed = battle.get_effective_speed(battle.opponent)
+        bot_effective_speed = battle.get_effective_speed(battle.user)
 
     if battle.trick_room:
         has_scarf = opponent_effective_speed > bot_effective_speed
@@ -2806,8 +2892,8 @@ def get_damage_dealt(battle, split_msg, next_messages):
         attacking_side = battle.user
         defending_side = battle.opponent
 
-    for line in next_messages:
-        next_line_split = line.split("|")
+    for event in parse_lines(next_messages):
+        next_line_split = event.split_msg
         # if one of these strings appears in index 1 then
         # exit out since we are done with this pokemon's move
         if len(next_line_split) < 2 or next_line_split[1] in MOVE_END_STRINGS:
@@ -2851,7 +2937,7 @@ def get_damage_dealt(battle, split_msg, next_messages):
 
 def _do_check(
     battle,
-    battle_copy,
+    damage_rolls,
     possibilites,
     check_type,
     damage_dealt,
@@ -2859,63 +2945,63 @@ def _do_check(
     check_lower_bound,
     allow_emptying=False,
 ):
-    actual_damage_dealt = damage_dealt.percent_damage * battle_copy.user.active.max_hp
+    actual_damage_dealt = damage_dealt.percent_damage * battle.user.active.max_hp
+    ability_is_unknown = not battle.opponent.active.ability
+    item_is_unknown = battle.opponent.active.item == constants.UNKNOWN_ITEM
 
     indicies_to_remove = []
     num_starting_possibilites = len(possibilites)
-    for i in range(num_starting_possibilites):
-        p = possibilites[i]
-        if isinstance(p, PredictedPokemonSet):
-            p = p.pkmn_set
+    with battle.trial_mutations():
+        for i in range(num_starting_possibilites):
+            p = possibilites[i]
+            if isinstance(p, PredictedPokemonSet):
+                p = p.pkmn_set
+
+            if ability_is_unknown:
+                battle.opponent.active.ability = p.ability
+            if item_is_unknown:
+                battle.opponent.active.item = p.item
+            battle.opponent.active.set_spread(p.nature, ",".join(str(x) for x in p.evs))
+
+            if check_type == "damage_received":
+                actual_damage_dealt = (
+                    damage_dealt.percent_damage * battle.opponent.active.max_hp
+                )
 
-        if not battle.opponent.active.ability:
-            battle_copy.opponent.active.ability = p.ability
-        if battle.opponent.active.item == constants.UNKNOWN_ITEM:
-            battle_copy.opponent.active.item = p.item
-        battle_copy.opponent.active.set_spread(
-            p.nature, ",".join(str(x) for x in p.evs)
-        )
+                if bot_went_first:
+                    opponent_move = constants.DO_NOTHING_MOVE
+                else:
+                    opponent_move = battle.opponent.last_used_move.move
 
-        if check_type == "damage_received":
-            actual_damage_dealt = (
-                damage_dealt.percent_damage * battle_copy.opponent.active.max_hp
-            )
+                damage, _ = damage_rolls.get(
+                    damage_dealt.move, opponent_move, bot_went_first
+                )
+            elif check_type == "damage_dealt":
+                _, damage = damage_rolls.get(
+                    battle.user.last_selected_move.move,
+                    damage_dealt.move,
+                    bot_went_first,
+                )
+            else:
+                raise ValueError("Invalid check_type: {}".format(check_type))
 
-            if bot_went_first:
-                opponent_move = constants.DO_NOTHING_MOVE
+            if damage_dealt.crit:
+                max_damage = damage[1]
             else:
-                opponent_move = battle_copy.opponent.last_used_move.move
+                max_damage = damage[0]
 
-            damage, _ = poke_engine_get_damage_rolls(
-                battle_copy, damage_dealt.move, opponent_move, bot_went_first
-            )
-        elif check_type == "damage_dealt":
-            _, damage = poke_engine_get_damage_rolls(
-                battle_copy,
-                battle_copy.user.last_selected_move.move,
-                damage_dealt.move,
-                bot_went_first,
+            damage = [max_damage * 0.85, max_damage]
+            lower_bound_violated = check_lower_bound and (
+                actual_damage_dealt < (damage[0] * 0.975 - 5)
             )
-        else:
-            raise ValueError("Invalid check_type: {}".format(check_type))
-
-        if damage_dealt.crit:
-            max_damage = damage[1]
-        else:
-            max_damage = damage[0]
-
-        damage = [max_damage * 0.85, max_damage]
-        lower_bound_violated = check_lower_bound and (
-            actual_damage_dealt < (damage[0] * 0.975 - 5)
-        )
-        upper_bound_violated = actual_damage_dealt > (damage[1] * 1.025 + 5)
-        if lower_bound_violated or upper_bound_violated:
-            logger.debug(
-                "{} is invalid based on reverse damage calc. damage_dealt={}, lower={}, upper={}".format(
-                    p, actual_damage_dealt, damage[0], damage[1]
+            upper_bound_violated = actual_damage_dealt > (damage[1] * 1.025 + 5)
+            if lower_bound_violated or upper_bound_violated:
+                logger.debug(
+                    "{} is invalid based on reverse damage calc. damage_dealt={}, lower={}, upper={}".format(
+                        p, actual_damage_dealt, damage[0], damage[1]
+                    )
                 )
-            )
-            indicies_to_remove.append(i)
+                indicies_to_remove.append(i)
 
     if len(indicies_to_remove) == num_starting_possibilites and not allow_emptying:
         logger.warning("Would remove all possibilities, not removing any")
@@ -2931,17 +3017,20 @@ def update_dataset_possibilities(
     damage_dealt,
     check_type,
 ):
+    generation_data = current_generation_data()
     if (
-        battle.wait
+        not _dataset_updates.get()
+        or battle.wait
         or battle.opponent.active is None
         or battle.opponent.active.hp <= 0
         or battle.opponent.active.name
         in ["ditto", "shedinja", "terapagosterastal", "meloetta", "meloettapirouette"]
         or battle.user.active.name
         in ["ditto", "shedinja", "terapagosterastal", "meloetta", "meloettapirouette"]
-        or damage_dealt.move not in all_move_json
-        or all_move_json[damage_dealt.move][constants.CATEGORY] == constants.STATUS
-        or "multiaccuracy" in all_move_json[damage_dealt.move]
+        or damage_dealt.move not in generation_data.all_move_json
+        or generation_data.all_move_json[damage_dealt.move][constants.CATEGORY]
+        == constants.STATUS
+        or "multiaccuracy" in generation_data.all_move_json[damage_dealt.move]
         or damage_dealt.move.startswith(constants.HIDDEN_POWER)
         or damage_dealt.percent_damage == 0
         or (
@@ -2971,8 +3060,6 @@ def update_dataset_possibilities(
     ):
         return
 
-    battle_copy = deepcopy(battle)
-
     if battle.battle_type == constants.RANDOM_BATTLE:
         possibilites = RandomBattleTeamDatasets.get_pkmn_sets_from_pkmn_name(
             battle.opponent.active.name, battle.opponent.active.base_name
@@ -3018,9 +3105,12 @@ def update_dataset_possibilities(
     logger.debug(f"{check_lower_bound=}")
     logger.debug(f"{bot_went_first=}")
 
+    # every set in both checks only changes the opponent's active pokemon
+    # so the damage calculation state is built once and reused
+    damage_rolls = OpponentSetDamageRolls(battle)
     _do_check(
         battle,
-        battle_copy,
+        damage_rolls,
         possibilites,
         check_type,
         damage_dealt,
@@ -3032,7 +3122,7 @@ def update_dataset_possibilities(
     if smogon_possibilities is not None:
         _do_check(
             battle,
-            battle_copy,
+            damage_rolls,
             smogon_possibilities,
             check_type,
             damage_dealt,
@@ -3043,7 +3133,9 @@ def update_dataset_possibilities(
 
 
 def check_heavydutyboots(battle, msg_lines):
+    generation_data = current_generation_data()
     side_to_check = battle.opponent
+    msg_lines = parse_lines(msg_lines)
 
     if (
         battle.generation not in ["gen8", "gen9"]
@@ -3051,15 +3143,17 @@ def check_heavydutyboots(battle, msg_lines):
         or "magicguard"
         in [
             normalize_name(a)
-            for a in pokedex[side_to_check.active.name][constants.ABILITIES].values()
+            for a in generation_data.pokedex[side_to_check.active.name][
+                constants.ABILITIES
+            ].values()
         ]
     ):
         return
 
     if side_to_check.side_conditions[constants.STEALTH_ROCK] > 0:
         pkmn_took_stealthrock_damage = False
-        for line in msg_lines:
-            split_line = line.split("|")
+        for event in msg_lines:
+            split_line = event.split_msg
 
             # |-damage|p2a: Weedle|88/100|[from] Stealth Rock
             if (
@@ -3087,14 +3181,16 @@ def check_heavydutyboots(battle, msg_lines):
         and "levitate"
         not in [
             normalize_name(a)
-            for a in pokedex[side_to_check.active.name][constants.ABILITIES].values()
+            for a in generation_data.pokedex[side_to_check.active.name][
+                constants.ABILITIES
+            ].values()
         ]
         and not side_to_check.active.has_type("flying")
         and side_to_check.active.ability != "levitate"
     ):
         pkmn_took_spikes_damage = False
-        for line in msg_lines:
-            split_line = line.split("|")
+        for event in msg_lines:
+            split_line = event.split_msg
 
             # |-damage|p2a: Weedle|88/100|[from] Spikes
             if (
@@ -3126,13 +3222,15 @@ def check_heavydutyboots(battle, msg_lines):
         and "levitate"
         not in [
             normalize_name(a)
-            for a in pokedex[side_to_check.active.name][constants.ABILITIES].values()
+            for a in generation_data.pokedex[side_to_check.active.name][
+                constants.ABILITIES
+            ].values()
         ]
         and side_to_check.active.ability not in constants.IMMUNE_TO_POISON_ABILITIES
     ):
         pkmn_took_toxicspikes_poison = False
-        for line in msg_lines:
-            split_line = line.split("|")
+        for event in msg_lines:
+            split_line = event.split_msg
 
             # a pokemon can be toxic-ed from sources other than toxicspikes
             # stopping at one of these strings ensures those other sources aren't considered
@@ -3168,12 +3266,14 @@ def check_heavydutyboots(battle, msg_lines):
         and "levitate"
         not in [
             normalize_name(a)
-            for a in pokedex[side_to_check.active.name][constants.ABILITIES].values()
+            for a in generation_data.pokedex[side_to_check.active.name][
+                constants.ABILITIES
+            ].values()
         ]
     ):
         pkmn_was_affected_by_stickyweb = False
-        for line in msg_lines:
-            split_line = line.split("|")
+        for event in msg_lines:
+            split_line = event.split_msg
 
             # |-activate|p2a: Gengar|move: Sticky Web
             if (
@@ -3198,85 +3298,95 @@ def check_heavydutyboots(battle, msg_lines):
 
 
 def update_battle(battle: Battle, msg: str):
-    msg_lines = msg.split("\n")
-    for line in msg_lines:
-        split_msg = line.split("|")
-        if len(split_msg) < 2:
+    if battle.history is None:
+        return _update_battle(battle, msg)
+
+    try:
+        return _update_battle(battle, msg)
+    finally:
+        battle.history.record(battle, msg)
+
+
+def _update_battle(battle: Battle, msg: str):
+    for line in msg.split("\n"):
+        event = parse_line(line)
+        if len(event.split_msg) < 2:
             continue
 
-        action = split_msg[1].strip()
-        if action == "request":
-            request(battle, split_msg)
+        if event.action == "request":
+            request(battle, event.split_msg)
             process_battle_updates(battle)
             return not battle.wait
         else:
-            battle.msg_list.append(line)
+            battle.msg_list.append(event)
 
     return False
 
 
+BATTLE_MODIFIERS_LOOKUP = {
+    "switch": switch,
+    "faint": faint,
+    "-fail": fail,
+    "drag": drag,
+    "-heal": heal_or_damage,
+    "-damage": heal_or_damage,
+    "-sethp": sethp,
+    "move": move,
+    "-setboost": setboost,
+    "-boost": boost,
+    "-unboost": unboost,
+    "-status": status,
+    "-activate": activate,
+    "-anim": anim,
+    "-prepare": prepare,
+    "-start": start_volatile_status,
+    "-singlemove": start_volatile_status,
+    "-end": end_volatile_status,
+    "-curestatus": curestatus,
+    "-cureteam": cureteam,
+    "-weather": weather,
+    "-fieldstart": fieldstart,
+    "-fieldend": fieldend,
+    "-sidestart": sidestart,
+    "-sideend": sideend,
+    "-swapsideconditions": swapsideconditions,
+    "-item": set_item,
+    "-enditem": remove_item,
+    "-immune": immune,
+    "-ability": update_ability,
+    "detailschange": form_change,
+    "replace": illusion_end,
+    "-formechange": form_change,
+    "-transform": transform,
+    "-mega": mega,
+    "-terastallize": terastallize,
+    "-zpower": zpower,
+    "-clearnegativeboost": clearnegativeboost,
+    "-clearboost": clearboost,
+    "-clearallboost": clearallboost,
+    "-singleturn": singleturn,
+    "-mustrecharge": mustrecharge,
+    "upkeep": upkeep,
+    "cant": cant,
+    "inactive": inactive,
+    "inactiveoff": inactiveoff,
+    "turn": turn,
+    "noinit": noinit,
+}
+
+
 def process_battle_updates(battle: Battle):
-    msg_lines = battle.msg_list
+    # lines are normally parsed by `update_battle` already
+    msg_lines = parse_lines(battle.msg_list)
     check_speed_ranges(battle, msg_lines)
-    for i, line in enumerate(msg_lines):
-        split_msg = line.split("|")
+    for i, event in enumerate(msg_lines):
+        split_msg = event.split_msg
         if len(split_msg) < 2:
             continue
 
-        action = split_msg[1].strip()
-
-        battle_modifiers_lookup = {
-            "switch": switch,
-            "faint": faint,
-            "-fail": fail,
-            "drag": drag,
-            "-heal": heal_or_damage,
-            "-damage": heal_or_damage,
-            "-sethp": sethp,
-            "move": move,
-            "-setboost": setboost,
-            "-boost": boost,
-            "-unboost": unboost,
-            "-status": status,
-            "-activate": activate,
-            "-anim": anim,
-            "-prepare": prepare,
-            "-start": start_volatile_status,
-            "-singlemove": start_volatile_status,
-            "-end": end_volatile_status,
-            "-curestatus": curestatus,
-            "-cureteam": cureteam,
-            "-weather": weather,
-            "-fieldstart": fieldstart,
-            "-fieldend": fieldend,
-            "-sidestart": sidestart,
-            "-sideend": sideend,
-            "-swapsideconditions": swapsideconditions,
-            "-item": set_item,
-            "-enditem": remove_item,
-            "-immune": immune,
-            "-ability": update_ability,
-            "detailschange": form_change,
-            "replace": illusion_end,
-            "-formechange": form_change,
-            "-transform": transform,
-            "-mega": mega,
-            "-terastallize": terastallize,
-            "-zpower": zpower,
-            "-clearnegativeboost": clearnegativeboost,
-            "-clearboost": clearboost,
-            "-clearallboost": clearallboost,
-            "-singleturn": singleturn,
-            "-mustrecharge": mustrecharge,
-            "upkeep": upkeep,
-            "cant": cant,
-            "inactive": inactive,
-            "inactiveoff": inactiveoff,
-            "turn": turn,
-            "noinit": noinit,
-        }
-
-        function_to_call = battle_modifiers_lookup.get(action)
+        action = event.action
+
+        function_to_call = BATTLE_MODIFIERS_LOOKUP.get(action)
         if function_to_call is not None:
             function_to_call(battle, split_msg)
 
@@ -0,0 +1,78 @@
+"""
+Limits the cores used by the searches of every bot run by `fleet.py`
+
+The supervisor creates one CpuBudget before forking the bots, each bot holds
+as many cores as its search uses (MCTS_PARALLELISM) while a search runs
+"""
+
+import contextlib
+import multiprocessing
+
+
+class CpuBudget:
+    def __init__(self, cores, slots, context=None):
+        """
+        `cores` shared by up to `slots` processes forked after this is created
+        Each process uses its own slot so the supervisor can take back
+        the cores of a process that died during a search
+        """
+        context = context or multiprocessing.get_context("fork")
+        self.cores = cores
+        self._free_cores = context.Semaphore(cores)
+        # a search takes all of its cores before another search takes any,
+        # so two searches never each hold part of what the other is waiting for
+        self._taking = context.Semaphore(1)
+        self._taking_slot = context.Value("i", -1, lock=False)
+        self._held = context.Array("i", slots, lock=False)
+
+    @contextlib.contextmanager
+    def hold(self, slot, cores):
+        cores = max(1, min(cores, self.cores))
+        self._taking.acquire()
+        self._taking_slot.value = slot
+        for _ in range(cores):
+            self._free_cores.acquire()
+            self._held[slot] += 1
+        self._taking_slot.value = -1
+        self._taking.release()
+        try:
+            yield
+        finally:
+            self._release(slot)
+
+    def _release(self, slot):
+        while self._held[slot] > 0:
+            self._held[slot] -= 1
+            self._free_cores.release()
+
+    def held(self, slot):
+        return self._held[slot]
+
+    def reclaim(self, slot):
+        """
+        Frees whatever `slot` was holding, called once the process using it has exited
+        """
+        if self._taking_slot.value == slot:
+            self._taking_slot.value = -1
+            self._taking.release()
+        self._release(slot)
+
+
+_cpu_budget = None
+_slot = None
+
+
+def set_cpu_budget(cpu_budget: CpuBudget, slot):
+    global _cpu_budget, _slot
+    _cpu_budget = cpu_budget
+    _slot = slot
+
+
+def hold_cpus(cores):
+    """
+    Waits for `cores` of this process's CpuBudget and holds them until the context exits
+    Does nothing when there is no budget, e.g. when the bot is started with `run.py`
+    """
+    if _cpu_budget is None:
+        return contextlib.nullcontext()
+    return _cpu_budget.hold(_slot, cores)
@@ -1,6 +1,8 @@
 import math
+from functools import lru_cache
 import constants
-from config import FoulPlayConfig
+from data.generation_data import current_generation_data
+from fp.metrics import register_lru_cache
 
 natures = {
     "lonely": {"plus": constants.ATTACK, "minus": constants.DEFENSE},
@@ -46,6 +48,8 @@ def get_pokemon_info_from_condition(condition_string: str):
         return hp, maxhp, None
 
 
+# the same few thousand move/pokemon/item names are normalized over and over
+@lru_cache(maxsize=8192)
 def normalize_name(name):
     return (
         name.replace(" ", "")
@@ -64,6 +68,9 @@ def normalize_name(name):
     )
 
 
+register_lru_cache("normalize_name", normalize_name)
+
+
 def update_stats_from_nature(stats, nature):
     new_stats = stats.copy()
     try:
@@ -154,7 +161,7 @@ def _calculate_stats(base_stats, level, ivs=(31,) * 6, evs=(85,) * 6, nature="se
 
 
 def calculate_stats(base_stats, level, ivs=(31,) * 6, evs=(85,) * 6, nature="serious"):
-    if any(g in FoulPlayConfig.pokemon_mode for g in ["gen1", "gen2"]):
+    if current_generation_data().generation in ["gen1", "gen2"]:
         return _calculate_stats_gen_1_2(base_stats, level)
     else:
         return _calculate_stats(base_stats, level, ivs, evs, nature)
@@ -210,12 +217,11 @@ DAMAGE_MULTIPICATION_ARRAY = [
 
 def type_effectiveness_modifier(attacking_move_type, defending_types):
     modifier = 1
+    type_chart = current_generation_data().type_chart
     attacking_type_index = POKEMON_TYPE_INDICES[attacking_move_type]
     for pkmn_type in defending_types:
         defending_type_index = POKEMON_TYPE_INDICES[pkmn_type]
-        modifier *= DAMAGE_MULTIPICATION_ARRAY[attacking_type_index][
-            defending_type_index
-        ]
+        modifier *= type_chart[attacking_type_index][defending_type_index]
 
     return modifier
 
@@ -0,0 +1,58 @@
+"""
+The decisions the bot can send for a request, read from the request JSON
+
+When there is only one, e.g. a forced switch with one pokemon left or a move the
+active pokemon is locked into while it is trapped, `fp.run_battle.async_pick_move`
+sends it without searching
+"""
+
+from typing import Optional
+
+import constants
+from fp.battle import Battle
+
+
+def user_options(battle: Battle) -> Optional[list[str]]:
+    """
+    The decisions the user can choose from, in the format `find_best_move` returns them
+    None when they can't be worked out from the request
+
+    `battle.user` must already be updated from `battle.request_json`
+    """
+    request_json = battle.request_json or {}
+    user = battle.user
+
+    # revival blessing's forced switch picks a fainted pokemon
+    if user.active.reviving or any(pkmn.reviving for pkmn in user.reserve):
+        return None
+
+    switches = [
+        "{} {}".format(constants.SWITCH_STRING, pkmn.name)
+        for pkmn in user.reserve
+        if pkmn.is_alive()
+    ]
+    if request_json.get(constants.FORCE_SWITCH):
+        return switches
+
+    if constants.ACTIVE not in request_json:
+        return None
+
+    # the request disables moves that can't be used (choice lock, encore, taunt, no PP)
+    # and only has the move the pokemon is locked into (outrage, recharge, struggle)
+    moves = [m.name for m in user.active.moves if not m.disabled]
+    if user.active.can_terastallize:
+        moves += ["{}-tera".format(m) for m in moves]
+
+    if user.trapped:
+        return moves
+    return moves + switches
+
+
+def forced_decision(battle: Battle) -> Optional[str]:
+    """
+    The only decision the user can make, None if there is a choice to search over
+    """
+    options = user_options(battle)
+    if options is not None and len(options) == 1:
+        return options[0]
+    return None
@@ -0,0 +1,437 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+def _label_string(label_names, label_values, extra=()):
+    labels = list(zip(label_names, label_values)) + list(extra)
+    if not labels:
+        return ""
+    return "{{{}}}".format(
+        ",".join(
+            '{}="{}"'.format(name, str(value).replace('"', '\\"'))
+            for name, value in labels
+        )
+    )
+
+
+class _Metric:
+    metric_type = None
+
+    def __init__(self, name, description, label_names=(), callback=None):
+        """
+        `callback`, if given, is called when the metric is collected and returns
+        `{label_values: value}` - for values that are already counted elsewhere (e.g. `lru_cache`s)
+        """
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.callback = callback
+        self.values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def collect(self):
+        if self.callback is not None:
+            return dict(self.callback())
+        with self._lock:
+            return dict(self.values)
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.description),
+            "# TYPE {} {}".format(self.name, self.metric_type),
+        ]
+        for label_values, value in sorted(self.collect().items()):
+            lines.append(
+                "{}{} {}".format(
+                    self.name, _label_string(self.label_names, label_values), value
+                )
+            )
+        return lines
+
+    def to_dict(self):
+        return {
+            ",".join(label_values): value
+            for label_values, value in self.collect().items()
+        }
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] += amount
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = value
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, description, buckets, label_names=()):
+        super().__init__(name, description, label_names)
+        self.buckets = sorted(buckets)
+        self.counts = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self.sums = defaultdict(float)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.counts[key][bisect.bisect_left(self.buckets, value)] += 1
+            self.sums[key] += value
+
+    def collect(self):
+        with self._lock:
+            return {
+                key: (list(counts), self.sums[key])
+                for key, counts in self.counts.items()
+            }
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.description),
+            "# TYPE {} histogram".format(self.name),
+        ]
+        for label_values, (counts, total) in sorted(self.collect().items()):
+            cumulative = 0
+            for bucket, count in zip(self.buckets + ["+Inf"], counts):
+                cumulative += count
+                lines.append(
+                    "{}_bucket{} {}".format(
+                        self.name,
+                        _label_string(self.label_names, label_values, [("le", bucket)]),
+                        cumulative,
+                    )
+                )
+            labels = _label_string(self.label_names, label_values)
+            lines.append("{}_sum{} {}".format(self.name, labels, total))
+            lines.append("{}_count{} {}".format(self.name, labels, cumulative))
+        return lines
+
+    def to_dict(self):
+        return {
+            ",".join(label_values): {
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], counts)),
+                "sum": total,
+                "count": sum(counts),
+            }
+            for label_values, (counts, total) in self.collect().items()
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError("Metric {} is already registered".format(metric.name))
+        self.metrics[metric.name] = metric
+        return metric
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.to_prometheus())
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        return {name: metric.to_dict() for name, metric in self.metrics.items()}
+
+
+REGISTRY = Registry()
+
+DECISION_SECONDS = REGISTRY.register(
+    Histogram(
+        "foulplay_decision_seconds",
+        "Time taken to pick a move",
+        buckets=[0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30],
+    )
+)
+DECISION_PHASE_SECONDS = REGISTRY.register(
+    Histogram(
+        "foulplay_decision_phase_seconds",
+        "Time taken by each phase of picking a move",
+        buckets=[0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+        label_names=["phase"],
+    )
+)
+SEARCH_ITERATIONS = REGISTRY.register(
+    Histogram(
+        "foulplay_search_iterations",
+        "MCTS iterations done for one decision, across every sampled battle",
+        buckets=[1000, 5000, 10000, 50000, 100000, 500000, 1000000],
+    )
+)
+SAMPLES_PER_DECISION = REGISTRY.register(
+    Histogram(
+        "foulplay_samples_per_decision",
+        "Number of battles sampled for one decision",
+        buckets=[1, 2, 4, 8, 16, 32, 64],
+    )
+)
+WEBSOCKET_MESSAGES = REGISTRY.register(
+    Counter(
+        "foulplay_websocket_messages_total",
+        "Websocket messages sent and received",
+        label_names=["direction"],
+    )
+)
+DECISIONS = REGISTRY.register(
+    Counter(
+        "foulplay_decisions_total",
+        "Moves picked by a search (search), taken from the opening book (book), or sent without searching because there was only one option (forced)",
+        label_names=["path"],
+    )
+)
+
+
+def _forced_decision_rate():
+    decisions = DECISIONS.collect()
+    total = sum(decisions.values())
+    if not total:
+        return {}
+    return {(): round(decisions.get(("forced",), 0) / total, 4)}
+
+
+FORCED_DECISION_RATE = REGISTRY.register(
+    Gauge(
+        "foulplay_forced_decision_rate",
+        "Fraction of decisions that had only one option and were made without searching",
+        callback=_forced_decision_rate,
+    )
+)
+SMOGON_STATS_CACHE = REGISTRY.register(
+    Counter(
+        "foulplay_smogon_stats_cache_total",
+        "Smogon stats files read from the cache directory (hit) or downloaded (miss)",
+        label_names=["result"],
+    )
+)
+DAMAGE_ROLLS_CACHE = REGISTRY.register(
+    Counter(
+        "foulplay_damage_rolls_cache_total",
+        "Damage rolls for a possible set that were remembered (hit) or calculated (miss)",
+        label_names=["result"],
+    )
+)
+WORKER_POOL_STARTS = REGISTRY.register(
+    Counter(
+        "foulplay_worker_pool_starts_total",
+        "Search worker process pools that were started, a pool is kept until one of its workers dies",
+    )
+)
+TRACE_QUEUE_DEPTH = REGISTRY.register(
+    Gauge(
+        "foulplay_trace_queue_depth",
+        "Span events waiting to be written by the trace sink",
+        callback=lambda: {},
+    )
+)
+LOG_QUEUE_DEPTH = REGISTRY.register(
+    Gauge(
+        "foulplay_log_queue_depth",
+        "Log records waiting to be written",
+        callback=lambda: {},
+    )
+)
+LOG_RECORDS_DROPPED = REGISTRY.register(
+    Counter(
+        "foulplay_log_records_dropped_total",
+        "DEBUG log records dropped because the log queue was full",
+    )
+)
+BATTLES = REGISTRY.register(
+    Counter(
+        "foulplay_battles_total",
+        "Finished battles",
+        label_names=["format", "result"],
+    )
+)
+
+
+def _win_rates():
+    battles = BATTLES.collect()
+    formats = {pokemon_format for pokemon_format, _ in battles}
+    win_rates = {}
+    for pokemon_format in formats:
+        wins = battles.get((pokemon_format, "win"), 0)
+        total = sum(v for (f, _), v in battles.items() if f == pokemon_format)
+        win_rates[(pokemon_format,)] = round(wins / total, 4)
+    return win_rates
+
+
+WIN_RATE = REGISTRY.register(
+    Gauge(
+        "foulplay_win_rate",
+        "Fraction of finished battles that were won",
+        label_names=["format"],
+        callback=_win_rates,
+    )
+)
+
+
+LRU_CACHE_CALLBACKS = []
+
+
+def _resident_memory():
+    # /proc is only there on linux
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except OSError:
+        return {}
+    return {(): resident_pages * os.sysconf("SC_PAGE_SIZE")}
+
+
+RESIDENT_MEMORY = REGISTRY.register(
+    Gauge(
+        "foulplay_resident_memory_bytes",
+        "Resident memory of this process",
+        callback=_resident_memory,
+    )
+)
+
+
+def register_lru_cache(cache_name, fn):
+    """
+    Exposes the hits and misses of a `functools.lru_cache` wrapped `fn`
+    They are only read from `fn.cache_info()` when the metrics are collected
+    """
+
+    def cache_info():
+        info = fn.cache_info()
+        return {(cache_name, "hit"): info.hits, (cache_name, "miss"): info.misses}
+
+    LRU_CACHE_CALLBACKS.append(cache_info)
+
+
+def _lru_cache_results():
+    results = {}
+    for callback in LRU_CACHE_CALLBACKS:
+        results.update(callback())
+    return results
+
+
+LRU_CACHES = REGISTRY.register(
+    Counter(
+        "foulplay_lru_cache_total",
+        "Lookups in in-memory caches",
+        label_names=["cache", "result"],
+        callback=_lru_cache_results,
+    )
+)
+
+
+# called with each decision (`{"decision_ms": ...}`) and battle result (`{"format": ..., "won": ...}`)
+# e.g. `fleet.py` forwards them from each bot to the supervisor
+EVENT_LISTENERS = []
+
+
+def _notify(event: dict):
+    for listener in EVENT_LISTENERS:
+        listener(event)
+
+
+def observe_decision(record: dict, total_ms):
+    """
+    Adds one `fp.tracing.DecisionTimings` record to the decision metrics
+    """
+    _notify({"decision_ms": total_ms})
+    DECISION_SECONDS.observe(total_ms / 1000)
+    for phase, ms in record.get("phases_ms", {}).items():
+        DECISION_PHASE_SECONDS.observe(ms / 1000, phase=phase)
+    if "num_battles" in record:
+        SAMPLES_PER_DECISION.observe(record["num_battles"])
+    if "iterations" in record:
+        SEARCH_ITERATIONS.observe(record["iterations"])
+
+
+def record_battle_result(pokemon_format, won: bool):
+    _notify({"format": pokemon_format, "won": won})
+    BATTLES.inc(format=pokemon_format, result="win" if won else "loss")
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = REGISTRY.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # scrapes would otherwise be written to stderr
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serves the metrics in the Prometheus text format at http://<host>:<port>/metrics
+    from a background thread
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    logger.info("Serving metrics on http://{}:{}/metrics".format(host, port))
+    return server
+
+
+class MetricsDump:
+    """
+    Appends every metric to `path` as one JSON line every `interval_seconds`
+    from a background thread. `stop` writes a final line
+    """
+
+    def __init__(self, path, interval_seconds):
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-dump", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def write(self):
+        with open(self.path, "a") as f:
+            f.write(
+                json.dumps({"time": time.time(), "metrics": REGISTRY.to_dict()}) + "\n"
+            )
+
+    def _run(self):
+        while not self._stopped.wait(self.interval_seconds):
+            self.write()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.write()
@@ -0,0 +1,183 @@
+"""
+Remembers the searches made at team preview and on turn 1 of standard battles
+
+A bot playing a fixed team meets the same previewed teams over and over. Every search
+made in one of these positions adds its policy to the book, once enough searches agree
+on a decision it is sent without searching again
+
+The book is an SQLite file, so every bot run by `fleet.py` can read and add to the same one
+"""
+
+import hashlib
+import logging
+import sqlite3
+from typing import NamedTuple
+from typing import Optional
+
+import constants
+from fp.battle import Battle
+
+logger = logging.getLogger(__name__)
+
+LEAD = "lead"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    format TEXT NOT NULL,
+    team TEXT NOT NULL,
+    opponent TEXT NOT NULL,
+    situation TEXT NOT NULL,
+    searches INTEGER NOT NULL,
+    PRIMARY KEY (format, team, opponent, situation)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS policies (
+    format TEXT NOT NULL,
+    team TEXT NOT NULL,
+    opponent TEXT NOT NULL,
+    situation TEXT NOT NULL,
+    decision TEXT NOT NULL,
+    weight REAL NOT NULL,
+    PRIMARY KEY (format, team, opponent, situation, decision)
+) WITHOUT ROWID;
+"""
+
+
+class OpeningPosition(NamedTuple):
+    format: str
+    # a hash of the bot's team, the same species with different sets are different teams
+    team: str
+    # the opponent's previewed species
+    opponent: str
+    # `lead`, or the actives on turn 1 e.g. `turn1 garchomp ironvaliant`
+    situation: str
+
+
+def team_key(pokemon) -> str:
+    sets = sorted(
+        "{} {} {} {}".format(
+            pkmn.name,
+            pkmn.item,
+            pkmn.ability,
+            ",".join(sorted(m.name for m in pkmn.moves)),
+        )
+        for pkmn in pokemon
+    )
+    return hashlib.sha1("\n".join(sets).encode()).hexdigest()[:16]
+
+
+def opening_position(battle: Battle) -> Optional[OpeningPosition]:
+    """
+    The book position of this decision, None if it is not one the book keeps
+    """
+    if battle.battle_type != constants.STANDARD_BATTLE:
+        return None
+
+    if battle.team_preview:
+        user_pokemon = battle.user.reserve
+        opponent_pokemon = battle.opponent.reserve
+        situation = LEAD
+    elif battle.turn == 1 and not (battle.request_json or {}).get(
+        constants.FORCE_SWITCH
+    ):
+        user_pokemon = [battle.user.active, *battle.user.reserve]
+        opponent_pokemon = [battle.opponent.active, *battle.opponent.reserve]
+        situation = "turn1 {} {}".format(
+            battle.user.active.name, battle.opponent.active.name
+        )
+    else:
+        return None
+
+    return OpeningPosition(
+        # e.g. battle-gen9ou-12345
+        battle.battle_tag.split("-")[1],
+        team_key(user_pokemon),
+        " ".join(sorted(pkmn.name for pkmn in opponent_pokemon)),
+        situation,
+    )
+
+
+class OpeningBook:
+    def __init__(self, path, confidence, min_searches):
+        """
+        A decision is taken from the book once `min_searches` searches were
+        recorded for its position and it has at least `confidence` of their policy
+        """
+        self.path = path
+        self.confidence = confidence
+        self.min_searches = min_searches
+        connection = self._connect()
+        try:
+            # readers don't block the writer, or each other
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def _connect(self):
+        # a connection per call so the book can be used from any thread or forked process
+        return sqlite3.connect(self.path, timeout=30)
+
+    def lookup(self, position: OpeningPosition) -> Optional[str]:
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT searches FROM positions WHERE format = ? AND team = ? AND opponent = ? AND situation = ?",
+                position,
+            ).fetchone()
+            if row is None or row[0] < self.min_searches:
+                return None
+            searches = row[0]
+
+            decision, weight = connection.execute(
+                "SELECT decision, weight FROM policies WHERE format = ? AND team = ? AND opponent = ? AND situation = ? "
+                "ORDER BY weight DESC LIMIT 1",
+                position,
+            ).fetchone()
+        finally:
+            connection.close()
+
+        if weight / searches < self.confidence:
+            return None
+        logger.info(
+            "Opening book: {} with {}% of {} searches".format(
+                decision, round(100 * weight / searches, 1), searches
+            )
+        )
+        return decision
+
+    def record(self, position: OpeningPosition, policy: dict):
+        """
+        Adds one search's policy, `{decision: weight}`, to the position
+        """
+        total = sum(policy.values())
+        if not total:
+            return
+
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT INTO positions VALUES (?, ?, ?, ?, 1) "
+                    "ON CONFLICT (format, team, opponent, situation) DO UPDATE SET searches = searches + 1",
+                    position,
+                )
+                connection.executemany(
+                    "INSERT INTO policies VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (format, team, opponent, situation, decision) DO UPDATE SET weight = weight + excluded.weight",
+                    [
+                        (*position, decision, weight / total)
+                        for decision, weight in policy.items()
+                    ],
+                )
+        finally:
+            connection.close()
+
+
+_opening_books = {}
+
+
+def get_opening_book(path, confidence, min_searches) -> OpeningBook:
+    key = (path, confidence, min_searches)
+    if key not in _opening_books:
+        _opening_books[key] = OpeningBook(path, confidence, min_searches)
+    return _opening_books[key]
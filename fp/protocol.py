@@ -0,0 +1,52 @@
+from typing import NamedTuple
+from typing import Optional
+
+
+SIDES = ("p1", "p2")
+
+
+class ProtocolEvent(NamedTuple):
+    """
+    One line of a pokemon-showdown battle message, split once
+
+    `split_msg` is the line split on "|" - the same list the battle modifiers
+    have always been given - so `split_msg[0]` is the empty string before the first "|"
+    """
+
+    line: str
+    split_msg: list[str]
+    action: str
+
+    @property
+    def side(self) -> Optional[str]:
+        # |move|p2a: Weedle|Tackle|p1a: Pikachu -> p2
+        if len(self.split_msg) > 2 and self.split_msg[2][:2] in SIDES:
+            return self.split_msg[2][:2]
+        return None
+
+    @property
+    def tags(self) -> dict[str, str]:
+        # |-damage|p2a: Weedle|88/100|[from] item: Life Orb -> {"from": "item: Life Orb"}
+        tags = {}
+        for arg in self.split_msg[3:]:
+            if arg.startswith("[") and "]" in arg:
+                tag, value = arg[1:].split("]", 1)
+                tags[tag] = value.strip()
+        return tags
+
+
+def parse_line(line) -> ProtocolEvent:
+    if isinstance(line, ProtocolEvent):
+        return line
+
+    split_msg = line.split("|")
+    action = split_msg[1].strip() if len(split_msg) >= 2 else ""
+    return ProtocolEvent(line, split_msg, action)
+
+
+def parse_lines(lines) -> list[ProtocolEvent]:
+    """
+    Parses every line that hasn't been parsed yet. Lines that are already
+    ProtocolEvents are passed through so parsing happens once per line
+    """
+    return [parse_line(line) for line in lines]
@@ -2,17 +2,32 @@ import importlib
 import json
 import asyncio
 import concurrent.futures
-from copy import deepcopy
+import contextvars
 import logging
+import os
+import time
 
 from data.pkmn_sets import RandomBattleTeamDatasets, TeamDatasets
 from data.pkmn_sets import SmogonSets
+from data.pkmn_sets import preload
+from data.mods.apply_mods import use_mods
 import constants
 from config import FoulPlayConfig, SaveReplay
 from fp.battle import LastUsedMove, Pokemon, Battle
 from fp.battle_bots.helpers import format_decision
+from fp.battle_history import BattleHistory
 from fp.battle_modifier import async_update_battle, process_battle_updates
+from fp.cpu_budget import hold_cpus
 from fp.helpers import normalize_name
+from fp.legal_actions import forced_decision
+from fp.legal_actions import user_options
+from fp.metrics import DECISIONS
+from fp.opening_book import OpeningBook
+from fp.opening_book import get_opening_book
+from fp.opening_book import opening_position
+from fp.tracing import DecisionTimings
+from fp.tracing import profiled
+from fp.tracing import set_decision_timings
 
 from fp.websocket_client import PSWebsocketClient
 
@@ -35,29 +50,116 @@ def extract_battle_factory_tier_from_msg(msg):
     return normalize_name(tier_name)
 
 
-async def async_pick_move(battle):
-    battle_copy = deepcopy(battle)
-    if not battle_copy.team_preview:
-        battle_copy.user.update_from_request_json(battle_copy.request_json)
+# one pool runs the searches of every decision, a new pool per decision
+# would start a thread each time
+SEARCH_EXECUTOR = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="search")
 
-    loop = asyncio.get_event_loop()
-    with concurrent.futures.ThreadPoolExecutor() as pool:
-        best_move = await loop.run_in_executor(pool, battle_copy.find_best_move)
-    battle.user.last_selected_move = LastUsedMove(
-        battle.user.active.name, best_move.removesuffix("-tera"), battle.turn
+
+def opening_book() -> OpeningBook:
+    return get_opening_book(
+        FoulPlayConfig.opening_book_file,
+        FoulPlayConfig.opening_book_confidence,
+        FoulPlayConfig.opening_book_min_searches,
     )
+
+
+def book_decision(battle_copy, position):
+    """
+    The book's decision for this position, if it has a confident one that can be sent
+    """
+    decision = opening_book().lookup(position)
+    if decision is None:
+        return None
+
+    if battle_copy.team_preview:
+        legal = [
+            "{} {}".format(constants.SWITCH_STRING, pkmn.name)
+            for pkmn in battle_copy.user.reserve
+        ]
+    else:
+        legal = user_options(battle_copy) or []
+    if decision not in legal:
+        logger.warning("Opening book decision {} is not an option".format(decision))
+        return None
+    return decision
+
+
+async def search_for_move(battle, battle_copy, timings):
+    # run the search in a copy of this context so it sees the battle's generation data
+    # and records its timings for this decision
+    context = contextvars.copy_context()
+    context.run(set_decision_timings, timings)
+
+    find_best_move = battle_copy.find_best_move
+    if FoulPlayConfig.profile_turn == battle.turn:
+        find_best_move = profiled(
+            find_best_move,
+            os.path.join("logs", "{}_turn{}".format(battle.battle_tag, battle.turn)),
+        )
+
+    submitted = time.perf_counter()
+
+    def search():
+        # time spent waiting for a thread in the pool
+        timings.add_phase("executor", (time.perf_counter() - submitted) * 1000)
+        waiting = time.perf_counter()
+        with hold_cpus(FoulPlayConfig.parallelism):
+            timings.add_phase("cpu_budget", (time.perf_counter() - waiting) * 1000)
+            return find_best_move()
+
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(SEARCH_EXECUTOR, context.run, search)
+
+
+async def async_pick_move(battle, team_preview=False):
+    start = time.perf_counter()
+    timings = DecisionTimings(battle.battle_tag, battle.turn)
+    with timings.phase("snapshot"):
+        battle_copy = battle.snapshot()
+    if team_preview:
+        battle_copy.user.active = Pokemon.get_dummy()
+        battle_copy.opponent.active = Pokemon.get_dummy()
+        battle_copy.team_preview = True
+    else:
+        battle_copy.user.update_from_request_json(battle_copy.request_json)
+
+    position = None
+    if FoulPlayConfig.opening_book_file:
+        position = opening_position(battle_copy)
+
+    forced = None if team_preview else forced_decision(battle_copy)
+    from_book = None
+    if forced is None and position is not None:
+        from_book = await asyncio.to_thread(book_decision, battle_copy, position)
+
+    if forced is not None:
+        logger.info("Only one option: {}".format(forced))
+        best_move = forced
+        timings.fields["forced"] = True
+        DECISIONS.inc(path="forced")
+    elif from_book is not None:
+        best_move = from_book
+        timings.fields["book"] = True
+        DECISIONS.inc(path="book")
+    else:
+        best_move = await search_for_move(battle, battle_copy, timings)
+        DECISIONS.inc(path="search")
+        # every search refines the book, including ones it was not confident enough to skip
+        if position is not None:
+            policy = timings.fields.get("policy") or {best_move: 1}
+            await asyncio.to_thread(opening_book().record, position, policy)
+
+    timings.emit((time.perf_counter() - start) * 1000)
+    if not team_preview:
+        battle.user.last_selected_move = LastUsedMove(
+            battle.user.active.name, best_move.removesuffix("-tera"), battle.turn
+        )
     return format_decision(battle_copy, best_move)
 
 
 async def handle_team_preview(battle, ps_websocket_client):
-    battle_copy = deepcopy(battle)
-    battle_copy.user.active = Pokemon.get_dummy()
-    battle_copy.opponent.active = Pokemon.get_dummy()
-    battle_copy.team_preview = True
-
-    best_move = await async_pick_move(battle_copy)
+    best_move = await async_pick_move(battle, team_preview=True)
 
-    # because we copied the battle before sending it in, we need to update the last selected move here
     pkmn_name = battle.user.reserve[int(best_move[0].split()[1]) - 1].name
     battle.user.last_selected_move = LastUsedMove(
         "teampreview", "switch {}".format(pkmn_name), battle.turn
@@ -168,6 +270,16 @@ async def start_random_battle(
     return battle
 
 
+async def initialize_smogon_sets(pokemon_battle_type, pkmn_names):
+    """
+    `SmogonSets.initialize` downloads the stats itself if prefetching them failed,
+    so it runs on a thread to keep that download off the event loop
+    """
+    smogon_stats = FoulPlayConfig.smogon_stats or pokemon_battle_type
+    await SmogonSets.prefetch(smogon_stats)
+    await asyncio.to_thread(SmogonSets.initialize, smogon_stats, pkmn_names)
+
+
 async def start_standard_battle(
     ps_websocket_client: PSWebsocketClient, pokemon_battle_type
 ):
@@ -198,9 +310,7 @@ async def start_standard_battle(
         unique_pkmn_names = set(
             [p.name for p in battle.user.reserve] + [battle.user.active.name]
         )
-        SmogonSets.initialize(
-            FoulPlayConfig.smogon_stats or pokemon_battle_type, unique_pkmn_names
-        )
+        await initialize_smogon_sets(pokemon_battle_type, unique_pkmn_names)
         TeamDatasets.initialize(pokemon_battle_type, unique_pkmn_names)
 
         # apply the messages that were held onto
@@ -246,9 +356,7 @@ async def start_standard_battle(
             )
         else:
             battle.battle_type = constants.STANDARD_BATTLE
-            SmogonSets.initialize(
-                FoulPlayConfig.smogon_stats or pokemon_battle_type, unique_pkmn_names
-            )
+            await initialize_smogon_sets(pokemon_battle_type, unique_pkmn_names)
             TeamDatasets.initialize(pokemon_battle_type, unique_pkmn_names)
 
         await handle_team_preview(battle, ps_websocket_client)
@@ -262,13 +370,50 @@ async def start_battle(ps_websocket_client, pokemon_battle_type):
     else:
         battle = await start_standard_battle(ps_websocket_client, pokemon_battle_type)
 
+    battle.history = BattleHistory(battle)
     await ps_websocket_client.send_message(battle.battle_tag, ["hf"])
     await ps_websocket_client.send_message(battle.battle_tag, ["/timer on"])
 
     return battle
 
 
+async def prewarm(pokemon_battle_type):
+    """
+    Loads the datasets for `pokemon_battle_type` and starts the bot's workers,
+    called while waiting for a battle so that none of it is done on the battle's clock
+
+    Once a battle starts the datasets only pick out the pokemon in that battle
+    """
+    start = time.perf_counter()
+    with use_mods(pokemon_battle_type):
+        await asyncio.to_thread(preload, pokemon_battle_type)
+        if "random" in pokemon_battle_type:
+            await asyncio.to_thread(
+                RandomBattleTeamDatasets.initialize, pokemon_battle_type[:4]
+            )
+        elif "battlefactory" not in pokemon_battle_type:
+            smogon_stats = FoulPlayConfig.smogon_stats or pokemon_battle_type
+            await SmogonSets.prefetch(smogon_stats)
+            await asyncio.to_thread(SmogonSets.prewarm, smogon_stats)
+            await asyncio.to_thread(TeamDatasets.prewarm, pokemon_battle_type)
+
+    battle_bot = importlib.import_module(
+        "fp.battle_bots.{}.main".format(FoulPlayConfig.battle_bot_module)
+    ).BattleBot
+    await asyncio.to_thread(battle_bot.prewarm)
+    logger.info(
+        "Prewarmed {} in {}ms".format(
+            pokemon_battle_type, round((time.perf_counter() - start) * 1000)
+        )
+    )
+
+
 async def pokemon_battle(ps_websocket_client, pokemon_battle_type):
+    with use_mods(pokemon_battle_type):
+        return await _pokemon_battle(ps_websocket_client, pokemon_battle_type)
+
+
+async def _pokemon_battle(ps_websocket_client, pokemon_battle_type):
     battle = await start_battle(ps_websocket_client, pokemon_battle_type)
     while True:
         msg = await ps_websocket_client.receive_message()
@@ -0,0 +1,202 @@
+import cProfile
+import json
+import logging
+import os
+import queue
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+
+from fp.metrics import TRACE_QUEUE_DEPTH
+from fp.metrics import observe_decision
+
+# span events go to their own logger so they never end up in the regular logs
+# it is disabled until `start_trace_sink` is called
+SPAN_LOGGER = logging.getLogger("fp.trace")
+SPAN_LOGGER.setLevel(logging.CRITICAL)
+SPAN_LOGGER.propagate = False
+
+logger = logging.getLogger(__name__)
+
+_current_decision = ContextVar("current_decision", default=None)
+
+
+class Lazy:
+    """
+    Defers calling `fn` until the value is formatted into a log message
+
+        debug(logger, "Calling with state: {}", Lazy(state.to_string))
+    """
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __format__(self, format_spec):
+        return format(self.fn(), format_spec)
+
+    def __str__(self):
+        return str(self.fn())
+
+
+def debug(logger, msg, *args):
+    """
+    `logger.debug(msg.format(*args))` that only formats the message,
+    and calls any `Lazy` arguments, when `logger` would emit a debug record
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(msg.format(*args))
+
+
+@contextmanager
+def span(name, **fields):
+    """
+    Times the block and emits it as a structured event on the `fp.trace` logger,
+    e.g. `with span("search", num_battles=4):`
+
+    Nothing is timed or emitted unless a trace sink was started
+    """
+    if not SPAN_LOGGER.isEnabledFor(logging.DEBUG):
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _emit_span(name, (time.perf_counter() - start) * 1000, fields)
+
+
+def _emit_span(name, duration_ms, fields):
+    SPAN_LOGGER.debug(
+        name,
+        extra={
+            "span": name,
+            "duration_ms": round(duration_ms, 3),
+            "fields": fields,
+        },
+    )
+
+
+class DecisionTimings:
+    """
+    How long each phase of picking one move took (e.g. sample, convert, search)
+    along with other numbers the bot reports, such as the search's iterations/sec
+
+    `fp.run_battle.async_pick_move` creates one per decision and emits it once a move
+    was picked. Bots get the current one with `decision_timings()`
+    """
+
+    def __init__(self, battle_tag=None, turn=None):
+        self.battle_tag = battle_tag
+        self.turn = turn
+        self.phases = {}
+        self.fields = {}
+
+    @contextmanager
+    def phase(self, name, **fields):
+        start = time.perf_counter()
+        try:
+            with span(name, **fields):
+                yield
+        finally:
+            self.add_phase(name, (time.perf_counter() - start) * 1000)
+
+    def add_phase(self, name, duration_ms):
+        self.phases[name] = self.phases.get(name, 0) + duration_ms
+
+    def to_dict(self):
+        return {
+            "battle_tag": self.battle_tag,
+            "turn": self.turn,
+            "phases_ms": {name: round(ms, 3) for name, ms in self.phases.items()},
+            **self.fields,
+        }
+
+    def emit(self, total_ms):
+        record = self.to_dict()
+        record["total_ms"] = round(total_ms, 3)
+        logger.info("Decision timings: {}".format(json.dumps(record, default=str)))
+        observe_decision(record, total_ms)
+        if SPAN_LOGGER.isEnabledFor(logging.DEBUG):
+            _emit_span("decision", total_ms, record)
+
+
+def decision_timings() -> DecisionTimings:
+    """
+    The DecisionTimings for the decision being made in this context
+    A throwaway one is returned when a bot is called directly (e.g. in tests)
+    """
+    timings = _current_decision.get()
+    if timings is None:
+        return DecisionTimings()
+    return timings
+
+
+def set_decision_timings(timings: DecisionTimings):
+    _current_decision.set(timings)
+
+
+def profiled(fn, path_prefix):
+    """
+    Wraps `fn` so that calling it writes a cProfile dump to `<path_prefix>.prof`
+    and the lines that allocated the most memory during the call to `<path_prefix>.tracemalloc.txt`
+
+    Only the calling thread is profiled, the searches running in worker processes are not
+    """
+
+    def profiled_fn(*args, **kwargs):
+        directory = os.path.dirname(path_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+        try:
+            return profiler.runcall(fn, *args, **kwargs)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            profiler.dump_stats("{}.prof".format(path_prefix))
+            with open("{}.tracemalloc.txt".format(path_prefix), "w") as f:
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write("{}\n".format(stat))
+            logger.info("Wrote profile of {} to {}.*".format(fn.__name__, path_prefix))
+
+    return profiled_fn
+
+
+class SpanFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(
+            {
+                "time": record.created,
+                "span": record.span,
+                "duration_ms": record.duration_ms,
+                **record.fields,
+            },
+            default=str,
+        )
+
+
+def start_trace_sink(path) -> QueueListener:
+    """
+    Writes span events to `path` as JSON lines
+
+    The code being traced only puts each event on a queue,
+    formatting and writing the file happens on the listener's thread
+    """
+    events = queue.SimpleQueue()
+    file_handler = logging.FileHandler(path)
+    file_handler.setFormatter(SpanFormatter())
+    listener = QueueListener(events, file_handler)
+    listener.start()
+
+    TRACE_QUEUE_DEPTH.callback = lambda: {(): events.qsize()}
+    SPAN_LOGGER.addHandler(QueueHandler(events))
+    SPAN_LOGGER.setLevel(logging.DEBUG)
+    return listener
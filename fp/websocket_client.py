@@ -3,12 +3,21 @@ import websockets
 import requests
 import json
 import time
+import re
 
 import logging
 
+from fp.metrics import WEBSOCKET_MESSAGES
+from fp.tracing import debug
+
 logger = logging.getLogger(__name__)
 
 
+def to_id(name):
+    # how Pokemon Showdown turns a username into a user id
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
 class LoginError(Exception):
     pass
 
@@ -25,15 +34,24 @@ class PSWebsocketClient:
     password = None
     last_message = None
     last_challenge_time = 0
+    http_session = None
 
     @classmethod
-    async def create(cls, username, password, address):
+    async def create(
+        cls,
+        username,
+        password,
+        address,
+        login_uri="https://play.pokemonshowdown.com/api/login",
+    ):
         self = PSWebsocketClient()
         self.username = username
         self.password = password
         self.address = address
         self.websocket = await websockets.connect(self.address)
-        self.login_uri = "https://play.pokemonshowdown.com/api/login"
+        self.login_uri = login_uri
+        # reused for every login so reconnecting does not open a new connection
+        self.http_session = requests.Session()
         return self
 
     async def join_room(self, room_name):
@@ -43,13 +61,15 @@ class PSWebsocketClient:
 
     async def receive_message(self):
         message = await self.websocket.recv()
-        logger.debug("Received message from websocket: {}".format(message))
+        WEBSOCKET_MESSAGES.inc(direction="received")
+        debug(logger, "Received message from websocket: {}", message)
         return message
 
     async def send_message(self, room, message_list):
         message = room + "|" + "|".join(message_list)
-        logger.debug("Sending message to websocket: {}".format(message))
+        debug(logger, "Sending message to websocket: {}", message)
         await self.websocket.send(message)
+        WEBSOCKET_MESSAGES.inc(direction="sent")
         self.last_message = message
 
     async def avatar(self, avatar):
@@ -74,6 +94,8 @@ class PSWebsocketClient:
 
     async def close(self):
         await self.websocket.close()
+        if self.http_session is not None:
+            self.http_session.close()
 
     async def get_id_and_challstr(self):
         while True:
@@ -82,28 +104,43 @@ class PSWebsocketClient:
             if split_message[1] == "challstr":
                 return split_message[2], split_message[3]
 
+    async def wait_for_login(self):
+        # |updateuser| USERNAME|NAMED|AVATAR|SETTINGS
+        while True:
+            message = await self.receive_message()
+            split_message = message.split("|")
+            if len(split_message) < 4:
+                continue
+            if split_message[1] == "nametaken":
+                logger.error("Login Unsuccessful: {}".format(message))
+                raise LoginError("Could not log-in: {}".format(split_message[-1]))
+            if (
+                split_message[1] == "updateuser"
+                and split_message[3] == "1"
+                and to_id(split_message[2]) == to_id(self.username)
+            ):
+                return
+
     async def login(self):
         logger.info("Logging in...")
         client_id, challstr = await self.get_id_and_challstr()
         if self.password:
-            response = requests.post(
-                self.login_uri,
-                data={
-                    "name": self.username,
-                    "pass": self.password,
-                    "challstr": "|".join([client_id, challstr]),
-                },
-            )
-
+            data = {
+                "name": self.username,
+                "pass": self.password,
+                "challstr": "|".join([client_id, challstr]),
+            }
         else:
-            response = requests.post(
-                self.login_uri,
-                data={
-                    "act": "getassertion",
-                    "userid": self.username,
-                    "challstr": "|".join([client_id, challstr]),
-                },
-            )
+            data = {
+                "act": "getassertion",
+                "userid": self.username,
+                "challstr": "|".join([client_id, challstr]),
+            }
+
+        # requests blocks, so the login request runs in a thread to keep the event loop free
+        response = await asyncio.to_thread(
+            self.http_session.post, self.login_uri, data=data
+        )
 
         if response.status_code == 200:
             if self.password:
@@ -117,9 +154,9 @@ class PSWebsocketClient:
                 assertion = response.text
 
             message = ["/trn " + self.username + ",0," + assertion]
-            logger.info("Successfully logged in")
             await self.send_message("", message)
-            await asyncio.sleep(3)
+            await self.wait_for_login()
+            logger.info("Successfully logged in")
         else:
             logger.error("Could not log-in\nDetails:\n{}".format(response.content))
             raise LoginError("Could not log-in")
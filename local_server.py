@@ -0,0 +1,610 @@
+"""
+A stand-in for a Pokemon Showdown server that runs on this machine, for end-to-end and load tests
+
+It speaks the part of the protocol that `PSWebsocketClient` uses and plays each battle by replaying
+a battle log (written with LOG_TO_FILE=True): the recorded messages are sent to the bot, and wherever the
+recorded bot made a choice the server waits for the connected bot to make one.
+The bot's choices do not change what happens next, so only the bot's decisions are exercised
+
+With --simulator, bots that challenge each other or search for the same format play real battles
+run by Pokemon Showdown's simulator (see self_play.py)
+
+    python local_server.py logs/ --port 8000
+
+    WEBSOCKET_URI=ws://127.0.0.1:8000/showdown/websocket PS_LOGIN_URI=http://127.0.0.1:8001/api/login python run.py
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import secrets
+import shlex
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import AsyncIterator
+from typing import NamedTuple
+from typing import Optional
+from urllib.parse import parse_qs
+
+from websockets.asyncio.server import serve
+
+import constants
+from fp.battle_log import LOG_FILE_SUFFIXES
+from fp.battle_log import RECEIVED
+from fp.battle_log import get_battle_tag
+from fp.battle_log import get_pokemon_battle_type
+from fp.battle_log import read_battle_log
+
+logger = logging.getLogger(__name__)
+
+CHOICE_PREFIXES = ("/choose", "/switch", "/team")
+SIMULATOR_MESSAGE_TYPES = {"update", "sideupdate", "end"}
+OPPONENT_NAME = "localopponent"
+
+
+class RecordedBattle(NamedTuple):
+    pokemon_format: str
+    battle_tag: str
+    bot_name: str
+    # the messages to send, `None` is where the recorded bot made a choice
+    steps: list[Optional[str]]
+
+
+def load_recorded_battle(path) -> Optional[RecordedBattle]:
+    records = read_battle_log(path)
+    battle_tag = get_battle_tag(records)
+    if battle_tag is None:
+        return None
+
+    room_prefix = ">{}".format(battle_tag)
+    bot_name = None
+    steps = []
+    for record in records:
+        if record.direction == RECEIVED:
+            if not record.message.startswith(room_prefix):
+                continue
+            steps.append(record.message)
+            if bot_name is None and "|request|{" in record.message:
+                request = record.message.split("|request|")[1].split("\n")[0]
+                bot_name = json.loads(request)[constants.SIDE]["name"]
+        else:
+            room, _, choice = record.message.partition("|")
+            if room == battle_tag and choice.startswith(CHOICE_PREFIXES):
+                steps.append(None)
+
+    if bot_name is None:
+        return None
+    return RecordedBattle(
+        get_pokemon_battle_type(battle_tag), battle_tag, bot_name, steps
+    )
+
+
+def load_recorded_battles(log_dir) -> list[RecordedBattle]:
+    recorded_battles = []
+    for f in sorted(os.listdir(log_dir)):
+        if f.endswith(LOG_FILE_SUFFIXES):
+            recorded = load_recorded_battle(os.path.join(log_dir, f))
+            if recorded is None:
+                logger.warning("No battle found in {}".format(f))
+            else:
+                recorded_battles.append(recorded)
+    if not recorded_battles:
+        raise ValueError("No battles found in {}".format(log_dir))
+    return recorded_battles
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[
+        min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    ]
+
+
+def latency_summary(latencies_ms):
+    latencies = sorted(latencies_ms)
+    return {
+        "p50": round(percentile(latencies, 0.5), 3),
+        "p90": round(percentile(latencies, 0.9), 3),
+        "p99": round(percentile(latencies, 0.99), 3),
+        "max": round(latencies[-1], 3),
+    }
+
+
+class LoadStats:
+    """
+    Decision latency is the time from the server sending the message a bot
+    has to respond to until the server receives the bot's choice
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.latencies_ms = []
+        self.latencies_ms_by_user = defaultdict(list)
+        self.timeouts = 0
+        self.battles_started = 0
+        self.battles_finished = 0
+
+    def record_decision(self, username, latency_ms):
+        self.latencies_ms.append(latency_ms)
+        self.latencies_ms_by_user[username].append(latency_ms)
+
+    def to_dict(self):
+        elapsed = time.time() - self.started_at
+        stats = {
+            "seconds": round(elapsed, 3),
+            "battles_started": self.battles_started,
+            "battles_finished": self.battles_finished,
+            "decisions": len(self.latencies_ms),
+            "decisions_per_second": round(len(self.latencies_ms) / elapsed, 3)
+            if elapsed
+            else None,
+            "timeouts": self.timeouts,
+        }
+        if self.latencies_ms:
+            stats["latency_ms"] = latency_summary(self.latencies_ms)
+        return stats
+
+
+def split_update(lines, side_id) -> list[str]:
+    """
+    The lines of a simulator update as `side_id` sees them
+    `|split|<side>` is followed by the line that side sees and then the line everyone else sees
+    """
+    side_lines = []
+    lines = iter(lines)
+    for line in lines:
+        if line.startswith("|split|"):
+            secret, public = next(lines), next(lines)
+            side_lines.append(secret if line == "|split|{}".format(side_id) else public)
+        else:
+            side_lines.append(line)
+    return side_lines
+
+
+def simulator_choice(choice):
+    # "/choose move 1 terastallize|3" -> "move 1 terastallize"
+    choice = choice.split("|")[0]
+    if choice.startswith("/choose "):
+        return choice[len("/choose ") :]
+    return choice[1:]
+
+
+async def read_simulator_chunks(stdout) -> AsyncIterator[list[str]]:
+    """
+    Yields each message the simulator writes (`update`, `sideupdate` or `end` followed by its lines)
+    A message ends when the next one starts or when nothing more is written for a moment
+    """
+    lines = []
+    while True:
+        try:
+            line = await asyncio.wait_for(
+                stdout.readline(), timeout=0.01 if lines else None
+            )
+        except asyncio.TimeoutError:
+            yield lines
+            lines = []
+            continue
+
+        if not line:
+            if lines:
+                yield lines
+            return
+
+        line = line.decode().rstrip("\n")
+        if line in SIMULATOR_MESSAGE_TYPES and lines:
+            yield lines
+            lines = []
+        lines.append(line)
+
+
+class Session:
+    def __init__(self, connection):
+        self.connection = connection
+        self.username = None
+        self.avatar = None
+        self.team = None
+        self.battle = None
+        self.battle_tag = None
+        self.challenge_format = None
+        self.choices = asyncio.Queue()
+        self.simulated_battle = None
+
+
+class SimulatedBattle:
+    """
+    A battle between two connected bots played by Pokemon Showdown's own simulator
+    Each bot is sent what that player would see on a real server
+    """
+
+    def __init__(self, server, battle_tag, pokemon_format, sessions):
+        self.server = server
+        self.battle_tag = battle_tag
+        self.pokemon_format = pokemon_format
+        self.sessions = dict(zip(["p1", "p2"], sessions))
+        self.request_sent_at = {}
+        self.simulator = None
+
+    async def send(self, side_id, lines):
+        await self.sessions[side_id].connection.send(
+            "\n".join([">{}".format(self.battle_tag)] + lines)
+        )
+
+    async def choose(self, session, choice):
+        side_id = next(s for s, v in self.sessions.items() if v is session)
+        sent_at = self.request_sent_at.pop(side_id, None)
+        if sent_at is not None:
+            self.server.stats.record_decision(
+                session.username, (time.perf_counter() - sent_at) * 1000
+            )
+        self.simulator.stdin.write(
+            ">{} {}\n".format(side_id, simulator_choice(choice)).encode()
+        )
+        await self.simulator.stdin.drain()
+
+    async def play(self):
+        self.server.stats.battles_started += 1
+        self.simulator = await asyncio.create_subprocess_exec(
+            *self.server.simulator,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        try:
+            await self._play()
+        finally:
+            if self.simulator.returncode is None:
+                self.simulator.kill()
+                await self.simulator.wait()
+
+    async def _play(self):
+        title = "{} vs. {}".format(
+            self.sessions["p1"].username, self.sessions["p2"].username
+        )
+        for side_id, session in self.sessions.items():
+            await self.send(
+                side_id,
+                [
+                    "|init|battle",
+                    "|title|{}".format(title),
+                    "|j|☆{}".format(session.username),
+                ],
+            )
+
+        commands = [">start {}".format(json.dumps({"formatid": self.pokemon_format}))]
+        for side_id, session in self.sessions.items():
+            player = {"name": session.username}
+            if session.team not in (None, "None", "null"):
+                player["team"] = session.team
+            commands.append(">player {} {}".format(side_id, json.dumps(player)))
+        self.simulator.stdin.write("".join(c + "\n" for c in commands).encode())
+        await self.simulator.stdin.drain()
+
+        async for lines in read_simulator_chunks(self.simulator.stdout):
+            message_type = lines[0]
+            if message_type == "update":
+                for side_id in self.sessions:
+                    await self.send(side_id, split_update(lines[1:], side_id))
+            elif message_type == "sideupdate":
+                side_id = lines[1]
+                await self.send(side_id, lines[2:])
+                request = lines[2]
+                if request.startswith("|request|") and '"wait":true' not in request:
+                    self.request_sent_at[side_id] = time.perf_counter()
+            elif message_type == "end":
+                winner = json.loads(lines[1]).get("winner") or None
+                self.server.results.append(
+                    {
+                        "battle_tag": self.battle_tag,
+                        "players": [s.username for s in self.sessions.values()],
+                        "winner": winner,
+                    }
+                )
+                self.server.stats.battles_finished += 1
+                return
+
+
+class LocalShowdownServer:
+    """
+    Battles are replayed from `recorded_battles`,
+    or played by Pokemon Showdown's simulator between two connected bots if `simulator` is given.
+    `simulator` is the command that runs it, e.g. `["npx", "pokemon-showdown", "simulate-battle"]`
+    """
+
+    def __init__(
+        self,
+        recorded_battles: list[RecordedBattle],
+        decision_timeout=60,
+        simulator=None,
+    ):
+        self.recorded_battles = recorded_battles
+        self.decision_timeout = decision_timeout
+        self.simulator = simulator
+        self.stats = LoadStats()
+        self.results = []
+        self.sessions_by_name = {}
+        # challenged username -> (challenger's session, format)
+        self.pending_challenges = {}
+        self.searching = {}
+        self._next_battle = itertools.cycle(recorded_battles)
+        self._battle_ids = itertools.count(1)
+
+    def pick_recorded_battle(self, pokemon_format=None) -> RecordedBattle:
+        for _ in range(len(self.recorded_battles)):
+            recorded = next(self._next_battle)
+            if pokemon_format is None or recorded.pokemon_format == pokemon_format:
+                return recorded
+
+        logger.warning(
+            "No recorded {} battles, using another format".format(pokemon_format)
+        )
+        return next(self._next_battle)
+
+    def new_battle_tag(self, pokemon_format):
+        return "battle-{}-{}".format(pokemon_format, next(self._battle_ids))
+
+    async def handle(self, connection):
+        session = Session(connection)
+        await connection.send("|challstr|4|{}".format(secrets.token_hex(64)))
+        try:
+            async for message in connection:
+                await self.handle_message(session, message)
+        finally:
+            if self.sessions_by_name.get(session.username) is session:
+                del self.sessions_by_name[session.username]
+            if session.battle is not None:
+                session.battle.cancel()
+
+    async def handle_message(self, session, message):
+        room, _, text = message.partition("|")
+        command, _, args = text.partition(" ")
+
+        if command == "/trn":
+            session.username = args.split(",")[0]
+            self.sessions_by_name[session.username] = session
+            await session.connection.send(
+                "|updateuser| {}|1|{}|{{}}".format(
+                    session.username, session.avatar or 1
+                )
+            )
+            await self.send_pending_challenge(session.username)
+        elif command == "/avatar":
+            session.avatar = args
+        elif command == "/cmd" and args.startswith("userdetails"):
+            await session.connection.send(
+                "|queryresponse|userdetails|{}".format(
+                    json.dumps({"userid": session.username, "avatar": session.avatar})
+                )
+            )
+        elif command == "/utm":
+            session.team = args
+            if self.simulator is None:
+                # a bot waiting for a challenge accepts this, any other bot ignores it
+                session.challenge_format = self.pick_recorded_battle().pokemon_format
+                await self.send_challenge(
+                    OPPONENT_NAME, session, session.challenge_format
+                )
+        elif command == "/search":
+            await self.search(session, args)
+        elif command == "/challenge":
+            await self.challenge(session, *args.split(","))
+        elif command == "/accept":
+            self.accept(session, args)
+        elif command == "/leave":
+            await session.connection.send(">{}\n|deinit".format(args))
+        elif text.startswith(CHOICE_PREFIXES):
+            if session.battle is None or room != session.battle_tag:
+                return
+            if session.simulated_battle is not None:
+                await session.simulated_battle.choose(session, text)
+            else:
+                session.choices.put_nowait(text)
+        elif command == "/timer" and self.simulator is None:
+            await session.connection.send(
+                ">{}\n|inactive|Battle timer is now ON".format(room)
+            )
+
+    async def send_challenge(self, challenger_name, session, pokemon_format):
+        await session.connection.send(
+            "|pm| {}| {}|/challenge {}|{}|||".format(
+                challenger_name, session.username, pokemon_format, pokemon_format
+            )
+        )
+
+    async def send_pending_challenge(self, username):
+        if username in self.pending_challenges and username in self.sessions_by_name:
+            challenger, pokemon_format = self.pending_challenges[username]
+            await self.send_challenge(
+                challenger.username, self.sessions_by_name[username], pokemon_format
+            )
+
+    async def search(self, session, pokemon_format):
+        if self.simulator is None:
+            self.start_replayed_battle(session, pokemon_format)
+            return
+
+        opponent = self.searching.pop(pokemon_format, None)
+        if opponent is None or opponent is session:
+            self.searching[pokemon_format] = session
+        else:
+            self.start_simulated_battle(pokemon_format, [opponent, session])
+
+    async def challenge(self, session, username, pokemon_format):
+        if self.simulator is None:
+            self.start_replayed_battle(session, pokemon_format)
+            return
+
+        self.pending_challenges[username] = (session, pokemon_format)
+        await self.send_pending_challenge(username)
+
+    def accept(self, session, username):
+        if self.simulator is None:
+            self.start_replayed_battle(session, session.challenge_format)
+            return
+
+        challenger, pokemon_format = self.pending_challenges.get(
+            session.username, (None, None)
+        )
+        if challenger is None or challenger.username != username:
+            logger.warning(
+                "{} accepted a challenge from {} that was not made".format(
+                    session.username, username
+                )
+            )
+            return
+        del self.pending_challenges[session.username]
+        self.start_simulated_battle(pokemon_format, [challenger, session])
+
+    def start_simulated_battle(self, pokemon_format, sessions):
+        battle = SimulatedBattle(
+            self, self.new_battle_tag(pokemon_format), pokemon_format, sessions
+        )
+        task = asyncio.ensure_future(battle.play())
+        for session in sessions:
+            session.battle_tag = battle.battle_tag
+            session.simulated_battle = battle
+            session.battle = task
+
+    def start_replayed_battle(self, session, pokemon_format=None):
+        if session.battle is not None and not session.battle.done():
+            return
+
+        recorded = self.pick_recorded_battle(pokemon_format)
+        session.battle_tag = self.new_battle_tag(recorded.pokemon_format)
+        session.choices = asyncio.Queue()
+        session.battle = asyncio.ensure_future(self.replay(session, recorded))
+
+    async def replay(self, session, recorded: RecordedBattle):
+        self.stats.battles_started += 1
+        sent_at = time.perf_counter()
+        for step in recorded.steps:
+            if step is not None:
+                await session.connection.send(
+                    step.replace(recorded.battle_tag, session.battle_tag).replace(
+                        recorded.bot_name, session.username
+                    )
+                )
+                sent_at = time.perf_counter()
+                continue
+
+            try:
+                await asyncio.wait_for(session.choices.get(), self.decision_timeout)
+            except asyncio.TimeoutError:
+                self.stats.timeouts += 1
+                logger.warning(
+                    "{} did not make a choice in {}".format(
+                        session.username, session.battle_tag
+                    )
+                )
+            else:
+                self.stats.record_decision(
+                    session.username, (time.perf_counter() - sent_at) * 1000
+                )
+
+        self.stats.battles_finished += 1
+
+
+class LoginRequestHandler(BaseHTTPRequestHandler):
+    """
+    Accepts every login. Answers the same way as https://play.pokemonshowdown.com/api/login
+    """
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        assertion = secrets.token_hex(32)
+        if "pass" in form:
+            body = "]{}".format(
+                json.dumps({"actionsuccess": True, "assertion": assertion})
+            )
+        else:
+            body = assertion
+
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_login_server(port, host="127.0.0.1") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), LoginRequestHandler)
+    threading.Thread(
+        target=server.serve_forever, name="login-server", daemon=True
+    ).start()
+    return server
+
+
+async def run_server(server: LocalShowdownServer, host, port, report_interval):
+    async with serve(server.handle, host, port):
+        logger.info(
+            "Serving on ws://{}:{}/showdown/websocket with {} recorded battles".format(
+                host, port, len(server.recorded_battles)
+            )
+        )
+        while True:
+            await asyncio.sleep(report_interval)
+            logger.info(json.dumps(server.stats.to_dict()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "log_dir", nargs="?", help="directory of battle log files to replay"
+    )
+    parser.add_argument(
+        "--simulator",
+        help="command that runs Pokemon Showdown's simulator, e.g. 'npx pokemon-showdown simulate-battle'. "
+        "If set, connected bots play each other instead of replaying logs",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--login-port",
+        type=int,
+        help="port for the login endpoint (default: --port + 1)",
+    )
+    parser.add_argument(
+        "--decision-timeout",
+        type=float,
+        default=60,
+        help="seconds to wait for a bot's choice before carrying on without it",
+    )
+    parser.add_argument("--report-interval", type=float, default=30)
+    parser.add_argument("--output", help="write the final JSON stats here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-8s %(message)s")
+    if args.simulator:
+        server = LocalShowdownServer(
+            [], args.decision_timeout, simulator=shlex.split(args.simulator)
+        )
+    else:
+        if args.log_dir is None:
+            parser.error("log_dir is required unless --simulator is given")
+        server = LocalShowdownServer(
+            load_recorded_battles(args.log_dir), args.decision_timeout
+        )
+
+    start_login_server(args.login_port or args.port + 1, args.host)
+    try:
+        asyncio.run(run_server(server, args.host, args.port, args.report_interval))
+    except KeyboardInterrupt:
+        pass
+
+    stats = json.dumps(server.stats.to_dict(), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(stats)
+    else:
+        print(stats)
+
+
+if __name__ == "__main__":
+    main()
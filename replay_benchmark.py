@@ -0,0 +1,217 @@
+"""
+Measures how fast the battle state tracker (`fp/battle_modifier.py`) processes recorded battles
+
+Replays every battle log in a directory (the files written with LOG_TO_FILE=True)
+and prints a JSON report with lines/sec, the time spent in each protocol handler
+and the time spent in the inference checks
+
+    python replay_benchmark.py logs/ --output before.json
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from unittest import mock
+
+from fp import battle_log
+from fp import battle_modifier
+from fp.battle import Battle
+from fp.battle_bots import poke_engine_helpers
+from fp.battle_log import LOG_FILE_SUFFIXES
+from fp.battle_log import RECEIVED
+from fp.battle_log import get_battle_tag
+from fp.battle_log import get_pokemon_battle_type
+from fp.battle_log import read_battle_log
+from fp.battle_log import replay_battle
+from data.mods.apply_mods import use_mods
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_CHECKS = [
+    "check_speed_ranges",
+    "check_choicescarf",
+    "check_heavydutyboots",
+    "check_opponent_hiddenpower",
+    "get_damage_dealt",
+    "update_dataset_possibilities",
+]
+
+
+class ReplayBattle(Battle):
+    """
+    A battle that is only updated from a log, its choices are the ones the log recorded
+    """
+
+    def find_best_move(self):
+        return None
+
+
+def stub_calculate_damage(*_args):
+    # every possible set fails the damage check so the amount of work done
+    # does not depend on the damage calculator; the resulting sets are meaningless
+    # the engine states are still built so their cost is part of the timings
+    return [0, 0], [0, 0]
+
+
+class Timings:
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    def wrap(self, name, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+                self.calls[name] += 1
+
+        return timed
+
+    def total_seconds(self):
+        return sum(self.seconds.values())
+
+    def to_dict(self):
+        return {
+            name: {"calls": self.calls[name], "seconds": round(self.seconds[name], 6)}
+            for name in sorted(self.seconds, key=self.seconds.get, reverse=True)
+        }
+
+
+@contextlib.contextmanager
+def instrument(tracker_timings, handler_timings, check_timings, stub_engine):
+    with contextlib.ExitStack() as stack:
+        # only the tracker is timed, not reading the log or loading the set datasets
+        for name in ["update_battle", "process_battle_updates"]:
+            stack.enter_context(
+                mock.patch.object(
+                    battle_log,
+                    name,
+                    tracker_timings.wrap(name, getattr(battle_log, name)),
+                )
+            )
+        timed_lookup = {
+            action: handler_timings.wrap(action, fn)
+            for action, fn in battle_modifier.BATTLE_MODIFIERS_LOOKUP.items()
+        }
+        stack.enter_context(
+            mock.patch.dict(battle_modifier.BATTLE_MODIFIERS_LOOKUP, timed_lookup)
+        )
+        for name in INFERENCE_CHECKS:
+            stack.enter_context(
+                mock.patch.object(
+                    battle_modifier,
+                    name,
+                    check_timings.wrap(name, getattr(battle_modifier, name)),
+                )
+            )
+        calculate_damage = (
+            stub_calculate_damage
+            if stub_engine
+            else poke_engine_helpers.calculate_damage
+        )
+        stack.enter_context(
+            mock.patch.object(
+                poke_engine_helpers,
+                "calculate_damage",
+                check_timings.wrap("calculate_damage", calculate_damage),
+            )
+        )
+        yield
+
+
+def count_protocol_lines(records, battle_tag):
+    room_prefix = ">{}".format(battle_tag)
+    return sum(
+        r.message.count("\n")
+        for r in records
+        if r.direction == RECEIVED and r.message.startswith(room_prefix)
+    )
+
+
+def benchmark(log_paths, stub_engine=True):
+    tracker_timings = Timings()
+    handler_timings = Timings()
+    check_timings = Timings()
+    total_lines = 0
+    battles = []
+
+    with instrument(tracker_timings, handler_timings, check_timings, stub_engine):
+        for path in log_paths:
+            records = read_battle_log(path)
+            battle_tag = get_battle_tag(records)
+            if battle_tag is None:
+                logger.warning("No battle found in {}".format(path))
+                continue
+
+            lines = count_protocol_lines(records, battle_tag)
+            pokemon_battle_type = get_pokemon_battle_type(battle_tag)
+            start = tracker_timings.total_seconds()
+            try:
+                with use_mods(pokemon_battle_type):
+                    for _choice in replay_battle(ReplayBattle(battle_tag), records):
+                        pass
+            except Exception:
+                logger.exception("Failed to replay {}".format(path))
+                continue
+            seconds = tracker_timings.total_seconds() - start
+
+            total_lines += lines
+            battles.append(
+                {
+                    "file": os.path.basename(path),
+                    "format": pokemon_battle_type,
+                    "lines": lines,
+                    "seconds": round(seconds, 6),
+                }
+            )
+
+    total_seconds = tracker_timings.total_seconds()
+    return {
+        "engine": "stub" if stub_engine else "poke_engine",
+        "battles": len(battles),
+        "lines": total_lines,
+        "seconds": round(total_seconds, 6),
+        "lines_per_second": round(total_lines / total_seconds, 1)
+        if total_seconds
+        else None,
+        "handlers": handler_timings.to_dict(),
+        "inference_checks": check_timings.to_dict(),
+        "per_battle": battles,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("log_dir", help="directory of battle log files")
+    parser.add_argument(
+        "--engine",
+        choices=["stub", "poke_engine"],
+        default="stub",
+        help="use poke-engine for the damage checks instead of a stub",
+    )
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    log_paths = sorted(
+        os.path.join(args.log_dir, f)
+        for f in os.listdir(args.log_dir)
+        if f.endswith(LOG_FILE_SUFFIXES)
+    )
+    report = benchmark(log_paths, stub_engine=args.engine == "stub")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,57 @@
 import asyncio
-import json
 import logging
 import traceback
-from copy import deepcopy
 
 import constants
 from config import FoulPlayConfig, init_logging
 
 from teams import load_team
+from fp.metrics import MetricsDump
+from fp.metrics import record_battle_result
+from fp.metrics import start_metrics_server
 from fp.run_battle import pokemon_battle
+from fp.run_battle import prewarm
+from fp.tracing import start_trace_sink
 from fp.websocket_client import PSWebsocketClient
 
-from data import all_move_json
-from data import pokedex
 from data.mods.apply_mods import apply_mods
+from data.pkmn_sets import SmogonSets
 
 
 logger = logging.getLogger(__name__)
 
 
-def check_dictionaries_are_unmodified(original_pokedex, original_move_json):
-    # The bot should not modify the data dictionaries
-    # This is a "just-in-case" check to make sure and will stop the bot if it mutates either of them
-    if original_move_json != all_move_json:
-        logger.critical(
-            "Move JSON changed!\nDumping modified version to `modified_moves.json`"
-        )
-        with open("modified_moves.json", "w") as f:
-            json.dump(all_move_json, f, indent=4)
-        exit(1)
-    else:
-        logger.debug("Move JSON unmodified!")
-
-    if original_pokedex != pokedex:
-        logger.critical(
-            "Pokedex JSON changed!\nDumping modified version to `modified_pokedex.json`"
-        )
-        with open("modified_pokedex.json", "w") as f:
-            json.dump(pokedex, f, indent=4)
-        exit(1)
-    else:
-        logger.debug("Pokedex JSON unmodified!")
-
-
 async def run_foul_play():
     FoulPlayConfig.configure()
     init_logging(FoulPlayConfig.log_level, FoulPlayConfig.log_to_file)
+    trace_listener = None
+    if FoulPlayConfig.trace_file:
+        trace_listener = start_trace_sink(FoulPlayConfig.trace_file)
+    metrics_server = None
+    if FoulPlayConfig.metrics_port is not None:
+        metrics_server = start_metrics_server(FoulPlayConfig.metrics_port)
+    metrics_dump = None
+    if FoulPlayConfig.metrics_file:
+        metrics_dump = MetricsDump(
+            FoulPlayConfig.metrics_file, FoulPlayConfig.metrics_interval_sec
+        ).start()
     apply_mods(FoulPlayConfig.pokemon_mode)
 
-    original_pokedex = deepcopy(pokedex)
-    original_move_json = deepcopy(all_move_json)
+    # download smogon stats in the background while logging in
+    # so that the first battle does not wait on the network
+    if (
+        "random" not in FoulPlayConfig.pokemon_mode
+        and "battlefactory" not in FoulPlayConfig.pokemon_mode
+    ):
+        SmogonSets.start_prefetch(
+            FoulPlayConfig.smogon_stats or FoulPlayConfig.pokemon_mode
+        )
 
     ps_websocket_client = await PSWebsocketClient.create(
-        FoulPlayConfig.username, FoulPlayConfig.password, FoulPlayConfig.websocket_uri
+        FoulPlayConfig.username,
+        FoulPlayConfig.password,
+        FoulPlayConfig.websocket_uri,
+        FoulPlayConfig.login_uri,
     )
     await ps_websocket_client.login()
 
@@ -63,7 +62,11 @@ async def run_foul_play():
     wins = 0
     losses = 0
     while True:
-        team_export, team_dict, file_name = load_team(FoulPlayConfig.team)
+        team_export, team_dict, file_name = load_team(
+            FoulPlayConfig.team, FoulPlayConfig.team_rotation
+        )
+        # runs while the challenge or search is sent and the server finds a battle
+        prewarm_task = asyncio.ensure_future(prewarm(FoulPlayConfig.pokemon_mode))
         if FoulPlayConfig.bot_mode == constants.CHALLENGE_USER:
             await ps_websocket_client.challenge_user(
                 FoulPlayConfig.user_to_challenge,
@@ -81,7 +84,11 @@ async def run_foul_play():
         else:
             raise ValueError("Invalid Bot Mode: {}".format(FoulPlayConfig.bot_mode))
 
+        await prewarm_task
         winner = await pokemon_battle(ps_websocket_client, FoulPlayConfig.pokemon_mode)
+        record_battle_result(
+            FoulPlayConfig.pokemon_mode, winner == FoulPlayConfig.username
+        )
         if winner == FoulPlayConfig.username:
             wins += 1
             logger.info("Won with team: {}".format(file_name))
@@ -90,12 +97,17 @@ async def run_foul_play():
             logger.info("Lost with team: {}".format(file_name))
 
         logger.info("W: {}\tL: {}".format(wins, losses))
-        check_dictionaries_are_unmodified(original_pokedex, original_move_json)
 
         battles_run += 1
         if battles_run >= FoulPlayConfig.run_count:
             break
     await ps_websocket_client.close()
+    if trace_listener is not None:
+        trace_listener.stop()
+    if metrics_dump is not None:
+        metrics_dump.stop()
+    if metrics_server is not None:
+        metrics_server.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,203 @@
+"""
+Re-runs the searches from recorded battles without a Pokemon Showdown server
+
+Reads the engine states each decision searched out of a battle log (written with LOG_TO_FILE=True),
+or from a file with one state string per line, searches them again and prints a JSON report
+with iterations/sec, how often repeated runs pick the same move,
+and how often they agree with the move that was played
+
+    python search_replay.py logs/battle-gen9ou-1.log --turn 5 --runs 5 --search-time-ms 500
+"""
+
+import argparse
+import json
+import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from poke_engine import State as PokeEngineState
+from poke_engine import iterative_deepening_expectiminimax
+from poke_engine import monte_carlo_tree_search
+
+from fp.battle_bots.mcts_parallel.main import select_move_from_mcts_results
+from fp.battle_log import LoggedSearch
+from fp.battle_log import read_logged_searches
+
+logger = logging.getLogger(__name__)
+
+MCTS = "mcts"
+EXPECTIMINIMAX = "expectiminimax"
+
+
+class ParsedState:
+    # `State.from_string` returns the engine's own state object,
+    # the search functions expect something they can call `_into_rust_obj` on
+    def __init__(self, state_string):
+        self.state = PokeEngineState.from_string(state_string)
+
+    def _into_rust_obj(self):
+        return self.state
+
+
+def search(state_string, algorithm, search_time_ms):
+    """
+    Runs one search in a worker process. Returns the MctsResult for mcts
+    or the safest move and the depth searched for expectiminimax
+    """
+    state = ParsedState(state_string)
+    if algorithm == MCTS:
+        return monte_carlo_tree_search(state, search_time_ms)
+
+    result = iterative_deepening_expectiminimax(state, search_time_ms)
+    return result.get_safest_move(), result.depth_searched
+
+
+def pick_move(results, algorithm):
+    """
+    Combines the searches of every state in a decision the way the bot does
+    The sample chance of each state is not logged so every state is weighted equally
+    """
+    if algorithm == MCTS:
+        return select_move_from_mcts_results(
+            [(result, 1 / len(results), index) for index, result in enumerate(results)]
+        )
+
+    return Counter(move for move, _ in results).most_common(1)[0][0]
+
+
+def policy_stability(choices):
+    """
+    The fraction of runs that picked the move picked most often
+    """
+    return round(Counter(choices).most_common(1)[0][1] / len(choices), 3)
+
+
+def agreement(choices, played_choice):
+    return round(sum(c == played_choice for c in choices) / len(choices), 3)
+
+
+def replay_search(
+    logged_search: LoggedSearch, algorithm, search_time_ms, runs, executor
+) -> dict:
+    choices = []
+    iterations_per_second = []
+    depths = []
+    for _ in range(runs):
+        futures = [
+            executor.submit(search, state, algorithm, search_time_ms)
+            for state in logged_search.states
+        ]
+        results = [fut.result() for fut in futures]
+        choices.append(pick_move(results, algorithm))
+        if algorithm == MCTS:
+            iterations_per_second.extend(
+                round(r.total_visits * 1000 / search_time_ms) for r in results
+            )
+        else:
+            depths.extend(depth for _, depth in results)
+
+    report = {
+        "turn": logged_search.turn,
+        "states": len(logged_search.states),
+        "played": logged_search.choice,
+        "choices": choices,
+        "policy_stability": policy_stability(choices),
+        "agreement": agreement(choices, logged_search.choice)
+        if logged_search.choice is not None
+        else None,
+    }
+    if iterations_per_second:
+        report["iterations_per_second"] = round(
+            sum(iterations_per_second) / len(iterations_per_second)
+        )
+    if depths:
+        report["depth_searched"] = depths
+    return report
+
+
+def read_state_file(path) -> list[LoggedSearch]:
+    # a plain file of state strings is searched as a single decision
+    with open(path, "r") as f:
+        states = [line.strip() for line in f if line.strip()]
+    return [LoggedSearch(None, states, None)]
+
+
+def replay_searches(
+    logged_searches, algorithm, search_time_ms, runs, parallelism
+) -> dict:
+    with ProcessPoolExecutor(max_workers=parallelism) as executor:
+        decisions = [
+            replay_search(s, algorithm, search_time_ms, runs, executor)
+            for s in logged_searches
+        ]
+
+    agreements = [d["agreement"] for d in decisions if d["agreement"] is not None]
+    return {
+        "algorithm": algorithm,
+        "search_time_ms": search_time_ms,
+        "runs": runs,
+        "parallelism": parallelism,
+        "decisions": len(decisions),
+        "policy_stability": round(
+            sum(d["policy_stability"] for d in decisions) / len(decisions), 3
+        )
+        if decisions
+        else None,
+        "agreement": round(sum(agreements) / len(agreements), 3)
+        if agreements
+        else None,
+        "per_decision": decisions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("path", help="a battle log file, or a file of state strings")
+    parser.add_argument(
+        "--states",
+        action="store_true",
+        help="`path` has one state string per line instead of being a battle log",
+    )
+    parser.add_argument(
+        "--turn", type=int, action="append", help="only replay these turns"
+    )
+    parser.add_argument("--algorithm", choices=[MCTS, EXPECTIMINIMAX], default=MCTS)
+    parser.add_argument("--search-time-ms", type=int, default=1000)
+    parser.add_argument(
+        "--runs", type=int, default=3, help="times to search each decision"
+    )
+    parser.add_argument("--parallelism", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.states:
+        logged_searches = read_state_file(args.path)
+    else:
+        logged_searches = read_logged_searches(args.path)
+    if args.turn:
+        logged_searches = [s for s in logged_searches if s.turn in args.turn]
+    if not logged_searches:
+        raise ValueError(
+            "No logged searches found in {}. Battle logs need DEBUG logging".format(
+                args.path
+            )
+        )
+
+    report = replay_searches(
+        logged_searches,
+        args.algorithm,
+        args.search_time_ms,
+        args.runs,
+        args.parallelism,
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
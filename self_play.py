@@ -0,0 +1,231 @@
+"""
+Plays bots against each other on this machine to compare two bot configurations
+
+Each game runs two `run.py` processes, one per side, against `local_server.py` with Pokemon Showdown's
+simulator playing the battles, so each side only sees its own information and tracks the battle
+the same way it does on a real server. Games run in parallel
+
+Prints a JSON report with side A's win rate and its 95% confidence interval,
+and the decisions/sec and decision latency of each side
+
+    python self_play.py gen9randombattle --games 100 --concurrency 4 \
+        --side-a BATTLE_BOT=mcts_parallel,SEARCH_TIME_MS=200 \
+        --side-b BATTLE_BOT=mcts_parallel,SEARCH_TIME_MS=100 \
+        --simulator "npx pokemon-showdown simulate-battle"
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import shlex
+import sys
+import time
+
+from websockets.asyncio.server import serve
+
+from local_server import LocalShowdownServer
+from local_server import latency_summary
+from local_server import start_login_server
+
+logger = logging.getLogger(__name__)
+
+SIDE_A = "a"
+SIDE_B = "b"
+
+
+def parse_side_config(side_config: str) -> dict:
+    # "BATTLE_BOT=mcts,SEARCH_TIME_MS=100" -> {"BATTLE_BOT": "mcts", "SEARCH_TIME_MS": "100"}
+    if not side_config:
+        return {}
+    return dict(item.split("=", 1) for item in side_config.split(","))
+
+
+def username(game_index, side):
+    return "selfplay{}{}".format(game_index, side)
+
+
+def wilson_interval(wins, games, z=1.96):
+    """
+    95% confidence interval of a win rate
+    """
+    if games == 0:
+        return None
+    win_rate = wins / games
+    denominator = 1 + z**2 / games
+    center = (win_rate + z**2 / (2 * games)) / denominator
+    margin = (
+        z
+        * math.sqrt(win_rate * (1 - win_rate) / games + z**2 / (4 * games**2))
+        / denominator
+    )
+    return round(center - margin, 4), round(center + margin, 4)
+
+
+def side_env(args, side_config, game_index, side, websocket_uri, login_uri):
+    env = dict(os.environ)
+    env.update(
+        {
+            "WEBSOCKET_URI": websocket_uri,
+            "PS_LOGIN_URI": login_uri,
+            "PS_USERNAME": username(game_index, side),
+            "PS_PASSWORD": "",
+            "POKEMON_MODE": args.pokemon_format,
+            "RUN_COUNT": "1",
+            "SAVE_REPLAY": "Never",
+            "LOG_LEVEL": "WARNING",
+            "LOG_TO_FILE": "False",
+        }
+    )
+    if side == SIDE_A:
+        env["BOT_MODE"] = "CHALLENGE_USER"
+        env["USER_TO_CHALLENGE"] = username(game_index, SIDE_B)
+    else:
+        env["BOT_MODE"] = "ACCEPT_CHALLENGE"
+    env.update(side_config)
+    return env
+
+
+async def play_game(args, game_index, side_configs, websocket_uri, login_uri):
+    processes = []
+    for side in [SIDE_B, SIDE_A]:
+        processes.append(
+            await asyncio.create_subprocess_exec(
+                sys.executable,
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py"),
+                env=side_env(
+                    args,
+                    side_configs[side],
+                    game_index,
+                    side,
+                    websocket_uri,
+                    login_uri,
+                ),
+                stdout=asyncio.subprocess.DEVNULL,
+            )
+        )
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(p.wait() for p in processes)), args.game_timeout
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Game {} did not finish in time".format(game_index))
+        for p in processes:
+            if p.returncode is None:
+                p.kill()
+                await p.wait()
+
+
+def report(server: LocalShowdownServer, games, seconds) -> dict:
+    wins = {SIDE_A: 0, SIDE_B: 0}
+    for result in server.results:
+        if result["winner"] is not None:
+            wins[result["winner"][-1]] += 1
+    decided = wins[SIDE_A] + wins[SIDE_B]
+
+    sides = {}
+    for side in [SIDE_A, SIDE_B]:
+        latencies = [
+            latency
+            for name, user_latencies in server.stats.latencies_ms_by_user.items()
+            if name.endswith(side)
+            for latency in user_latencies
+        ]
+        sides[side] = {
+            "wins": wins[side],
+            "decisions": len(latencies),
+            "decisions_per_second": round(len(latencies) / seconds, 3),
+            "latency_ms": latency_summary(latencies) if latencies else None,
+        }
+
+    return {
+        "games": games,
+        "finished": len(server.results),
+        "ties": len(server.results) - decided,
+        "seconds": round(seconds, 3),
+        "side_a_win_rate": round(wins[SIDE_A] / decided, 4) if decided else None,
+        "side_a_win_rate_95ci": wilson_interval(wins[SIDE_A], decided),
+        "side_a": sides[SIDE_A],
+        "side_b": sides[SIDE_B],
+    }
+
+
+async def self_play(args) -> dict:
+    side_configs = {
+        SIDE_A: parse_side_config(args.side_a),
+        SIDE_B: parse_side_config(args.side_b),
+    }
+    server = LocalShowdownServer([], simulator=shlex.split(args.simulator))
+    login_server = start_login_server(0)
+    login_uri = "http://127.0.0.1:{}/api/login".format(login_server.server_address[1])
+
+    start = time.perf_counter()
+    async with serve(server.handle, "127.0.0.1", 0) as websocket_server:
+        websocket_uri = "ws://127.0.0.1:{}/showdown/websocket".format(
+            websocket_server.sockets[0].getsockname()[1]
+        )
+        concurrency = asyncio.Semaphore(args.concurrency)
+
+        async def limited_game(game_index):
+            async with concurrency:
+                await play_game(
+                    args, game_index, side_configs, websocket_uri, login_uri
+                )
+                players = {username(game_index, SIDE_A), username(game_index, SIDE_B)}
+                result = [r for r in server.results if set(r["players"]) == players]
+                logger.info(
+                    "Finished game {}: {}".format(
+                        game_index, result[0]["winner"] if result else "unfinished"
+                    )
+                )
+
+        await asyncio.gather(*(limited_game(i) for i in range(args.games)))
+
+    login_server.shutdown()
+    return report(server, args.games, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("pokemon_format", help="e.g. gen9randombattle")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=os.cpu_count() // 2 or 1,
+        help="games to play at once, each uses two bot processes",
+    )
+    parser.add_argument(
+        "--side-a",
+        default="",
+        help="environment variables for side A, e.g. BATTLE_BOT=mcts,SEARCH_TIME_MS=100",
+    )
+    parser.add_argument("--side-b", default="", help="environment variables for side B")
+    parser.add_argument(
+        "--simulator",
+        default="npx pokemon-showdown simulate-battle",
+        help="command that runs Pokemon Showdown's simulator",
+    )
+    parser.add_argument(
+        "--game-timeout",
+        type=float,
+        default=1800,
+        help="seconds before a game is stopped",
+    )
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-8s %(message)s")
+    result = json.dumps(asyncio.run(self_play(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result)
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
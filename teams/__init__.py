@@ -1 +1,2 @@
 from .load_team import load_team as load_team
+from .team_registry import TeamRegistry as TeamRegistry
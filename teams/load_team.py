@@ -1,33 +1,10 @@
-import random
-import os
-from .team_converter import export_to_packed, export_to_dict
+from .team_registry import RANDOM
+from .team_registry import get_team_registry
 
-TEAM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "teams")
 
-
-def load_team(name):
+def load_team(name, rotation=RANDOM):
     if name is None:
         return "null", "", ""
 
-    path = os.path.join(TEAM_DIR, "{}".format(name))
-    if os.path.isdir(path):
-        team_file_names = list()
-        for f in os.listdir(path):
-            full_path = os.path.join(path, f)
-            if os.path.isfile(full_path) and not f.startswith("."):
-                team_file_names.append(full_path)
-        file_path = random.choice(team_file_names)
-
-    elif os.path.isfile(path):
-        file_path = path
-    else:
-        raise ValueError("Path must be file or dir: {}".format(name))
-
-    with open(file_path, "r") as f:
-        team_export = f.read()
-
-    return (
-        export_to_packed(team_export),
-        export_to_dict(team_export),
-        os.path.basename(file_path),
-    )
+    team = get_team_registry(name, rotation).next_team()
+    return team.packed, team.team_dict, team.file_name
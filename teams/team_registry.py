@@ -0,0 +1,190 @@
+"""
+Keeps every team of a `TEAM_NAME` converted, validated and ready to send
+
+The directory is scanned once, each following pick only re-reads the files
+that were added or changed since, so editing or dropping a team into the
+directory takes effect on the next battle without restarting the bot
+"""
+
+import bisect
+import json
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import constants
+from data import all_move_json
+from data import pokedex
+from data.read_only import freeze
+from fp.helpers import normalize_name
+
+from .team_converter import export_to_dict
+from .team_converter import export_to_packed
+
+logger = logging.getLogger(__name__)
+
+TEAM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "teams")
+
+RANDOM = "random"
+ROUND_ROBIN = "round-robin"
+WEIGHTED = "weighted"
+ROTATIONS = (RANDOM, ROUND_ROBIN, WEIGHTED)
+
+# a file in the team directory mapping team file names to their weight
+# for the `weighted` rotation, teams that are not in it have a weight of 1
+WEIGHTS_FILE = ".weights.json"
+
+# below this many files converting them in worker processes is slower than doing it here
+PARALLEL_THRESHOLD = 64
+
+
+class Team(NamedTuple):
+    file_name: str
+    packed: str
+    team_dict: tuple
+
+
+def convert_team_file(path):
+    with open(path, "r") as f:
+        team_export = f.read()
+    return export_to_packed(team_export), export_to_dict(team_export)
+
+
+def validate_team(team_dict) -> list:
+    """
+    Returns what is wrong with the team, an empty list if nothing is
+    """
+    problems = []
+    if not 1 <= len(team_dict) <= 6:
+        problems.append("has {} pokemon".format(len(team_dict)))
+
+    for pkmn in team_dict:
+        species = normalize_name(pkmn["species"])
+        if species not in pokedex:
+            problems.append("unknown pokemon: {}".format(pkmn["species"]))
+        for move in pkmn["moves"]:
+            if move.startswith(constants.HIDDEN_POWER):
+                move = constants.HIDDEN_POWER
+            if move not in all_move_json:
+                problems.append("{} has unknown move: {}".format(species, move))
+
+    return problems
+
+
+class TeamRegistry:
+    def __init__(self, name, rotation=RANDOM):
+        if rotation not in ROTATIONS:
+            raise ValueError(
+                "Team rotation must be one of {}: {}".format(ROTATIONS, rotation)
+            )
+        self.name = name
+        self.rotation = rotation
+        self.path = os.path.join(TEAM_DIR, "{}".format(name))
+        self.teams = []
+        self.weights = {}
+        self._files = {}
+        self._last_file_name = None
+
+    def _team_files(self) -> dict:
+        """
+        {path: (mtime, size)} of every team file, without reading them
+        """
+        if os.path.isfile(self.path):
+            stat = os.stat(self.path)
+            return {self.path: (stat.st_mtime_ns, stat.st_size)}
+
+        if not os.path.isdir(self.path):
+            raise ValueError("Path must be file or dir: {}".format(self.name))
+
+        team_files = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    team_files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return team_files
+
+    def _read_weights(self):
+        weights_path = os.path.join(self.path, WEIGHTS_FILE)
+        if not os.path.isfile(weights_path):
+            return {}
+        with open(weights_path, "r") as f:
+            return json.load(f)
+
+    def refresh(self):
+        """
+        Converts and validates the team files that are new or changed since the last refresh
+        """
+        team_files = self._team_files()
+        changed = [
+            path
+            for path, version in team_files.items()
+            if self._files.get(path, (None,))[0] != version
+        ]
+        if not changed and team_files.keys() == self._files.keys():
+            return
+
+        if len(changed) >= PARALLEL_THRESHOLD:
+            with ProcessPoolExecutor() as executor:
+                converted = list(executor.map(convert_team_file, changed, chunksize=16))
+        else:
+            converted = [convert_team_file(path) for path in changed]
+
+        files = {path: team for path, team in self._files.items() if path in team_files}
+        for path, (packed, team_dict) in zip(changed, converted):
+            file_name = os.path.basename(path)
+            problems = validate_team(team_dict)
+            if problems:
+                logger.warning(
+                    "Skipping team {}: {}".format(file_name, ", ".join(problems))
+                )
+                team = None
+            else:
+                team = Team(file_name, packed, freeze(team_dict))
+            files[path] = (team_files[path], team)
+
+        self._files = files
+        self.teams = sorted(
+            (team for _, team in files.values() if team is not None),
+            key=lambda t: t.file_name,
+        )
+        logger.info(
+            "Loaded {} teams from {}, {} changed".format(
+                len(self.teams), self.name, len(changed)
+            )
+        )
+
+    def next_team(self) -> Team:
+        self.refresh()
+        if not self.teams:
+            raise ValueError("No valid teams in {}".format(self.name))
+
+        if self.rotation == ROUND_ROBIN:
+            # the team after the last one used, so adding or removing
+            # files does not restart the rotation
+            file_names = [t.file_name for t in self.teams]
+            index = bisect.bisect_right(file_names, self._last_file_name or "")
+            team = self.teams[index % len(self.teams)]
+        elif self.rotation == WEIGHTED:
+            self.weights = self._read_weights()
+            team = random.choices(
+                self.teams,
+                weights=[self.weights.get(t.file_name, 1) for t in self.teams],
+            )[0]
+        else:
+            team = random.choice(self.teams)
+
+        self._last_file_name = team.file_name
+        return team
+
+
+_registries = {}
+
+
+def get_team_registry(name, rotation=RANDOM) -> TeamRegistry:
+    key = (name, rotation)
+    if key not in _registries:
+        _registries[key] = TeamRegistry(name, rotation)
+    return _registries[key]
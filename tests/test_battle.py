@@ -1,10 +1,13 @@
 import unittest
 
+import constants
+
 from fp.battle import LastUsedMove
 from fp.battle import Battle
 from fp.battle import Battler
 from fp.battle import Pokemon
 from fp.battle import Move
+from fp.battle import trial_mutations
 
 
 # so we can instantiate a Battle object for testing
@@ -163,3 +166,51 @@ class TestBattlerActiveLockedIntoMove(unittest.TestCase):
         self.assertFalse(self.battler.active.get_move("thunderbolt").disabled)
         self.assertFalse(self.battler.active.get_move("agility").disabled)
         self.assertFalse(self.battler.active.get_move("doubleteam").disabled)
+
+
+class TestTrialMutations(unittest.TestCase):
+    def setUp(self):
+        self.battle = Battle(None)
+        self.battle.user.active = Pokemon("pikachu", 100)
+        self.battle.opponent.active = Pokemon("charmander", 100)
+        self.battle.opponent.reserve = [Pokemon("squirtle", 100)]
+
+    def test_set_spread_is_undone(self):
+        pkmn = self.battle.opponent.active
+        pkmn.hp = 150
+        stats = pkmn.stats
+        max_hp = pkmn.max_hp
+
+        with trial_mutations(pkmn):
+            pkmn.set_spread("jolly", "252,0,0,0,4,252")
+            self.assertNotEqual(max_hp, pkmn.max_hp)
+
+        self.assertIs(stats, pkmn.stats)
+        self.assertEqual((max_hp, 150, "serious"), (pkmn.max_hp, pkmn.hp, pkmn.nature))
+
+    def test_battle_undoes_changes_to_sides_and_reserve_pokemon(self):
+        with self.battle.trial_mutations():
+            self.battle.weather = "sunnyday"
+            self.battle.opponent.active = self.battle.opponent.reserve[0]
+            self.battle.opponent.reserve[0].item = "leftovers"
+            self.battle.user.last_used_move = LastUsedMove("pikachu", "tackle", 1)
+
+        self.assertIsNone(self.battle.weather)
+        self.assertEqual("charmander", self.battle.opponent.active.name)
+        self.assertEqual(constants.UNKNOWN_ITEM, self.battle.opponent.reserve[0].item)
+        self.assertEqual(LastUsedMove("", "", 0), self.battle.user.last_used_move)
+
+    def test_changes_are_undone_when_an_exception_is_raised(self):
+        with self.assertRaises(ValueError):
+            with self.battle.trial_mutations():
+                self.battle.opponent.active.ability = "blaze"
+                raise ValueError()
+
+        self.assertIsNone(self.battle.opponent.active.ability)
+
+    def test_new_attributes_are_removed(self):
+        pkmn = self.battle.user.active
+        with trial_mutations(pkmn):
+            pkmn.trial_only = True
+
+        self.assertFalse(hasattr(pkmn, "trial_only"))
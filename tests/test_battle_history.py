@@ -0,0 +1,114 @@
+import json
+import unittest
+from copy import deepcopy
+from unittest import mock
+
+import constants
+from data.pkmn_sets import SmogonSets
+from data.pkmn_sets import TeamDatasets
+from fp.battle import Battle
+from fp.battle import LastUsedMove
+from fp.battle import Pokemon
+from fp.battle_history import BattleHistory
+from fp.battle_modifier import update_battle
+
+
+# so we can instantiate a Battle object for testing
+Battle.__abstractmethods__ = set()
+
+
+class TestBattleHistory(unittest.TestCase):
+    def setUp(self):
+        self.battle = Battle("battle-gen9ou-1")
+        self.battle.started = True
+        self.battle.turn = 1
+        self.battle.user.name = "p1"
+        self.battle.user.active = Pokemon("pikachu", 100)
+        self.battle.opponent.name = "p2"
+        self.battle.opponent.active = Pokemon("charmander", 100)
+        self.battle.history = BattleHistory(self.battle, snapshot_interval=2)
+
+    def play_turn(self, opponent_hp):
+        next_turn = self.battle.turn + 1
+        self.battle.user.last_selected_move = LastUsedMove(
+            "pikachu", "tackle", self.battle.turn
+        )
+        update_battle(
+            self.battle,
+            "|\n|-damage|p2a: Charmander|{}/100\n|turn|{}".format(
+                opponent_hp, next_turn
+            ),
+        )
+        update_battle(
+            self.battle, "|request|{}".format(json.dumps({"rqid": next_turn}))
+        )
+
+    def test_every_message_is_recorded(self):
+        self.play_turn(90)
+        self.assertEqual(2, len(self.battle.history.entries))
+        self.assertEqual([1, 2], self.battle.history.turns())
+
+    def test_snapshots_are_taken_every_interval(self):
+        for hp in [90, 80, 70, 60]:
+            self.play_turn(hp)
+
+        self.assertEqual([1, 3, 5], [s.turn for s in self.battle.history.snapshots])
+
+    def test_state_at_rebuilds_an_earlier_turn(self):
+        for hp in [90, 80, 70, 60]:
+            self.play_turn(hp)
+
+        for turn, hp in [(1, 100), (2, 90), (3, 80), (4, 70), (5, 60)]:
+            battle = self.battle.history.state_at(turn)
+            self.assertEqual(turn, battle.turn)
+            self.assertEqual(
+                round(battle.opponent.active.max_hp * hp / 100),
+                round(battle.opponent.active.hp),
+            )
+
+    def test_state_at_has_the_move_selected_before_the_turn(self):
+        self.play_turn(90)
+        self.play_turn(80)
+
+        battle = self.battle.history.state_at(3)
+        self.assertEqual(
+            LastUsedMove("pikachu", "tackle", 2), battle.user.last_selected_move
+        )
+
+    def test_rebuilt_battle_is_not_the_live_battle(self):
+        self.play_turn(90)
+        battle = self.battle.history.state_at(2)
+        battle.opponent.active.hp = 0
+
+        self.assertNotEqual(0, self.battle.opponent.active.hp)
+        self.assertIsNone(battle.history)
+
+    def test_unknown_turn_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.battle.history.state_at(10)
+
+    def test_copies_of_the_battle_do_not_copy_the_history(self):
+        self.assertIsNone(deepcopy(self.battle).history)
+        self.assertIsNone(self.battle.snapshot().history)
+        self.assertIsNotNone(self.battle.history)
+
+    def test_state_at_leaves_the_datasets_unchanged(self):
+        self.battle.battle_type = constants.STANDARD_BATTLE
+        self.battle.generation = "gen4"
+        self.battle.history = BattleHistory(self.battle)
+        with (
+            mock.patch.object(SmogonSets, "add_new_pokemon") as smogon_add,
+            mock.patch.object(TeamDatasets, "add_new_pokemon") as team_add,
+        ):
+            update_battle(
+                self.battle,
+                "|\n|switch|p2a: Gengar|Gengar, L100|100/100\n|turn|2",
+            )
+            update_battle(self.battle, "|request|{}".format(json.dumps({"rqid": 2})))
+            self.assertEqual(1, smogon_add.call_count)
+            self.assertEqual(1, team_add.call_count)
+
+            battle = self.battle.history.state_at(2)
+            self.assertEqual("gengar", battle.opponent.active.name)
+            self.assertEqual(1, smogon_add.call_count)
+            self.assertEqual(1, team_add.call_count)
@@ -0,0 +1,221 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+import constants
+from data.pkmn_sets import RandomBattleTeamDatasets
+from fp.battle import Battle
+from fp.battle_log import RECEIVED
+from fp.battle_log import SENT
+from fp.battle_log import LoggedSearch
+from fp.battle_log import get_battle_tag
+from fp.battle_log import read_battle_log
+from fp.battle_log import read_logged_searches
+from fp.battle_log import replay_battle
+
+
+# so we can instantiate a Battle object for testing
+Battle.__abstractmethods__ = set()
+
+BATTLE_TAG = "battle-gen9randombattle-1"
+
+
+def _request(rqid, pikachu_hp="211/211"):
+    return json.dumps(
+        {
+            "active": [
+                {
+                    "moves": [
+                        {
+                            "move": "Thunderbolt",
+                            "id": "thunderbolt",
+                            "pp": 24,
+                            "maxpp": 24,
+                            "target": "normal",
+                            "disabled": False,
+                        },
+                        {
+                            "move": "Volt Switch",
+                            "id": "voltswitch",
+                            "pp": 32,
+                            "maxpp": 32,
+                            "target": "normal",
+                            "disabled": False,
+                        },
+                    ]
+                }
+            ],
+            "side": {
+                "name": "bot",
+                "id": "p1",
+                "pokemon": [
+                    {
+                        "ident": "p1: Pikachu",
+                        "details": "Pikachu, L92, M",
+                        "condition": pikachu_hp,
+                        "active": True,
+                        "stats": {
+                            "atk": 180,
+                            "def": 130,
+                            "spa": 180,
+                            "spd": 150,
+                            "spe": 250,
+                        },
+                        "moves": ["thunderbolt", "voltswitch"],
+                        "baseAbility": "static",
+                        "item": "lightball",
+                        "pokeball": "pokeball",
+                        "ability": "static",
+                    },
+                    {
+                        "ident": "p1: Snorlax",
+                        "details": "Snorlax, L84, M",
+                        "condition": "400/400",
+                        "active": False,
+                        "stats": {
+                            "atk": 250,
+                            "def": 160,
+                            "spa": 160,
+                            "spd": 250,
+                            "spe": 80,
+                        },
+                        "moves": ["bodyslam", "curse"],
+                        "baseAbility": "thickfat",
+                        "item": "leftovers",
+                        "pokeball": "pokeball",
+                        "ability": "thickfat",
+                    },
+                ],
+            },
+            "rqid": rqid,
+        }
+    )
+
+
+LOG = "\n".join(
+    [
+        "INFO     Found a battle",
+        "DEBUG    Received message from websocket: >{}".format(BATTLE_TAG),
+        "|init|battle",
+        "|player|p1|bot|1|",
+        "|player|p2|opponent|2|",
+        "DEBUG    Received message from websocket: >{}".format(BATTLE_TAG),
+        "|request|{}".format(_request(1)),
+        "DEBUG    Received message from websocket: >{}".format(BATTLE_TAG),
+        "|start",
+        "|switch|p1a: Pikachu|Pikachu, L92, M|211/211",
+        "|switch|p2a: Weedle|Weedle, L100, M|100/100",
+        "|turn|1",
+        "DEBUG    Sending message to websocket: {}|/choose move thunderbolt|1".format(
+            BATTLE_TAG
+        ),
+        "DEBUG    Received message from websocket: >{}".format(BATTLE_TAG),
+        "|request|{}".format(_request(2)),
+        "DEBUG    Received message from websocket: >{}".format(BATTLE_TAG),
+        "|",
+        "|move|p1a: Pikachu|Thunderbolt|p2a: Weedle",
+        "|-damage|p2a: Weedle|40/100",
+        "|move|p2a: Weedle|Poison Sting|p1a: Pikachu",
+        "|-damage|p1a: Pikachu|200/211",
+        "|upkeep",
+        "|turn|2",
+        "DEBUG    Received message from websocket: >{}".format(BATTLE_TAG),
+        "|request|{}".format(_request(3, pikachu_hp="200/211")),
+        "INFO     something else",
+        "DEBUG    Sending message to websocket: {}|/switch 2|2".format(BATTLE_TAG),
+    ]
+)
+
+
+class TestReadBattleLog(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".log")
+        with os.fdopen(fd, "w") as f:
+            f.write(LOG)
+        self.records = read_battle_log(self.path)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_reads_multiline_messages(self):
+        self.assertEqual(RECEIVED, self.records[0].direction)
+        self.assertEqual(
+            ">{}\n|init|battle\n|player|p1|bot|1|\n|player|p2|opponent|2|".format(
+                BATTLE_TAG
+            ),
+            self.records[0].message,
+        )
+
+    def test_other_log_records_are_skipped(self):
+        self.assertEqual(8, len(self.records))
+        self.assertEqual("{}|/switch 2|2".format(BATTLE_TAG), self.records[-1].message)
+        self.assertEqual(SENT, self.records[-1].direction)
+
+    def test_get_battle_tag(self):
+        self.assertEqual(BATTLE_TAG, get_battle_tag(self.records))
+
+    def test_replay_applies_messages_and_yields_choices(self):
+        RandomBattleTeamDatasets.initialize("gen9")
+        battle = Battle(BATTLE_TAG)
+        choices = []
+        for choice in replay_battle(battle, self.records):
+            choices.append(choice)
+            if len(choices) == 1:
+                self.assertEqual(1, battle.turn)
+
+        self.assertEqual(["/choose move thunderbolt", "/switch 2"], choices)
+        self.assertEqual("p1", battle.user.name)
+        self.assertEqual(constants.RANDOM_BATTLE, battle.battle_type)
+        self.assertEqual("weedle", battle.opponent.active.name)
+        self.assertEqual(2, battle.turn)
+        self.assertEqual("switch snorlax", battle.user.last_selected_move.move)
+
+
+SEARCH_LOG = "\n".join(
+    [
+        "DEBUG    Received message from websocket: >{}".format(BATTLE_TAG),
+        "|turn|1",
+        "DEBUG    Calling with 0 state: state-a",
+        "DEBUG    Calling with 1 state: state-b",
+        "DEBUG    Calling calculate damage with state: not-a-search",
+        "INFO     Choice: thunderbolt",
+        "DEBUG    Received message from websocket: >{}".format(BATTLE_TAG),
+        "|turn|2",
+        "DEBUG    Calling with state: state-c",
+        "INFO     Choice: switch snorlax, 0.61",
+        "INFO     Choice: no states were logged for this one",
+    ]
+)
+
+
+class TestReadLoggedSearches(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".log")
+        with os.fdopen(fd, "w") as f:
+            f.write(SEARCH_LOG)
+        self.searches = read_logged_searches(self.path)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_states_are_grouped_by_decision(self):
+        self.assertEqual(
+            [
+                LoggedSearch(1, ["state-a", "state-b"], "thunderbolt"),
+                LoggedSearch(2, ["state-c"], "switch snorlax"),
+            ],
+            self.searches,
+        )
+
+
+class TestCompressedBattleLog(unittest.TestCase):
+    def test_gzipped_logs_are_read(self):
+        fd, path = tempfile.mkstemp(suffix=".log.gz")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        with gzip.open(path, "wt") as f:
+            f.write(LOG)
+
+        self.assertEqual(8, len(read_battle_log(path)))
@@ -444,6 +444,32 @@ class TestSwitchOrDrag(unittest.TestCase):
 
         self.assertEqual("zoroark", self.battle.user.active.name)
 
+    def test_switching_into_zoroark_does_not_change_the_message(self):
+        self.battle.request_json = {
+            "active": [],
+            "side": {
+                "pokemon": [
+                    {
+                        "ident": "p1: Zoroark",
+                        "details": "Zoroark, L100, M",
+                        "active": True,
+                    },
+                    {
+                        "ident": "p1: Weedle",
+                        "details": "Weedle, L100, M",
+                        "active": False,
+                    },
+                ]
+            },
+        }
+        split_msg = ["", "drag", "p1a: Weedle", "Weedle, L100, M", "100/100"]
+        drag(self.battle, split_msg)
+
+        self.assertEqual("zoroark", self.battle.user.active.name)
+        self.assertEqual(
+            ["", "drag", "p1a: Weedle", "Weedle, L100, M", "100/100"], split_msg
+        )
+
     def test_being_dragged_into_not_zoroark_properly_sets_not_zoroark(self):
         self.battle.request_json = {
             "active": [],
@@ -0,0 +1,118 @@
+import gzip
+import logging
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+import unittest
+
+from config import BackpressureQueueHandler
+from config import CustomFormatter
+from config import CustomRotatingFileHandler
+from config import LogWriter
+from config import forward_to_parent
+from config import relay_forked_records
+from fp import metrics
+
+
+class TestBackpressureQueueHandler(unittest.TestCase):
+    def setUp(self):
+        self.log_queue = queue.Queue(maxsize=1)
+        self.handler = BackpressureQueueHandler(self.log_queue)
+        self.handler.handle(self.record(logging.DEBUG, "first"))
+
+    @staticmethod
+    def record(level, msg):
+        return logging.makeLogRecord({"levelno": level, "msg": msg})
+
+    def test_debug_records_are_dropped_when_the_queue_is_full(self):
+        dropped = metrics.LOG_RECORDS_DROPPED.to_dict().get("", 0)
+        self.handler.handle(self.record(logging.DEBUG, "second"))
+
+        self.assertEqual("first", self.log_queue.get_nowait().msg)
+        self.assertEqual(dropped + 1, metrics.LOG_RECORDS_DROPPED.to_dict()[""])
+
+    def test_info_records_wait_for_room(self):
+        self.log_queue.get_nowait()
+        self.handler.handle(self.record(logging.INFO, "second"))
+        self.assertEqual("second", self.log_queue.get_nowait().msg)
+
+
+class TestLogWriter(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+
+        self.file_handler = CustomRotatingFileHandler("init.log", compress=True)
+        self.file_handler.setFormatter(CustomFormatter())
+        self.addCleanup(self.file_handler.close)
+
+        self.log_queue = queue.Queue()
+        self.file_handler.log_queue = self.log_queue
+        self.queue_handler = BackpressureQueueHandler(self.log_queue)
+        self.writer = LogWriter(
+            self.log_queue, self.file_handler, file_handler=self.file_handler
+        )
+        self.writer.start()
+
+    def log(self, msg):
+        self.queue_handler.handle(
+            logging.makeLogRecord(
+                {"levelno": logging.INFO, "levelname": "INFO", "msg": msg}
+            )
+        )
+
+    def test_records_go_to_the_battle_file_they_were_logged_for(self):
+        self.log("before")
+        self.file_handler.do_rollover("battle-gen9ou-1_opponent.log")
+        self.log("first battle")
+        self.file_handler.do_rollover("battle-gen9ou-2_opponent.log")
+        self.log("second battle")
+        self.writer.stop()
+
+        with open("logs/init.log") as f:
+            self.assertEqual("INFO     before\n", f.read())
+        with gzip.open("logs/battle-gen9ou-1_opponent.log.gz", "rt") as f:
+            self.assertEqual("INFO     first battle\n", f.read())
+        self.assertFalse(os.path.exists("logs/battle-gen9ou-1_opponent.log"))
+        with open("logs/battle-gen9ou-2_opponent.log") as f:
+            self.assertEqual("INFO     second battle\n", f.read())
+
+    def test_forked_process_records_follow_the_parents_rollovers(self):
+        forked_queue = multiprocessing.get_context("fork").Queue()
+        threading.Thread(
+            target=relay_forked_records,
+            args=(forked_queue, self.queue_handler),
+            daemon=True,
+        ).start()
+        rolled_over, signal_rolled_over = os.pipe()
+
+        # e.g. search workers started before the first battle
+        pid = os.fork()
+        if pid == 0:
+            forward_to_parent(self.queue_handler, self.writer, forked_queue)
+            os.read(rolled_over, 1)
+            self.log("from the forked process")
+            forked_queue.close()
+            forked_queue.join_thread()
+            os._exit(0)
+
+        self.file_handler.do_rollover("battle-gen9ou-1_opponent.log")
+        os.write(signal_rolled_over, b"1")
+        os.waitpid(pid, 0)
+
+        battle_log = "logs/battle-gen9ou-1_opponent.log"
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not os.path.getsize(battle_log):
+            time.sleep(0.01)
+        self.writer.stop()
+
+        with open(battle_log) as f:
+            self.assertEqual("INFO     from the forked process\n", f.read())
+        with open("logs/init.log") as f:
+            self.assertEqual("", f.read())
@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from fleet import Fleet
+from fp.cpu_budget import CpuBudget
+
+
+def play_one_battle(env, slot, events, cpu_budget):
+    # crashes the first time it is started if CRASH_ONCE is set
+    crash_marker = env.get("CRASH_ONCE")
+    if crash_marker and not os.path.exists(crash_marker):
+        open(crash_marker, "w").close()
+        sys.exit(1)
+
+    with cpu_budget.hold(slot, 1):
+        events.put({"bot": env["PS_USERNAME"], "decision_ms": 100})
+    events.put({"bot": env["PS_USERNAME"], "format": "gen9ou", "won": slot == 0})
+
+
+class TestCpuBudget(unittest.TestCase):
+    def test_cores_of_a_dead_process_are_reclaimed(self):
+        budget = CpuBudget(2, 2)
+        search = budget.hold(0, 2)
+        search.__enter__()
+        self.assertEqual(2, budget.held(0))
+
+        budget.reclaim(0)
+
+        self.assertEqual(0, budget.held(0))
+        with budget.hold(1, 2):
+            self.assertEqual(2, budget.held(1))
+        self.assertEqual(0, budget.held(1))
+
+    def test_search_does_not_hold_more_than_the_budget(self):
+        budget = CpuBudget(2, 1)
+        with budget.hold(0, 8):
+            self.assertEqual(2, budget.held(0))
+
+
+class TestFleet(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.bot_envs = [
+            {"PS_USERNAME": "bot1", "POKEMON_MODE": "gen9ou", "RUN_COUNT": "1"},
+            {"PS_USERNAME": "bot2", "POKEMON_MODE": "gen9ou", "RUN_COUNT": "1"},
+        ]
+
+    def test_results_of_every_bot_are_reported(self):
+        fleet = Fleet(self.bot_envs, cpus=1, target=play_one_battle)
+        fleet.run()
+
+        report = fleet.report(1)
+        self.assertEqual(2, report["battles"])
+        self.assertEqual(0.5, report["win_rate"])
+        self.assertEqual(
+            {"wins": 1, "losses": 1, "win_rate": 0.5}, report["formats"]["gen9ou"]
+        )
+        self.assertEqual(2, report["decisions"])
+        self.assertEqual(1, report["bots"]["bot1"]["wins"])
+        self.assertEqual(1, report["bots"]["bot2"]["losses"])
+
+    def test_crashed_bot_is_restarted(self):
+        self.bot_envs[0]["CRASH_ONCE"] = os.path.join(self.tmp_dir.name, "crashed")
+        fleet = Fleet(
+            self.bot_envs, cpus=1, first_backoff_seconds=0, target=play_one_battle
+        )
+        fleet.run()
+
+        report = fleet.report(1)
+        self.assertEqual(1, report["bots"]["bot1"]["restarts"])
+        self.assertEqual(1, report["bots"]["bot1"]["wins"])
+
+    def test_bot_is_given_up_on_after_max_restarts(self):
+        self.bot_envs[0]["CRASH_ONCE"] = os.path.join(self.tmp_dir.name, "crashed")
+        fleet = Fleet(self.bot_envs, cpus=1, max_restarts=0, target=play_one_battle)
+        fleet.run()
+
+        report = fleet.report(1)
+        self.assertEqual(0, report["bots"]["bot1"]["wins"])
+        self.assertEqual(1, report["bots"]["bot2"]["losses"])
@@ -0,0 +1,56 @@
+import unittest
+
+import constants
+from data import all_move_json
+from data import base_all_move_json
+from data import pokedex
+from data.generation_data import current_generation_data
+from data.generation_data import use_generation_data
+from data.mods.apply_mods import get_generation_data
+from fp.battle import Move
+from fp.helpers import type_effectiveness_modifier
+
+
+class TestGetGenerationData(unittest.TestCase):
+    def test_gen3_mods_do_not_change_base_data(self):
+        gen3 = get_generation_data("gen3ou")
+        self.assertEqual(constants.SPECIAL, gen3.all_move_json["crunch"]["category"])
+        self.assertEqual(constants.PHYSICAL, base_all_move_json["crunch"]["category"])
+
+    def test_generation_data_is_built_once_per_generation(self):
+        self.assertIs(get_generation_data("gen4ou"), get_generation_data("gen4uu"))
+
+    def test_unknown_mode_uses_current_generation(self):
+        gen9 = get_generation_data("gen9ou")
+        self.assertIs(gen9, get_generation_data(""))
+        self.assertIs(base_all_move_json["crunch"], gen9.all_move_json["crunch"])
+
+    def test_unmodified_entries_are_shared_with_base_data(self):
+        gen8 = get_generation_data("gen8ou")
+        self.assertIs(base_all_move_json["tackle"], gen8.all_move_json["tackle"])
+
+    def test_gen1_type_chart(self):
+        gen1 = get_generation_data("gen1ou")
+        with use_generation_data(gen1):
+            self.assertEqual(0, type_effectiveness_modifier("ghost", ["psychic"]))
+            self.assertEqual(2, type_effectiveness_modifier("bug", ["poison"]))
+        self.assertEqual(2, type_effectiveness_modifier("ghost", ["psychic"]))
+
+    def test_steel_resists_dark_before_gen6(self):
+        with use_generation_data(get_generation_data("gen5ou")):
+            self.assertEqual(0.5, type_effectiveness_modifier("dark", ["steel"]))
+        self.assertEqual(1, type_effectiveness_modifier("dark", ["steel"]))
+
+
+class TestUseGenerationData(unittest.TestCase):
+    def test_views_follow_the_current_generation(self):
+        with use_generation_data(get_generation_data("gen3ou")):
+            self.assertEqual("gen3", current_generation_data().generation)
+            self.assertEqual(constants.SPECIAL, all_move_json["crunch"]["category"])
+            self.assertIn("pikachu", pokedex)
+        self.assertEqual(constants.PHYSICAL, all_move_json["crunch"]["category"])
+
+    def test_hidden_power_name_uses_current_generation(self):
+        with use_generation_data(get_generation_data("gen4ou")):
+            self.assertEqual("hiddenpowerfire70", Move("hiddenpowerfire").name)
+        self.assertEqual("hiddenpowerfire60", Move("hiddenpowerfire").name)
@@ -1,6 +1,11 @@
+import pickle
 import unittest
+from copy import deepcopy
 
+from data import all_move_json
+from data import pokedex
 from data.pkmn_sets import spreads_are_alike
+from data.read_only import ReadOnlyDict
 from fp.helpers import get_pokemon_info_from_condition
 from fp.helpers import normalize_name
 
@@ -31,6 +36,30 @@ class TestSpreadsAreAlike(unittest.TestCase):
         self.assertTrue(spreads_are_alike(s1, s2))
 
 
+class TestReadOnlyData(unittest.TestCase):
+    def test_modifying_pokedex_raises(self):
+        with self.assertRaises(TypeError):
+            pokedex["pikachu"]["weightkg"] = 1
+
+    def test_modifying_nested_list_raises(self):
+        with self.assertRaises(TypeError):
+            pokedex["pikachu"]["types"].append("fire")
+
+    def test_modifying_move_json_raises(self):
+        with self.assertRaises(TypeError):
+            all_move_json["tackle"].update({"basePower": 1000})
+
+    def test_deepcopy_is_mutable_and_does_not_change_original(self):
+        types = deepcopy(pokedex["pikachu"]["types"])
+        types.append("fire")
+        self.assertEqual(["electric"], pokedex["pikachu"]["types"])
+
+    def test_pickling_stays_read_only(self):
+        pkmn = pickle.loads(pickle.dumps(pokedex["pikachu"]))
+        self.assertIsInstance(pkmn, ReadOnlyDict)
+        self.assertEqual(pokedex["pikachu"], pkmn)
+
+
 class TestNormalizeName(unittest.TestCase):
     def test_removes_nonascii_characters(self):
         n = "Flabébé"
@@ -0,0 +1,96 @@
+import pickle
+import unittest
+
+from data import all_move_json
+from data.ids import InternTable
+from data.ids import MOVE_IDS
+from data.pkmn_sets import PokemonMoveset
+from fp.battle import Move
+from fp.battle import Pokemon
+
+
+class TestInternTable(unittest.TestCase):
+    def setUp(self):
+        self.table = InternTable(["tackle", "thunderbolt"])
+
+    def test_ids_are_dense_and_in_order(self):
+        self.assertEqual(0, self.table.id("tackle"))
+        self.assertEqual(1, self.table.id("thunderbolt"))
+        self.assertEqual(2, len(self.table))
+
+    def test_ids_round_trip(self):
+        for name in ["tackle", "thunderbolt"]:
+            self.assertEqual(name, self.table.name(self.table.id(name)))
+
+    def test_unknown_names_have_no_id(self):
+        self.assertNotIn("splash", self.table)
+        self.assertIsNone(self.table.get("splash"))
+        with self.assertRaises(KeyError):
+            self.table.id("splash")
+
+    def test_every_move_has_an_id(self):
+        self.assertEqual(
+            list(range(len(MOVE_IDS))), sorted(map(MOVE_IDS.id, all_move_json))
+        )
+
+
+class TestMoveIds(unittest.TestCase):
+    def setUp(self):
+        self.pkmn = Pokemon("pikachu", 100)
+        for move_name in ["tackle", "thunderbolt", "hiddenpowerice60"]:
+            self.pkmn.add_move(move_name)
+
+    def test_move_name_is_the_tables_name(self):
+        move = Move("Thunder Bolt")
+        self.assertEqual(MOVE_IDS.id("thunderbolt"), move.id)
+        self.assertIs(MOVE_IDS.name(move.id), move.name)
+
+    def test_moves_keep_their_id_when_pickled(self):
+        move = pickle.loads(pickle.dumps(Move("tackle")))
+        self.assertEqual(MOVE_IDS.id("tackle"), move.id)
+        self.assertEqual(Move("tackle"), move)
+
+    def test_get_move(self):
+        self.assertEqual(
+            MOVE_IDS.id("thunderbolt"), self.pkmn.get_move("Thunderbolt").id
+        )
+        self.assertIsNone(self.pkmn.get_move("surf"))
+        self.assertIsNone(self.pkmn.get_move("notamove"))
+
+    def test_get_move_finds_the_pokemons_hidden_power(self):
+        self.assertEqual("hiddenpowerice60", self.pkmn.get_move("hiddenpower").name)
+
+    def test_remove_move(self):
+        self.assertTrue(self.pkmn.remove_move("tackle"))
+        self.assertIsNone(self.pkmn.get_move("tackle"))
+        self.assertFalse(self.pkmn.remove_move("notamove"))
+
+
+class TestMovesetIds(unittest.TestCase):
+    def setUp(self):
+        self.pkmn = Pokemon("pikachu", 100)
+        self.pkmn.add_move("thunderbolt")
+
+    def test_moveset_has_the_ids_of_its_moves(self):
+        moveset = PokemonMoveset(moves=("thunderbolt", "surf", "notamove"))
+        self.assertEqual(
+            frozenset([MOVE_IDS.id("thunderbolt"), MOVE_IDS.id("surf")]),
+            moveset.move_ids,
+        )
+
+    def test_pokemon_can_have_moveset(self):
+        self.assertTrue(
+            PokemonMoveset(moves=("thunderbolt", "surf")).full_set_pkmn_can_have_moves(
+                self.pkmn
+            )
+        )
+        self.assertFalse(
+            PokemonMoveset(moves=("surf",)).full_set_pkmn_can_have_moves(self.pkmn)
+        )
+
+    def test_changed_moveset_is_matched_by_its_new_moves(self):
+        moveset = PokemonMoveset(moves=("surf",))
+        moveset.add_move("thunderbolt")
+        self.assertTrue(moveset.full_set_pkmn_can_have_moves(self.pkmn))
+        moveset.remove_move("thunderbolt")
+        self.assertFalse(moveset.full_set_pkmn_can_have_moves(self.pkmn))
@@ -0,0 +1,115 @@
+import unittest
+
+from fp.battle import Battle
+from fp.battle import Pokemon
+from fp.legal_actions import forced_decision
+from fp.legal_actions import user_options
+
+
+def side_pokemon(details, condition, active):
+    return {
+        "ident": "p1: {}".format(details.split(",")[0]),
+        "details": details,
+        "condition": condition,
+        "active": active,
+        "stats": {"atk": 200, "def": 200, "spa": 200, "spd": 200, "spe": 200},
+        "moves": ["thunderbolt"],
+        "baseAbility": "static",
+        "item": "",
+        "ability": "static",
+    }
+
+
+def request_move(move, disabled=False):
+    return {"move": move, "id": move, "pp": 8, "maxpp": 8, "disabled": disabled}
+
+
+class TestUserOptions(unittest.TestCase):
+    def setUp(self):
+        Battle.__abstractmethods__ = set()
+        self.battle = Battle("battle-gen9ou-1")
+        self.battle.user.active = Pokemon("pikachu", 100)
+        self.battle.user.reserve = [Pokemon("raichu", 100)]
+        self.battle.request_json = {
+            "active": [
+                {
+                    "moves": [
+                        request_move("thunderbolt"),
+                        request_move("voltswitch"),
+                    ]
+                }
+            ],
+            "side": {
+                "pokemon": [
+                    side_pokemon("Pikachu, L100", "100/200", True),
+                    side_pokemon("Raichu, L100", "100/200", False),
+                ]
+            },
+        }
+
+    def options(self):
+        self.battle.user.update_from_request_json(self.battle.request_json)
+        return user_options(self.battle)
+
+    def test_moves_and_switches(self):
+        self.assertEqual(["thunderbolt", "voltswitch", "switch raichu"], self.options())
+        self.assertIsNone(forced_decision(self.battle))
+
+    def test_disabled_moves_are_not_options(self):
+        self.battle.request_json["active"][0]["moves"][1]["disabled"] = True
+        self.battle.request_json["active"][0]["trapped"] = True
+        self.battle.user.update_from_request_json(self.battle.request_json)
+
+        self.assertEqual("thunderbolt", forced_decision(self.battle))
+
+    def test_locked_move_while_trapped(self):
+        self.battle.request_json["active"] = [
+            {"moves": [{"move": "Outrage", "id": "outrage"}], "trapped": True}
+        ]
+        self.battle.user.update_from_request_json(self.battle.request_json)
+
+        self.assertEqual("outrage", forced_decision(self.battle))
+
+    def test_struggle_can_still_switch(self):
+        self.battle.request_json["active"][0]["moves"] = [request_move("struggle")]
+        self.assertEqual(["struggle", "switch raichu"], self.options())
+
+    def test_terastallizing_is_another_option(self):
+        self.battle.request_json["active"] = [
+            {
+                "moves": [request_move("struggle")],
+                "trapped": True,
+                "canTerastallize": "Electric",
+            }
+        ]
+        self.assertEqual(["struggle", "struggle-tera"], self.options())
+
+    def test_forced_switch_to_the_last_pokemon(self):
+        self.battle.request_json = {
+            "forceSwitch": [True],
+            "side": {
+                "pokemon": [
+                    side_pokemon("Pikachu, L100", "0 fnt", True),
+                    side_pokemon("Raichu, L100", "100/200", False),
+                ]
+            },
+        }
+        self.battle.user.update_from_request_json(self.battle.request_json)
+
+        self.assertEqual("switch raichu", forced_decision(self.battle))
+
+    def test_fainted_pokemon_are_not_switch_options(self):
+        self.battle.user.reserve.append(Pokemon("pichu", 100))
+        self.battle.request_json["side"]["pokemon"].append(
+            side_pokemon("Pichu, L100", "0 fnt", False)
+        )
+        self.assertEqual(["thunderbolt", "voltswitch", "switch raichu"], self.options())
+
+    def test_revival_blessing_is_left_to_the_search(self):
+        self.battle.request_json["forceSwitch"] = [True]
+        self.battle.request_json["side"]["pokemon"][0]["reviving"] = True
+        self.assertIsNone(self.options())
+
+    def test_requests_without_options_are_left_to_the_search(self):
+        del self.battle.request_json["active"]
+        self.assertIsNone(self.options())
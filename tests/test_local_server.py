@@ -0,0 +1,174 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+import requests
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+
+from local_server import LocalShowdownServer
+from local_server import load_recorded_battle
+from local_server import simulator_choice
+from local_server import split_update
+from local_server import start_login_server
+from tests.test_battle_log import LOG
+
+
+class TestLocalShowdownServer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        fd, path = tempfile.mkstemp(suffix=".log")
+        with os.fdopen(fd, "w") as f:
+            f.write(LOG)
+        self.addCleanup(os.remove, path)
+        self.recorded = load_recorded_battle(path)
+        self.server = LocalShowdownServer([self.recorded], decision_timeout=5)
+
+    async def connect(self):
+        websocket_server = await serve(self.server.handle, "127.0.0.1", 0)
+        self.addAsyncCleanup(websocket_server.wait_closed)
+        self.addCleanup(websocket_server.close)
+        port = websocket_server.sockets[0].getsockname()[1]
+        websocket = await connect("ws://127.0.0.1:{}".format(port))
+        self.addAsyncCleanup(websocket.close)
+        return websocket
+
+    def test_recorded_battle_waits_where_the_bot_made_choices(self):
+        self.assertEqual("gen9randombattle", self.recorded.pokemon_format)
+        self.assertEqual("bot", self.recorded.bot_name)
+        self.assertEqual(2, self.recorded.steps.count(None))
+        self.assertIsNone(self.recorded.steps[-1])
+
+    async def test_battle_is_replayed_for_the_logged_in_user(self):
+        websocket = await self.connect()
+        self.assertTrue((await websocket.recv()).startswith("|challstr|"))
+
+        await websocket.send("|/trn newbot,0,assertion")
+        self.assertEqual("|updateuser| newbot|1|1|{}", await websocket.recv())
+
+        await websocket.send("|/search gen9randombattle")
+        messages = []
+        while "|turn|1" not in "".join(messages):
+            messages.append(await websocket.recv())
+
+        battle_tag = messages[0].split("\n")[0][1:]
+        self.assertIn("|player|p1|newbot|", "".join(messages))
+
+        await websocket.send("{}|/choose move thunderbolt|1".format(battle_tag))
+        while "|turn|2" not in messages[-1]:
+            messages.append(await websocket.recv())
+        await websocket.send("{}|/switch 2|2".format(battle_tag))
+
+        await websocket.send("|/leave {}".format(battle_tag))
+        while "|deinit" not in messages[-1]:
+            messages.append(await websocket.recv())
+        self.assertEqual(">{}\n|deinit".format(battle_tag), messages[-1])
+
+        await asyncio.sleep(0.05)
+        stats = self.server.stats.to_dict()
+        self.assertEqual(1, stats["battles_finished"])
+        self.assertEqual(2, stats["decisions"])
+        self.assertEqual(0, stats["timeouts"])
+
+
+class TestLoginServer(unittest.TestCase):
+    def test_password_logins_get_an_assertion(self):
+        server = start_login_server(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        response = requests.post(
+            "http://127.0.0.1:{}/api/login".format(server.server_address[1]),
+            data={"name": "bot", "pass": "password", "challstr": "4|abc"},
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.text.startswith("]"))
+        self.assertIn("assertion", response.text)
+
+
+# stands in for `pokemon-showdown simulate-battle`: one turn, then p1 wins
+FAKE_SIMULATOR = """
+import sys
+lines = iter(sys.stdin.readline, "")
+players = [next(lines), next(lines), next(lines)]
+print("update\\n|player|p1|one|1|\\n|player|p2|two|1|\\n|start\\n|split|p1\\n|switch|p1a: Pikachu|Pikachu|211/211\\n|switch|p1a: Pikachu|Pikachu|100/100\\n|turn|1", flush=True)
+print('sideupdate\\np1\\n|request|{"rqid":1}', flush=True)
+print('sideupdate\\np2\\n|request|{"rqid":1}', flush=True)
+choices = sorted([next(lines), next(lines)])
+print("update\\n|win|one", flush=True)
+print('end\\n{"winner":"one","choices":%s}' % repr(choices).replace("'", '"'), flush=True)
+"""
+
+
+class TestSimulatedBattle(unittest.IsolatedAsyncioTestCase):
+    async def test_bots_play_each_other_through_the_simulator(self):
+        server = LocalShowdownServer(
+            [], simulator=[sys.executable, "-c", FAKE_SIMULATOR]
+        )
+        websocket_server = await serve(server.handle, "127.0.0.1", 0)
+        self.addAsyncCleanup(websocket_server.wait_closed)
+        self.addCleanup(websocket_server.close)
+        uri = "ws://127.0.0.1:{}".format(websocket_server.sockets[0].getsockname()[1])
+
+        one = await connect(uri)
+        two = await connect(uri)
+        self.addAsyncCleanup(one.close)
+        self.addAsyncCleanup(two.close)
+        await one.send("|/trn one,0,assertion")
+        await two.send("|/trn two,0,assertion")
+        await one.send("|/challenge two,gen9randombattle")
+
+        async def receive_until(websocket, text):
+            while True:
+                msg = await websocket.recv()
+                if text in msg:
+                    return msg
+
+        pm = await receive_until(two, "|pm|")
+        self.assertEqual(
+            "|pm| one| two|/challenge gen9randombattle|gen9randombattle|||", pm
+        )
+        await two.send("|/accept one")
+
+        init = await receive_until(one, "|init|battle")
+        battle_tag = init.split("\n")[0][1:]
+        self.assertIn("|title|one vs. two\n|j|☆one", init)
+
+        self.assertIn("|211/211", await receive_until(one, "|switch|"))
+        self.assertIn("|100/100", await receive_until(two, "|switch|"))
+
+        await receive_until(one, "|request|")
+        await receive_until(two, "|request|")
+        await one.send("{}|/choose move 1|1".format(battle_tag))
+        await two.send("{}|/switch 2|1".format(battle_tag))
+
+        await receive_until(two, "|win|one")
+        await server.sessions_by_name["one"].battle
+        self.assertEqual(
+            [{"battle_tag": battle_tag, "players": ["one", "two"], "winner": "one"}],
+            server.results,
+        )
+        self.assertEqual(2, server.stats.to_dict()["decisions"])
+
+
+class TestSimulatorMessages(unittest.TestCase):
+    def test_split_lines_are_only_shown_to_their_side(self):
+        lines = [
+            "|split|p1",
+            "|-heal|p1a: A|150/300",
+            "|-heal|p1a: A|50/100",
+            "|turn|2",
+        ]
+        self.assertEqual(
+            ["|-heal|p1a: A|150/300", "|turn|2"], split_update(lines, "p1")
+        )
+        self.assertEqual(["|-heal|p1a: A|50/100", "|turn|2"], split_update(lines, "p2"))
+
+    def test_choices_are_converted_to_simulator_input(self):
+        self.assertEqual(
+            "move 1 terastallize", simulator_choice("/choose move 1 terastallize|3")
+        )
+        self.assertEqual("switch 2", simulator_choice("/switch 2|3"))
+        self.assertEqual("team 213456", simulator_choice("/team 213456|1"))
@@ -0,0 +1,131 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+from functools import lru_cache
+
+from fp.metrics import Counter
+from fp.metrics import Gauge
+from fp.metrics import Histogram
+from fp.metrics import MetricsDump
+from fp.metrics import Registry
+from fp.metrics import start_metrics_server
+from fp.tracing import DecisionTimings
+from fp import metrics
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_is_written_with_its_labels(self):
+        counter = self.registry.register(
+            Counter("messages_total", "Messages", label_names=["direction"])
+        )
+        counter.inc(direction="sent")
+        counter.inc(2, direction="sent")
+
+        self.assertEqual(
+            "# HELP messages_total Messages\n"
+            "# TYPE messages_total counter\n"
+            'messages_total{direction="sent"} 3.0\n',
+            self.registry.to_prometheus(),
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.register(
+            Histogram("decision_seconds", "Decisions", buckets=[1, 5])
+        )
+        for value in [0.5, 2, 3, 10]:
+            histogram.observe(value)
+
+        lines = self.registry.to_prometheus().splitlines()
+        self.assertIn('decision_seconds_bucket{le="1"} 1', lines)
+        self.assertIn('decision_seconds_bucket{le="5"} 3', lines)
+        self.assertIn('decision_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("decision_seconds_sum 15.5", lines)
+        self.assertIn("decision_seconds_count 4", lines)
+
+    def test_callback_is_only_called_when_collected(self):
+        calls = []
+
+        def callback():
+            calls.append(1)
+            return {("a",): 1}
+
+        self.registry.register(
+            Gauge("depth", "Depth", label_names=["queue"], callback=callback)
+        )
+        self.assertEqual([], calls)
+
+        self.assertEqual({"depth": {"a": 1}}, self.registry.to_dict())
+        self.assertEqual([1], calls)
+
+    def test_same_name_cannot_be_registered_twice(self):
+        self.registry.register(Counter("messages_total", "Messages"))
+        with self.assertRaises(ValueError):
+            self.registry.register(Counter("messages_total", "Messages"))
+
+
+class TestFeeds(unittest.TestCase):
+    def test_decision_timings_are_observed_when_emitted(self):
+        count_before = metrics.SAMPLES_PER_DECISION.to_dict().get("", {"count": 0})
+        timings = DecisionTimings("battle-gen9ou-1", 3)
+        timings.fields["num_battles"] = 4
+        timings.fields["iterations"] = 20000
+        timings.add_phase("search", 100)
+        timings.emit(150)
+
+        samples = metrics.SAMPLES_PER_DECISION.to_dict()[""]
+        self.assertEqual(count_before["count"] + 1, samples["count"])
+        self.assertIn("search", metrics.DECISION_PHASE_SECONDS.to_dict())
+
+    def test_lru_cache_hits_are_read_from_cache_info(self):
+        @lru_cache()
+        def double(x):
+            return x * 2
+
+        metrics.register_lru_cache("double", double)
+        self.addCleanup(metrics.LRU_CACHE_CALLBACKS.pop)
+        double(1)
+        double(1)
+
+        collected = metrics.LRU_CACHES.to_dict()
+        self.assertEqual(1, collected["double,hit"])
+        self.assertEqual(1, collected["double,miss"])
+
+    def test_win_rate_is_per_format(self):
+        metrics.record_battle_result("gen1testformat", True)
+        metrics.record_battle_result("gen1testformat", True)
+        metrics.record_battle_result("gen1testformat", False)
+        metrics.record_battle_result("gen2testformat", False)
+
+        win_rates = metrics.WIN_RATE.to_dict()
+        self.assertEqual(0.6667, win_rates["gen1testformat"])
+        self.assertEqual(0, win_rates["gen2testformat"])
+
+
+class TestExporters(unittest.TestCase):
+    def test_server_serves_prometheus_text(self):
+        server = start_metrics_server(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+
+        self.assertIn("# TYPE foulplay_decision_seconds histogram", body)
+
+    def test_dump_writes_a_json_line_when_stopped(self):
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        MetricsDump(path, interval_seconds=60).start().stop()
+
+        with open(path) as f:
+            lines = f.readlines()
+        self.assertEqual(1, len(lines))
+        self.assertIn("foulplay_battles_total", json.loads(lines[0])["metrics"])
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import constants
+from fp.battle import Battle
+from fp.battle import Pokemon
+from fp.opening_book import LEAD
+from fp.opening_book import OpeningBook
+from fp.opening_book import OpeningPosition
+from fp.opening_book import opening_position
+
+
+POSITION = OpeningPosition("gen9ou", "abc", "garchomp ironvaliant", LEAD)
+
+
+def record_searches(path, count):
+    book = OpeningBook(path, confidence=0.8, min_searches=1)
+    for _ in range(count):
+        book.record(POSITION, {"switch pikachu": 1})
+
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "book.sqlite")
+        self.book = OpeningBook(self.path, confidence=0.8, min_searches=2)
+
+    def test_unknown_position(self):
+        self.assertIsNone(self.book.lookup(POSITION))
+
+    def test_too_few_searches(self):
+        self.book.record(POSITION, {"switch pikachu": 1})
+        self.assertIsNone(self.book.lookup(POSITION))
+
+    def test_confident_decision(self):
+        self.book.record(POSITION, {"switch pikachu": 0.9, "switch raichu": 0.1})
+        self.book.record(POSITION, {"switch pikachu": 0.8, "switch raichu": 0.2})
+        self.assertEqual("switch pikachu", self.book.lookup(POSITION))
+
+    def test_searches_that_disagree_are_not_used(self):
+        self.book.record(POSITION, {"switch pikachu": 1})
+        self.book.record(POSITION, {"switch raichu": 1})
+        self.assertIsNone(self.book.lookup(POSITION))
+
+    def test_policies_are_normalized(self):
+        self.book.record(POSITION, {"switch pikachu": 3, "switch raichu": 1})
+        self.book.record(POSITION, {"switch pikachu": 3, "switch raichu": 1})
+        self.assertIsNone(self.book.lookup(POSITION))
+
+    def test_positions_are_kept_apart(self):
+        for _ in range(2):
+            self.book.record(POSITION, {"switch pikachu": 1})
+        self.assertIsNone(self.book.lookup(POSITION._replace(format="gen8ou")))
+
+    def test_processes_share_the_book(self):
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=record_searches, args=(self.path, 10))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        self.assertEqual([0] * 4, [p.exitcode for p in processes])
+        self.book.min_searches = 40
+        self.assertEqual("switch pikachu", self.book.lookup(POSITION))
+        self.book.min_searches = 41
+        self.assertIsNone(self.book.lookup(POSITION))
+
+
+class TestOpeningPosition(unittest.TestCase):
+    def setUp(self):
+        Battle.__abstractmethods__ = set()
+        self.battle = Battle("battle-gen9ou-1")
+        self.battle.battle_type = constants.STANDARD_BATTLE
+        self.battle.user.reserve = [Pokemon("pikachu", 100), Pokemon("raichu", 100)]
+        self.battle.opponent.reserve = [
+            Pokemon("ironvaliant", 100),
+            Pokemon("garchomp", 100),
+        ]
+
+    def test_team_preview(self):
+        self.battle.team_preview = True
+        position = opening_position(self.battle)
+
+        self.assertEqual("gen9ou", position.format)
+        self.assertEqual("garchomp ironvaliant", position.opponent)
+        self.assertEqual(LEAD, position.situation)
+
+    def test_turn_one(self):
+        self.battle.turn = 1
+        self.battle.user.active = self.battle.user.reserve.pop(0)
+        self.battle.opponent.active = self.battle.opponent.reserve.pop(0)
+        position = opening_position(self.battle)
+
+        self.assertEqual("garchomp ironvaliant", position.opponent)
+        self.assertEqual("turn1 pikachu ironvaliant", position.situation)
+
+    def test_the_same_species_with_different_sets_are_different_teams(self):
+        self.battle.team_preview = True
+        team = opening_position(self.battle).team
+        self.battle.user.reserve[0].item = "lightball"
+        self.assertNotEqual(team, opening_position(self.battle).team)
+
+    def test_later_turns_are_not_in_the_book(self):
+        self.battle.turn = 2
+        self.battle.user.active = self.battle.user.reserve.pop(0)
+        self.battle.opponent.active = self.battle.opponent.reserve.pop(0)
+        self.assertIsNone(opening_position(self.battle))
+
+    def test_random_battles_are_not_in_the_book(self):
+        self.battle.team_preview = True
+        self.battle.battle_type = constants.RANDOM_BATTLE
+        self.assertIsNone(opening_position(self.battle))
@@ -1,15 +1,65 @@
+import asyncio
+import json
+import os
+import tempfile
 import unittest
+from unittest import mock
 
+from config import FoulPlayConfig
 from data.pkmn_sets import (
     TeamDatasets,
     SmogonSets,
     PredictedPokemonSet,
     PokemonSet,
     PokemonMoveset,
+    pkmn_name_aliases,
 )
 from fp.battle import Pokemon, Move
 
 
+class TestPkmnNameLookup(unittest.TestCase):
+    def setUp(self):
+        TeamDatasets.__init__()
+        TeamDatasets.pkmn_sets = {"gastrodon": ["gastrodon_set"], "zoroark": ["set"]}
+
+    def test_cosmetic_forme_aliases_base_species(self):
+        self.assertEqual(("gastrodon",), pkmn_name_aliases()["gastrodoneast"])
+
+    def test_cosmetic_forme_finds_base_species_sets(self):
+        self.assertEqual(
+            ["gastrodon_set"],
+            TeamDatasets.get_pkmn_sets_from_pkmn_name("gastrodoneast", "gastrodoneast"),
+        )
+
+    def test_pokemon_added_after_lookup_is_found(self):
+        TeamDatasets.initialize("gen4ou", {"dragonite"})
+        self.assertEqual(
+            [], TeamDatasets.get_pkmn_sets_from_pkmn_name("azelf", "azelf")
+        )
+        TeamDatasets.add_new_pokemon("azelf")
+        self.assertNotEqual(
+            [], TeamDatasets.get_pkmn_sets_from_pkmn_name("azelf", "azelf")
+        )
+
+    def test_missing_pokemon_is_only_looked_up_once(self):
+        with mock.patch.object(
+            TeamDatasets,
+            "_find_key_for_pkmn_name",
+            wraps=TeamDatasets._find_key_for_pkmn_name,
+        ) as find_key:
+            for _ in range(3):
+                TeamDatasets.get_pkmn_sets_from_pkmn_name("azelf", "azelf")
+        self.assertEqual(1, find_key.call_count)
+
+    def test_missing_pokemon_only_warns_once(self):
+        with mock.patch("data.pkmn_sets.logger") as logger:
+            for _ in range(3):
+                self.assertEqual(
+                    [], TeamDatasets.get_pkmn_sets_from_pkmn_name("azelf", "azelf")
+                )
+        self.assertEqual(1, logger.warning.call_count)
+
+
 class TestTeamDatasets(unittest.TestCase):
     def setUp(self):
         TeamDatasets.__init__()
@@ -51,6 +101,25 @@ class TestTeamDatasets(unittest.TestCase):
         TeamDatasets.add_new_pokemon("azelf")
         self.assertEqual(len_after_pop, len(TeamDatasets.pkmn_sets["dragonite"]))
 
+    def test_prewarmed_datasets_are_narrowed_to_the_battle(self):
+        team = {"azelf", "heatran", "rotomwash", "scizor", "tyranitar", "volcarona"}
+        TeamDatasets.initialize("gen5ou", team)
+        loaded_sets = TeamDatasets.pkmn_sets
+
+        TeamDatasets.prewarm("gen5ou")
+        TeamDatasets.initialize("gen5ou", team)
+
+        self.assertEqual(loaded_sets, TeamDatasets.pkmn_sets)
+
+    def test_changing_prewarmed_sets_does_not_change_the_next_battle(self):
+        TeamDatasets.prewarm("gen5ou")
+        TeamDatasets.initialize("gen5ou", {"dragonite"})
+        initial_len = len(TeamDatasets.pkmn_sets["dragonite"])
+        TeamDatasets.pkmn_sets["dragonite"].pop(-1)
+
+        TeamDatasets.initialize("gen5ou", {"dragonite"})
+        self.assertEqual(initial_len, len(TeamDatasets.pkmn_sets["dragonite"]))
+
 
 class TestSmogonDatasets(unittest.TestCase):
     def setUp(self):
@@ -96,6 +165,113 @@ class TestSmogonDatasets(unittest.TestCase):
         self.assertEqual(len_after_pop, len(SmogonSets.pkmn_sets["dragonite"]))
 
 
+def _smogon_stats_pkmn(raw_count, moves):
+    return {
+        "Raw count": raw_count,
+        "Teammates": {},
+        "Checks and Counters": {},
+        "Spreads": {"Adamant:0/252/0/0/4/252": raw_count},
+        "Items": {"leftovers": raw_count},
+        "Moves": {m: raw_count for m in moves},
+        "Abilities": {"innerfocus": raw_count},
+        "Tera Types": {"nothing": raw_count},
+    }
+
+
+class TestSmogonStatsMirror(unittest.TestCase):
+    def setUp(self):
+        SmogonSets.__init__()
+        self.mirror_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.patches = [
+            mock.patch.object(
+                FoulPlayConfig, "smogon_stats_mirror", self.mirror_dir.name
+            ),
+            mock.patch("data.pkmn_sets.SMOGON_CACHE_DIR", self.cache_dir.name),
+            mock.patch(
+                "data.pkmn_sets.requests.get",
+                side_effect=AssertionError("network access is not allowed"),
+            ),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.mirror_dir.cleanup()
+        self.cache_dir.cleanup()
+
+    def _write_mirror_file(self, pkmn_mode, month_delta=1):
+        url = SmogonSets._get_smogon_stats_file_name(pkmn_mode, month_delta)
+        relative_path = url.split("/stats/")[-1]
+        path = os.path.join(self.mirror_dir.name, *relative_path.split("/"))
+        os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "data": {
+                        "Dragonite": _smogon_stats_pkmn(
+                            100, ["extremespeed", "earthquake"]
+                        )
+                    }
+                },
+                f,
+            )
+
+    def test_initialize_reads_stats_from_mirror_directory(self):
+        self._write_mirror_file("gen4ou")
+        SmogonSets.initialize("gen4ou", {"dragonite"})
+        self.assertIn("dragonite", SmogonSets.pkmn_sets)
+        self.assertEqual(1, len(SmogonSets.pkmn_sets["dragonite"]))
+
+    def test_falls_back_to_previous_month_in_mirror(self):
+        self._write_mirror_file("gen4ou", month_delta=2)
+        SmogonSets.initialize("gen4ou", {"dragonite"})
+        self.assertIn("dragonite", SmogonSets.pkmn_sets)
+
+    def test_prefetch_warms_the_cache(self):
+        self._write_mirror_file("gen4ou")
+        asyncio.run(SmogonSets.prefetch("gen4ou"))
+        self.assertTrue(
+            os.path.exists(os.path.join(self.cache_dir.name, "gen4ou-0.json"))
+        )
+
+        # the mirror is no longer needed once the cache is warm
+        self.mirror_dir.cleanup()
+        SmogonSets.initialize("gen4ou", {"dragonite"})
+        self.assertIn("dragonite", SmogonSets.pkmn_sets)
+
+    def test_prewarmed_stats_are_narrowed_to_the_battle(self):
+        self._write_mirror_file("gen4ou")
+        SmogonSets.prewarm("gen4ou")
+
+        # the stats are not read again once they are prewarmed
+        self.mirror_dir.cleanup()
+        os.remove(os.path.join(self.cache_dir.name, "gen4ou-0.json"))
+        SmogonSets.initialize("gen4ou", {"dragonite"})
+        self.assertIn("dragonite", SmogonSets.pkmn_sets)
+        SmogonSets.initialize("gen4ou", {"tyranitar"})
+        self.assertEqual({}, SmogonSets.raw_pkmn_sets)
+
+    def test_prefetch_does_not_raise_when_stats_are_missing(self):
+        asyncio.run(SmogonSets.prefetch("gen4ou"))
+        self.assertFalse(
+            os.path.exists(os.path.join(self.cache_dir.name, "gen4ou-0.json"))
+        )
+
+    def test_failed_prefetch_is_tried_again(self):
+        async def prefetch_twice():
+            await SmogonSets.prefetch("gen4ou")
+            self._write_mirror_file("gen4ou")
+            await SmogonSets.prefetch("gen4ou")
+
+        asyncio.run(prefetch_twice())
+        self.assertTrue(
+            os.path.exists(os.path.join(self.cache_dir.name, "gen4ou-0.json"))
+        )
+
+
 class TestPredictSet(unittest.TestCase):
     def setUp(self):
         TeamDatasets.__init__()
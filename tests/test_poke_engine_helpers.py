@@ -0,0 +1,116 @@
+import unittest
+from copy import deepcopy
+from unittest import mock
+
+import constants
+from fp.battle import Battle
+from fp.battle import Pokemon
+from fp.battle_bots.poke_engine_helpers import OpponentSetDamageRolls
+from fp.battle_bots.poke_engine_helpers import battles_to_poke_engine_states
+from fp.battle_bots.poke_engine_helpers import pokemon_to_poke_engine_pkmn
+
+
+class TestOpponentSetDamageRolls(unittest.TestCase):
+    def setUp(self):
+        Battle.__abstractmethods__ = set()
+        self.battle = Battle(None)
+        self.battle.user.active = Pokemon("pikachu", 100)
+        self.battle.opponent.active = Pokemon("charmander", 100)
+        self.damage_rolls = OpponentSetDamageRolls(self.battle)
+
+        patcher = mock.patch(
+            "fp.battle_bots.poke_engine_helpers.calculate_damage",
+            return_value=([10, 12], [20, 24]),
+        )
+        self.calculate_damage = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_switch_moves_are_normalized(self):
+        self.damage_rolls.get("switch pikachu", "tackle", True)
+        _, s1_move, s2_move, went_first = self.calculate_damage.call_args[0]
+        self.assertEqual(("switch", "tackle", True), (s1_move, s2_move, went_first))
+
+    def test_same_set_is_only_calculated_once(self):
+        self.damage_rolls.get("tackle", "ember", True)
+        rolls = self.damage_rolls.get("tackle", "ember", True)
+
+        self.assertEqual(([10, 12], [20, 24]), rolls)
+        self.assertEqual(1, self.calculate_damage.call_count)
+
+    def test_different_moves_are_calculated_again(self):
+        self.damage_rolls.get("tackle", "ember", True)
+        self.damage_rolls.get("tackle", "ember", False)
+
+        self.assertEqual(2, self.calculate_damage.call_count)
+
+    def test_state_is_reused_with_new_opponent_pokemon_for_a_new_set(self):
+        self.damage_rolls.get("tackle", "ember", True)
+        state = self.calculate_damage.call_args[0][0]
+
+        self.battle.opponent.active.item = "choiceband"
+        self.damage_rolls.get("tackle", "ember", True)
+
+        self.assertEqual(2, self.calculate_damage.call_count)
+        self.assertIs(state, self.calculate_damage.call_args[0][0])
+        self.assertEqual("choiceband", state.side_two.pokemon[0].item)
+
+    def test_substitute_health_follows_the_new_max_hp(self):
+        self.battle.opponent.active.volatile_statuses.append(constants.SUBSTITUTE)
+        self.damage_rolls.get("tackle", "ember", True)
+
+        self.battle.opponent.active.set_spread("modest", "252,0,0,0,0,0")
+        self.damage_rolls.get("tackle", "ember", True)
+
+        state = self.calculate_damage.call_args[0][0]
+        self.assertEqual(
+            int(self.battle.opponent.active.max_hp / 4),
+            state.side_two.substitute_health,
+        )
+
+
+class TestPokemonToPokeEnginePkmn(unittest.TestCase):
+    def setUp(self):
+        self.pkmn = Pokemon("pikachu", 100)
+        self.pkmn.add_move("thunderbolt")
+
+    def test_pokemon_with_the_same_values_share_an_engine_pokemon(self):
+        self.assertIs(
+            pokemon_to_poke_engine_pkmn(self.pkmn),
+            pokemon_to_poke_engine_pkmn(deepcopy(self.pkmn)),
+        )
+
+    def test_engine_pokemon_is_rebuilt_when_a_value_changes(self):
+        before = pokemon_to_poke_engine_pkmn(self.pkmn)
+        self.pkmn.hp -= 1
+        after = pokemon_to_poke_engine_pkmn(self.pkmn)
+
+        self.assertIsNot(before, after)
+        self.assertEqual(self.pkmn.hp, after.hp)
+
+    def test_engine_pokemon_is_rebuilt_when_a_move_changes(self):
+        before = pokemon_to_poke_engine_pkmn(self.pkmn)
+        self.pkmn.moves[0].current_pp -= 1
+        after = pokemon_to_poke_engine_pkmn(self.pkmn)
+
+        self.assertIsNot(before, after)
+
+    def test_moves_are_padded_to_four(self):
+        p = pokemon_to_poke_engine_pkmn(self.pkmn)
+        self.assertEqual(
+            ["thunderbolt", "none", "none", "none"], [m.id for m in p.moves]
+        )
+
+
+class TestBattlesToPokeEngineStates(unittest.TestCase):
+    def test_user_side_is_shared_by_every_state(self):
+        Battle.__abstractmethods__ = set()
+        battle = Battle(None)
+        battle.user.active = Pokemon("pikachu", 100)
+        battle.opponent.active = Pokemon("charmander", 100)
+        other_battle = deepcopy(battle)
+        other_battle.opponent.active = Pokemon("squirtle", 100)
+
+        states = battles_to_poke_engine_states([battle, other_battle])
+
+        self.assertIs(states[0].side_one, states[1].side_one)
+        self.assertEqual("squirtle", states[1].side_two.pokemon[0].id)
@@ -0,0 +1,42 @@
+import unittest
+
+from fp.protocol import ProtocolEvent
+from fp.protocol import parse_line
+from fp.protocol import parse_lines
+
+
+class TestParseLine(unittest.TestCase):
+    def test_parses_action_and_split_msg(self):
+        event = parse_line("|move|p2a: Weedle|Tackle|p1a: Pikachu")
+        self.assertEqual("move", event.action)
+        self.assertEqual(
+            ["", "move", "p2a: Weedle", "Tackle", "p1a: Pikachu"], event.split_msg
+        )
+
+    def test_side_is_taken_from_pokemon_identifier(self):
+        self.assertEqual("p2", parse_line("|move|p2a: Weedle|Tackle").side)
+        self.assertIsNone(parse_line("|turn|3").side)
+
+    def test_tags_are_parsed(self):
+        event = parse_line("|-damage|p2a: Weedle|88/100|[from] item: Life Orb")
+        self.assertEqual({"from": "item: Life Orb"}, event.tags)
+
+    def test_tag_without_value(self):
+        event = parse_line("|-weather|RainDance|[upkeep]")
+        self.assertEqual({"upkeep": ""}, event.tags)
+
+    def test_line_without_action(self):
+        event = parse_line("")
+        self.assertEqual("", event.action)
+        self.assertEqual([""], event.split_msg)
+
+    def test_parsed_line_is_passed_through(self):
+        event = parse_line("|turn|3")
+        self.assertIs(event, parse_line(event))
+
+    def test_parse_lines_mixes_strings_and_events(self):
+        event = parse_line("|turn|3")
+        events = parse_lines([event, "|upkeep"])
+        self.assertIs(event, events[0])
+        self.assertIsInstance(events[1], ProtocolEvent)
+        self.assertEqual("upkeep", events[1].action)
@@ -0,0 +1,141 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import constants
+from config import FoulPlayConfig
+from data.pkmn_sets import SmogonSets
+from fp.battle import Battle
+from fp.battle import Pokemon
+from fp.metrics import DECISION_PHASE_SECONDS
+from fp.metrics import DECISIONS
+from fp.run_battle import async_pick_move
+from fp.run_battle import initialize_smogon_sets
+
+
+class SearchThreadBot(Battle):
+    search_threads = []
+
+    def find_best_move(self):
+        self.search_threads.append(threading.current_thread().name)
+        if self.team_preview:
+            return "switch charmander"
+        # bots are free to change the battle they search from
+        self.user.reserve.clear()
+        return "tackle"
+
+
+class TestAsyncPickMove(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.battle = SearchThreadBot("battle-gen9ou-1")
+        self.battle.turn = 3
+        self.battle.user.active = Pokemon("pikachu", 100)
+        self.battle.user.active.add_move("tackle")
+        self.battle.user.reserve = [Pokemon("charmander", 100)]
+        self.battle.opponent.active = Pokemon("bulbasaur", 100)
+        self.battle.request_json = {"side": {"pokemon": []}}
+        self.battle.rqid = 5
+        SearchThreadBot.search_threads.clear()
+
+        for name, value in [("profile_turn", None), ("parallelism", 1)]:
+            patch = mock.patch.object(FoulPlayConfig, name, value, create=True)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_searches_share_the_search_pool(self):
+        await async_pick_move(self.battle)
+        await async_pick_move(self.battle)
+
+        threads = SearchThreadBot.search_threads
+        self.assertEqual(2, len(threads))
+        self.assertTrue(all(name.startswith("search") for name in threads))
+
+    async def test_battle_is_not_changed_by_the_search(self):
+        decision = await async_pick_move(self.battle)
+
+        self.assertEqual(["/choose move tackle", "5"], decision)
+        self.assertEqual(1, len(self.battle.user.reserve))
+        self.assertEqual("tackle", self.battle.user.last_selected_move.move)
+
+    async def test_snapshot_and_executor_time_are_measured(self):
+        await async_pick_move(self.battle)
+
+        phases = DECISION_PHASE_SECONDS.to_dict()
+        self.assertIn("snapshot", phases)
+        self.assertIn("executor", phases)
+
+    async def test_the_only_option_is_sent_without_searching(self):
+        self.battle.request_json = {
+            "forceSwitch": [True],
+            "side": {
+                "pokemon": [
+                    {
+                        "ident": "p1: {}".format(name),
+                        "details": "{}, L100".format(name),
+                        "condition": condition,
+                        "active": active,
+                        "stats": {},
+                        "moves": [],
+                        "ability": "static",
+                        "item": "",
+                    }
+                    for name, condition, active in [
+                        ("Pikachu", "0 fnt", True),
+                        ("Charmander", "100/100", False),
+                    ]
+                ]
+            },
+        }
+        forced = DECISIONS.to_dict().get("forced", 0)
+
+        decision = await async_pick_move(self.battle)
+
+        self.assertEqual(["/switch 2", "5"], decision)
+        self.assertEqual([], SearchThreadBot.search_threads)
+        self.assertEqual(forced + 1, DECISIONS.to_dict()["forced"])
+
+    async def test_team_preview_is_taken_from_the_opening_book(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name, value in [
+            ("opening_book_file", os.path.join(directory.name, "book.sqlite")),
+            ("opening_book_min_searches", 1),
+        ]:
+            patch = mock.patch.object(FoulPlayConfig, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.battle.battle_type = constants.STANDARD_BATTLE
+        self.battle.user.reserve[0].index = 2
+
+        searched = await async_pick_move(self.battle, team_preview=True)
+        from_book = await async_pick_move(self.battle, team_preview=True)
+
+        self.assertEqual(["/switch 2", "5"], searched)
+        self.assertEqual(searched, from_book)
+        self.assertEqual(1, len(SearchThreadBot.search_threads))
+
+
+class TestInitializeSmogonSets(unittest.IsolatedAsyncioTestCase):
+    async def test_sets_are_not_initialized_on_the_event_loop(self):
+        initialize_threads = []
+        for name, value in [
+            ("prefetch", mock.AsyncMock()),
+            (
+                "initialize",
+                lambda *_args: initialize_threads.append(threading.current_thread()),
+            ),
+        ]:
+            patch = mock.patch.object(SmogonSets, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+        patch = mock.patch.object(FoulPlayConfig, "smogon_stats", None)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        await initialize_smogon_sets("gen9ou", {"pikachu"})
+
+        SmogonSets.prefetch.assert_awaited_once_with("gen9ou")
+        self.assertEqual(1, len(initialize_threads))
+        self.assertIsNot(threading.current_thread(), initialize_threads[0])
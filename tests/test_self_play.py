@@ -0,0 +1,40 @@
+import unittest
+
+from local_server import LocalShowdownServer
+from self_play import parse_side_config
+from self_play import report
+from self_play import wilson_interval
+
+
+class TestSelfPlay(unittest.TestCase):
+    def test_side_config_is_parsed_into_environment_variables(self):
+        self.assertEqual(
+            {"BATTLE_BOT": "mcts", "SEARCH_TIME_MS": "100"},
+            parse_side_config("BATTLE_BOT=mcts,SEARCH_TIME_MS=100"),
+        )
+        self.assertEqual({}, parse_side_config(""))
+
+    def test_wilson_interval_contains_the_win_rate(self):
+        low, high = wilson_interval(60, 100)
+        self.assertLess(low, 0.6)
+        self.assertGreater(high, 0.6)
+        self.assertEqual((0.502, 0.6906), (low, high))
+
+    def test_report_counts_wins_for_each_side(self):
+        server = LocalShowdownServer([], simulator=["simulator"])
+        server.results = [
+            {"players": ["selfplay0a", "selfplay0b"], "winner": "selfplay0a"},
+            {"players": ["selfplay1a", "selfplay1b"], "winner": "selfplay1b"},
+            {"players": ["selfplay2a", "selfplay2b"], "winner": "selfplay2a"},
+            {"players": ["selfplay3a", "selfplay3b"], "winner": None},
+        ]
+        server.stats.record_decision("selfplay0a", 100)
+        server.stats.record_decision("selfplay0b", 50)
+
+        result = report(server, games=5, seconds=10)
+
+        self.assertEqual(4, result["finished"])
+        self.assertEqual(1, result["ties"])
+        self.assertEqual(0.6667, result["side_a_win_rate"])
+        self.assertEqual(2, result["side_a"]["wins"])
+        self.assertEqual(1, result["side_b"]["decisions"])
@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from teams import team_registry
+from teams.team_registry import TeamRegistry
+
+
+PELIPPER = """Pelipper @ Choice Specs
+Ability: Drizzle
+EVs: 4 HP / 252 SpA / 252 Spe
+Modest Nature
+- Hurricane
+- Surf
+"""
+
+TING_LU = """Ting-Lu @ Leftovers
+Ability: Vessel of Ruin
+EVs: 252 HP / 4 Atk / 252 SpD
+Careful Nature
+- Earthquake
+- Spikes
+"""
+
+
+class TestTeamRegistry(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(team_registry, "TEAM_DIR", directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.team_dir = os.path.join(directory.name, "gen9", "ou")
+        os.makedirs(self.team_dir)
+        self.write("a", PELIPPER)
+        self.write("b", TING_LU)
+
+    def write(self, file_name, text):
+        path = os.path.join(self.team_dir, file_name)
+        with open(path, "w") as f:
+            f.write(text)
+        # some filesystems only keep whole seconds
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_teams_are_converted_once(self):
+        registry = TeamRegistry("gen9/ou")
+        with mock.patch.object(
+            team_registry,
+            "convert_team_file",
+            wraps=team_registry.convert_team_file,
+        ) as convert_team_file:
+            registry.next_team()
+            registry.next_team()
+
+        self.assertEqual(2, convert_team_file.call_count)
+        self.assertEqual(["a", "b"], [t.file_name for t in registry.teams])
+        self.assertTrue(
+            registry.teams[0].packed.startswith("Pelipper|Pelipper|choicespecs")
+        )
+        self.assertEqual("Pelipper", registry.teams[0].team_dict[0]["species"])
+
+    def test_changed_and_new_files_are_picked_up(self):
+        registry = TeamRegistry("gen9/ou", team_registry.ROUND_ROBIN)
+        registry.refresh()
+
+        self.write("a", TING_LU)
+        self.write("c", PELIPPER)
+        os.remove(os.path.join(self.team_dir, "b"))
+        registry.refresh()
+
+        self.assertEqual(["a", "c"], [t.file_name for t in registry.teams])
+        self.assertEqual("Ting-Lu", registry.teams[0].team_dict[0]["species"])
+
+    def test_invalid_teams_are_skipped(self):
+        self.write("c", PELIPPER.replace("Surf", "Not A Move"))
+        self.write("d", PELIPPER.replace("Pelipper @", "Notamon @"))
+        registry = TeamRegistry("gen9/ou")
+        registry.refresh()
+
+        self.assertEqual(["a", "b"], [t.file_name for t in registry.teams])
+
+    def test_round_robin_continues_after_the_last_team_used(self):
+        registry = TeamRegistry("gen9/ou", team_registry.ROUND_ROBIN)
+        self.assertEqual("a", registry.next_team().file_name)
+
+        self.write("aa", PELIPPER)
+        self.assertEqual("aa", registry.next_team().file_name)
+        self.assertEqual("b", registry.next_team().file_name)
+        self.assertEqual("a", registry.next_team().file_name)
+
+    def test_weighted_rotation_uses_the_weights_file(self):
+        with open(os.path.join(self.team_dir, team_registry.WEIGHTS_FILE), "w") as f:
+            json.dump({"a": 0}, f)
+        registry = TeamRegistry("gen9/ou", team_registry.WEIGHTED)
+
+        self.assertEqual({"b"}, {registry.next_team().file_name for _ in range(20)})
+
+    def test_a_single_file(self):
+        registry = TeamRegistry("gen9/ou/b")
+        self.assertEqual("b", registry.next_team().file_name)
+
+    def test_files_are_converted_in_worker_processes_when_there_are_many(self):
+        for i in range(10):
+            self.write("team{}".format(i), PELIPPER)
+        registry = TeamRegistry("gen9/ou")
+        with mock.patch.object(team_registry, "PARALLEL_THRESHOLD", 4):
+            registry.refresh()
+
+        self.assertEqual(12, len(registry.teams))
+
+    def test_missing_path_raises(self):
+        with self.assertRaises(ValueError):
+            TeamRegistry("gen9/missing").next_team()
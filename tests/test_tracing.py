@@ -0,0 +1,117 @@
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fp import tracing
+from fp.tracing import DecisionTimings
+from fp.tracing import Lazy
+from fp.tracing import debug
+from fp.tracing import decision_timings
+from fp.tracing import profiled
+from fp.tracing import set_decision_timings
+from fp.tracing import span
+from fp.tracing import start_trace_sink
+
+
+class TestDebug(unittest.TestCase):
+    def setUp(self):
+        self.logger = mock.Mock()
+        self.to_string = mock.Mock(return_value="state")
+
+    def test_lazy_arguments_are_not_called_when_debug_is_disabled(self):
+        self.logger.isEnabledFor.return_value = False
+        debug(self.logger, "Calling with state: {}", Lazy(self.to_string))
+
+        self.to_string.assert_not_called()
+        self.logger.debug.assert_not_called()
+
+    def test_message_is_formatted_when_debug_is_enabled(self):
+        self.logger.isEnabledFor.return_value = True
+        debug(self.logger, "Calling with {} state: {}", 1, Lazy(self.to_string))
+
+        self.logger.debug.assert_called_once_with("Calling with 1 state: state")
+
+
+class TestSpan(unittest.TestCase):
+    def test_nothing_is_emitted_without_a_sink(self):
+        with mock.patch.object(tracing.SPAN_LOGGER, "debug") as span_debug:
+            with span("search", num_battles=4):
+                pass
+
+        span_debug.assert_not_called()
+
+    def test_sink_writes_spans_as_json_lines(self):
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        logging.disable(logging.NOTSET)
+        self.addCleanup(logging.disable, logging.CRITICAL)
+        handlers = list(tracing.SPAN_LOGGER.handlers)
+        level = tracing.SPAN_LOGGER.level
+
+        listener = start_trace_sink(path)
+        try:
+            with span("search", num_battles=4):
+                pass
+        finally:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+            tracing.SPAN_LOGGER.handlers = handlers
+            tracing.SPAN_LOGGER.setLevel(level)
+
+        with open(path) as f:
+            event = json.loads(f.readline())
+        self.assertEqual("search", event["span"])
+        self.assertEqual(4, event["num_battles"])
+        self.assertGreaterEqual(event["duration_ms"], 0)
+
+
+class TestDecisionTimings(unittest.TestCase):
+    def test_phases_with_the_same_name_are_added_together(self):
+        timings = DecisionTimings("battle-gen9ou-1", 3)
+        timings.add_phase("sample", 1.5)
+        timings.add_phase("sample", 2.0)
+        timings.fields["num_battles"] = 4
+
+        self.assertEqual(
+            {
+                "battle_tag": "battle-gen9ou-1",
+                "turn": 3,
+                "phases_ms": {"sample": 3.5},
+                "num_battles": 4,
+            },
+            timings.to_dict(),
+        )
+
+    def test_phase_is_recorded_when_the_block_raises(self):
+        timings = DecisionTimings()
+        with self.assertRaises(ValueError):
+            with timings.phase("search"):
+                raise ValueError()
+
+        self.assertIn("search", timings.phases)
+
+    def test_decision_timings_come_from_the_context(self):
+        timings = DecisionTimings()
+        context = contextvars.copy_context()
+        context.run(set_decision_timings, timings)
+
+        self.assertIs(timings, context.run(decision_timings))
+        self.assertIsNot(timings, decision_timings())
+
+
+class TestProfiled(unittest.TestCase):
+    def test_writes_profile_and_allocations(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path_prefix = os.path.join(directory, "turn3")
+            result = profiled(sorted, path_prefix)([3, 1, 2])
+
+            self.assertEqual([1, 2, 3], result)
+            self.assertTrue(os.path.exists(path_prefix + ".prof"))
+            self.assertTrue(os.path.exists(path_prefix + ".tracemalloc.txt"))
@@ -0,0 +1,43 @@
+import unittest
+from unittest import mock
+
+from fp.websocket_client import LoginError
+from fp.websocket_client import PSWebsocketClient
+
+
+class TestLogin(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = PSWebsocketClient()
+        self.client.username = "Foul Play"
+        self.client.password = ""
+        self.client.login_uri = "http://localhost/api/login"
+        self.client.websocket = mock.AsyncMock()
+        self.client.http_session = mock.Mock()
+        self.client.http_session.post.return_value = mock.Mock(
+            status_code=200, text="assertion"
+        )
+
+    async def test_login_waits_for_the_server_to_rename_the_user(self):
+        self.client.websocket.recv.side_effect = [
+            "|challstr|4|abc",
+            "|updateuser| Guest 1|0|1|{}",
+            "|updateuser| Foul Play|1|1|{}",
+        ]
+        await self.client.login()
+
+        self.client.websocket.send.assert_called_once_with(
+            "|/trn Foul Play,0,assertion"
+        )
+        self.assertEqual(3, self.client.websocket.recv.call_count)
+        self.client.http_session.post.assert_called_once_with(
+            "http://localhost/api/login",
+            data={"act": "getassertion", "userid": "Foul Play", "challstr": "4|abc"},
+        )
+
+    async def test_taken_name_raises_login_error(self):
+        self.client.websocket.recv.side_effect = [
+            "|challstr|4|abc",
+            "|nametaken|Foul Play|Someone is already using the name",
+        ]
+        with self.assertRaises(LoginError):
+            await self.client.login()